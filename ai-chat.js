@@ -1574,6 +1574,15 @@ function getActionServerURLDynamic() {
   }
 }
 
+/**
+ * 是否可以從 Action Server 逐段讀取 Gemini 回應（SSE）
+ * 需要瀏覽器支持 EventSource，且直接連接 Action Server（Vercel 代理不轉發 /stream）
+ * @returns {boolean}
+ */
+function canStreamFromActionServer() {
+  return typeof EventSource !== 'undefined' && !getActionServerURLDynamic().startsWith('/');
+}
+
 // 初始 Rasa 伺服器 URL（會在連接時動態獲取）
 let RASA_SERVER_URL = getRasaServerURLDynamic();
 let useRasa = false; // 是否使用 Rasa（如果 Rasa 伺服器可用則設為 true）
@@ -4958,7 +4967,8 @@ async function sendToRasa(message, retryCount = 0) {
       metadata: {
         language: currentLanguage || 'zh',
         timestamp: Date.now(),
-        source: 'web'
+        source: 'web',
+        stream: canStreamFromActionServer() // Gemini 回應改為逐段推送
       }
     };
     
@@ -5028,7 +5038,8 @@ async function sendToRasa(message, retryCount = 0) {
         },
         body: JSON.stringify({
           sender: sessionId,
-          message: message.trim()
+          message: message.trim(),
+          metadata: { stream: canStreamFromActionServer() }
         }),
         signal: timeoutController.signal // 添加超時信號
       });
@@ -5365,7 +5376,8 @@ async function sendMessageToRasa(message, senderId = 'user-123') {
       },
       body: JSON.stringify({
         sender: senderId,
-        message: message
+        message: message,
+        metadata: { stream: canStreamFromActionServer() }
       })
     });
     
@@ -7082,6 +7094,7 @@ async function processQuery(query) {
               'format_rich_response', 'remember_context',
               'find_nearest_facility', 'find_nearest_toilet', 'find_nearest_water', 'find_nearest_trash',
               'query_campus_stats', 'query_building_facilities', 'query_floor_status',
+              'stream_response',
               'handleFindNearestFacility' // 這些會在 executeAction 中調用 handleFindNearestFacility，它會顯示訊息
             ];
             
@@ -8090,6 +8103,11 @@ function executeAction(actionData) {
       handleAskGender(actionData);
       break;
     
+    case 'stream_response':
+      // Gemini 流式回應（從 Action Server 的 /stream 逐段讀取）
+      handleStreamResponse(actionData);
+      break;
+    
     case 'remember_context':
       // 記住上下文（已在後端處理，前端只需確認）
       if (actionData.message) {
@@ -10848,6 +10866,71 @@ function handleProvideSuggestions(actionData) {
   }
 }
 
+/**
+ * 處理 Gemini 流式回應
+ * 先顯示一條空的 AI 訊息，再通過 EventSource 逐段追加文字；
+ * 結束時以清理後的完整回應替換，失敗時顯示 fallback_message
+ * @param {Object} actionData - Action 數據（stream_id, fallback_message）
+ */
+function handleStreamResponse(actionData) {
+  const fallbackMessage = actionData.fallback_message || '';
+  if (!actionData.stream_id || typeof EventSource === 'undefined') {
+    if (fallbackMessage) {
+      addMessage(fallbackMessage.replace(/\n/g, '<br>'), false);
+    }
+    return;
+  }
+  
+  addMessage('…', false);
+  const messagesContainer = Utils.dom.get('chat-messages');
+  const textNodes = messagesContainer ? messagesContainer.querySelectorAll('.ai-message .message-text') : [];
+  const textDiv = textNodes.length > 0 ? textNodes[textNodes.length - 1] : null;
+  if (!textDiv) {
+    return;
+  }
+  
+  let streamedText = '';
+  const render = (text) => {
+    // innerText 會把換行轉成 <br>，且不解析 HTML
+    textDiv.innerText = text;
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+  };
+  
+  const streamUrl = `${getActionServerURLDynamic()}/stream/${encodeURIComponent(actionData.stream_id)}`;
+  const source = new EventSource(streamUrl);
+  
+  source.onmessage = (event) => {
+    try {
+      const data = JSON.parse(event.data);
+      if (data.text) {
+        streamedText += data.text;
+        render(streamedText);
+      }
+    } catch (error) {
+      Utils.logger.warn('無法解析流式回應:', error);
+    }
+  };
+  
+  source.addEventListener('done', (event) => {
+    source.close();
+    let finalText = null;
+    try {
+      finalText = JSON.parse(event.data).text;
+    } catch (error) {
+      Utils.logger.warn('無法解析流式回應結束事件:', error);
+    }
+    render(finalText || fallbackMessage);
+  });
+  
+  source.onerror = () => {
+    // 服務器關閉連線或流不存在時不自動重連
+    source.close();
+    if (!streamedText) {
+      render(fallbackMessage);
+    }
+  };
+}
+
 /**
  * 處理廁所類型詢問（使用按鈕）
  * @param {Object} actionData - Action 數據
@@ -7,6 +7,7 @@ from typing import Any, Text, Dict, List, Optional
 from rasa_sdk import Action, Tracker
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet
+import asyncio
 import json
 import math
 import re
@@ -44,32 +45,34 @@ except ImportError as e:
 try:
     from .config import (
         FACILITY_TYPES, FACILITY_STATUSES, CAMPUSES, BUILDINGS,
-        PERFORMANCE_CONFIG, LANGUAGE_CONFIG, VALIDATION_CONFIG
+        PERFORMANCE_CONFIG, VALIDATION_CONFIG
     )
     from .utils import (
         facility_cache, rate_limiter, conversation_memory,
         validate_facility_type, validate_status, validate_campus,
         get_facility_name, get_status_name,
-        normalize_facility_type, normalize_status
+        normalize_facility_type, normalize_status,
+        detect_language
     )
+    from .entities import MessageFeatures, extract_features, feature_cache
+    from .gazetteer import building_gazetteer
+    from .fuzzy_index import building_index
+    from .location import extract_floor
+    from .problem_classifier import classify_problem
+    from .report_parser import extract_equipment, extract_location_keywords, parse_multiple_problems
+    from .responses import response_registry, build_toilet_payload
 except ImportError:
     # 如果無法導入（可能是直接運行），使用默認值
     FACILITY_TYPES = {}
     FACILITY_STATUSES = {}
     facility_cache = None
     rate_limiter = None
-
-# 預編譯正則表達式（性能優化）
-CHINESE_PATTERN = re.compile(r'[\u4e00-\u9fff]')
-ENGLISH_PATTERN = re.compile(r'[a-zA-Z]')
-NON_WORD_PATTERN = re.compile(r'[^\w\s]')
+    feature_cache = None
 
 # 常量定義（從配置導入，如果可用）
 try:
-    ENGLISH_THRESHOLD = LANGUAGE_CONFIG.get('english_threshold', 0.5)
     MAX_INPUT_LENGTH = PERFORMANCE_CONFIG.get('max_input_length', 500)
 except NameError:
-    ENGLISH_THRESHOLD = 0.5
     MAX_INPUT_LENGTH = 500
 
 # 錯誤消息
@@ -115,45 +118,6 @@ def sanitize_input(text: Optional[str]) -> str:
     return text.strip()
 
 
-def detect_language(text: str) -> str:
-    """
-    檢測文本語言
-    返回 'en' 或 'zh'
-    
-    Args:
-        text: 要檢測的文本
-        
-    Returns:
-        'zh' 或 'en'
-        
-    Examples:
-        >>> detect_language("你好")
-        'zh'
-        >>> detect_language("Hello")
-        'en'
-    """
-    if not text:
-        return 'zh'
-    
-    # 檢查是否包含中文字符（使用預編譯的正則表達式）
-    has_chinese = bool(CHINESE_PATTERN.search(text))
-    
-    # 如果包含中文，返回中文
-    if has_chinese:
-        return 'zh'
-    
-    # 檢查是否主要是英文字符
-    english_chars = len(ENGLISH_PATTERN.findall(text))
-    total_chars = len(NON_WORD_PATTERN.sub('', text))
-    
-    # 如果英文字符佔比超過閾值，視為英文
-    if total_chars > 0 and english_chars / total_chars > ENGLISH_THRESHOLD:
-        return 'en'
-    
-    # 默認返回中文
-    return 'zh'
-
-
 def get_language_from_tracker(tracker: Optional[Tracker]) -> str:
     """
     從 tracker 獲取語言
@@ -236,6 +200,39 @@ class _BaseAction(Action):
             return conversation_memory.get_user_context(user_id)
         return {}
     
+    def get_features(self, tracker: Optional[Tracker]) -> "MessageFeatures":
+        """
+        獲取最新用戶消息的實體特徵（設施類型、性別、狀態、建築、樓層、校區、語言）
+        同一輪對話中的多個 action 共用一次提取結果
+        """
+        language = self.get_language(tracker)
+        message = (tracker.latest_message if tracker is not None else None) or {}
+        text = message.get("text", "") or ""
+        if feature_cache is None:
+            return extract_features(text, language)
+        message_id = str(message.get("message_id") or "")
+        return feature_cache.get(self.get_user_id(tracker), message_id, text, language)
+    
+    def get_recent_user_texts(self, tracker: Optional[Tracker], limit: int = 10) -> List[str]:
+        """
+        由新到舊返回最近 limit 個事件中的用戶消息（不含最新一條），用於上下文理解
+        """
+        if tracker is None:
+            return []
+        latest = tracker.latest_message.get("text", "") or ""
+        texts = []
+        for event in reversed(tracker.events[-limit:]):
+            if isinstance(event, dict):
+                event_type, text = event.get("event"), event.get("text")
+            else:
+                event_type, text = getattr(event, "event", None), getattr(event, "text", None)
+            # 機器人回覆中提到的建築不能當作用戶說過的話
+            if event_type != "user":
+                continue
+            if text and text != latest:
+                texts.append(text)
+        return texts
+    
     def safe_run(
         self,
         dispatcher: CollectingDispatcher,
@@ -291,52 +288,20 @@ class ActionFindNearestToilet(_BaseAction):
         domain: Dict[Text, Any],
     ) -> List[Dict[Text, Any]]:
         language = self.get_language(tracker)
-        last_message = tracker.latest_message.get("text", "") or ""
         
         # 從消息中提取性別（如果已指定）
-        gender = tracker.get_slot("gender")
-        if not gender:
-            # 檢查消息中是否包含性別關鍵詞
-            if any(word in last_message for word in ['男生', '男性', '男廁', '男廁所', '男生廁所', '男性廁所', 'men', 'men\'s', 'male']):
-                gender = '男'
-            elif any(word in last_message for word in ['女生', '女性', '女廁', '女廁所', '女生廁所', '女性廁所', 'women', 'women\'s', 'female', 'ladies']):
-                gender = '女'
-            elif any(word in last_message for word in ['無性別', '性別友善', '性別中立', 'unisex', 'gender-neutral', 'gender-inclusive', 'all-gender']):
-                gender = '性別友善'
-            elif any(word in last_message for word in ['無障礙', 'accessible', 'wheelchair']):
-                gender = '無障礙'
+        gender = tracker.get_slot("gender") or self.get_features(tracker).gender
         
         # 如果沒有指定性別，詢問廁所類型（使用按鈕）
         if not gender:
-            if language == 'en':
-                response_text = "❓ Please select the type of restroom:"
-                buttons = [
-                    {"title": "♂️ Men's Restroom", "payload": "men's restroom"},
-                    {"title": "♀️ Women's Restroom", "payload": "women's restroom"},
-                    {"title": "🚻 Unisex Restroom", "payload": "unisex restroom"},
-                    {"title": "♿ Accessible Restroom", "payload": "accessible restroom"}
-                ]
-            else:
-                response_text = "❓ 請選擇廁所類型："
-                buttons = [
-                    {"title": "♂️ 男廁", "payload": "男廁"},
-                    {"title": "♀️ 女廁", "payload": "女廁"},
-                    {"title": "🚻 性別友善廁所", "payload": "性別友善廁所"},
-                    {"title": "♿ 無障礙廁所", "payload": "無障礙廁所"}
-                ]
+            # 結構化數據（包含按鈕）在導入時已構建好
+            response_data = response_registry.get('action_find_nearest_toilet.ask_gender', 'en' if language == 'en' else 'zh')
+            response_data["language"] = language
             
             # 發送文本消息
-            dispatcher.utter_message(text=response_text)
+            dispatcher.utter_message(text=response_data["message"])
             
             # 發送結構化數據給前端（包含按鈕）
-            response_data = {
-                "action": "ask_gender",
-                "facility_type": "toilet",
-                "pending_intent": "find_nearest_facility",
-                "message": response_text,
-                "buttons": buttons,
-                "language": language
-            }
             dispatcher.utter_message(custom=response_data)
             
             return [
@@ -349,45 +314,13 @@ class ActionFindNearestToilet(_BaseAction):
         self.remember(tracker, "last_facility_type", "toilet")
         self.remember(tracker, "last_gender", gender)
         
-        # 檢查緩存
-        user_id = self.get_user_id(tracker)
-        cache_key = f"find_nearest_toilet_{gender}_{user_id}"
-        
-        if facility_cache:
-            cached_result = facility_cache.get(cache_key)
-            if cached_result:
-                logger.debug(f"Cache hit for {cache_key}")
-                dispatcher.utter_message(custom=cached_result)
-                return [SlotSet("language", language), SlotSet("gender", gender)]
-        
         try:
-            gender_text = 'men\'s' if gender == '男' else 'women\'s' if gender == '女' else 'gender-inclusive' if gender == '性別友善' else 'unisex'
-            gender_text_zh = '男' if gender == '男' else '女' if gender == '女' else '性別友善' if gender == '性別友善' else '無性別'
-            
-            if language == 'en':
-                response_data = {
-                    "action": "find_nearest_facility",
-                    "facility_type": "toilet",
-                    "gender": gender,
-                    "facility_type_chinese": f"{gender_text_zh} restroom",
-                    "facility_type_english": f"{gender_text} restroom",
-                    "message": f"Searching for the nearest {gender_text} restroom...",
-                    "language": "en"
-                }
-            else:
-                response_data = {
-                    "action": "find_nearest_facility",
-                    "facility_type": "toilet",
-                    "gender": gender,
-                    "facility_type_chinese": f"{gender_text_zh}廁所",
-                    "facility_type_english": f"{gender_text} restroom",
-                    "message": f"正在尋找最近的{gender_text_zh}廁所...",
-                    "language": "zh"
-                }
-            
-            # 存入緩存
-            if facility_cache:
-                facility_cache.set(cache_key, response_data)
+            # 常見的 (語言, 性別) 組合在導入時已構建好
+            response_key = 'en' if language == 'en' else 'zh'
+            response_data = (
+                response_registry.get('action_find_nearest_toilet', response_key, gender)
+                or build_toilet_payload(response_key, gender)
+            )
             
             dispatcher.utter_message(custom=response_data)
             return [SlotSet("language", language), SlotSet("gender", gender)]
@@ -413,35 +346,8 @@ class ActionFindNearestWater(_BaseAction):
         # 記住用戶查詢的設施類型
         self.remember(tracker, "last_facility_type", "water")
         
-        # 檢查緩存
-        user_id = self.get_user_id(tracker)
-        cache_key = f"find_nearest_water_{user_id}"
-        
-        if facility_cache:
-            cached_result = facility_cache.get(cache_key)
-            if cached_result:
-                logger.debug(f"Cache hit for {cache_key}")
-                dispatcher.utter_message(custom=cached_result)
-                return [SlotSet("language", language)]
-        
-        if language == 'en':
-            response_data = {
-                "action": "find_nearest_facility",
-                "facility_type": "water",
-                "facility_type_chinese": "water fountain",
-                "facility_type_english": "water fountain",
-                "message": "Searching for the nearest water fountain...",
-                "language": "en"
-            }
-        else:
-            response_data = {
-                "action": "find_nearest_facility",
-                "facility_type": "water",
-                "facility_type_chinese": "飲水機",
-                "facility_type_english": "water fountain",
-                "message": "正在尋找最近的飲水機...",
-                "language": "zh"
-            }
+        # 回應只取決於語言，導入時已構建好
+        response_data = response_registry.get('action_find_nearest_water', 'en' if language == 'en' else 'zh')
         
         dispatcher.utter_message(custom=response_data)
         return [SlotSet("language", language)]
@@ -464,35 +370,8 @@ class ActionFindNearestTrash(_BaseAction):
         # 記住用戶查詢的設施類型
         self.remember(tracker, "last_facility_type", "trash")
         
-        # 檢查緩存
-        user_id = self.get_user_id(tracker)
-        cache_key = f"find_nearest_trash_{user_id}"
-        
-        if facility_cache:
-            cached_result = facility_cache.get(cache_key)
-            if cached_result:
-                logger.debug(f"Cache hit for {cache_key}")
-                dispatcher.utter_message(custom=cached_result)
-                return [SlotSet("language", language)]
-        
-        if language == 'en':
-            response_data = {
-                "action": "find_nearest_facility",
-                "facility_type": "trash",
-                "facility_type_chinese": "trash can",
-                "facility_type_english": "trash can",
-                "message": "Searching for the nearest trash can...",
-                "language": "en"
-            }
-        else:
-            response_data = {
-                "action": "find_nearest_facility",
-                "facility_type": "trash",
-                "facility_type_chinese": "垃圾桶",
-                "facility_type_english": "trash can",
-                "message": "正在尋找最近的垃圾桶...",
-                "language": "zh"
-            }
+        # 回應只取決於語言，導入時已構建好
+        response_data = response_registry.get('action_find_nearest_trash', 'en' if language == 'en' else 'zh')
         
         dispatcher.utter_message(custom=response_data)
         return [SlotSet("language", language)]
@@ -705,74 +584,22 @@ class ActionQueryFacilitiesByStatus(_BaseAction):
         domain: Dict[Text, Any],
     ) -> List[Dict[Text, Any]]:
         language = self.get_language(tracker)
-        last_message = tracker.latest_message.get("text", "") or ""
         campus = tracker.get_slot("campus")
         
-        # 從用戶消息中提取狀態關鍵字和設施類型
-        text_lower = last_message.lower()
-        
-        # 狀態關鍵字映射（包含自然語言表達）
-        status_keywords = {
-            '滿了': '待清潔',
-            '滿': '待清潔',
-            'full': '待清潔',
-            '髒了': '待清潔',
-            '髒': '待清潔',
-            'dirty': '待清潔',
-            '需要收': '待清潔',  # 新增：垃圾需要收
-            '需要清理': '待清潔',  # 新增：需要清理
-            '需要處理': '待清潔',  # 新增：需要處理
-            '要收': '待清潔',  # 新增：要收垃圾
-            '要清理': '待清潔',  # 新增：要清理
-            '要處理': '待清潔',  # 新增：要處理
-            '壞了': '無法使用',
-            '壞': '無法使用',
-            'broken': '無法使用',
-            '故障': '無法使用',
-            '需要維修': '無法使用',  # 新增：需要維修
-            '需要修理': '無法使用',  # 新增：需要修理
-            '要維修': '無法使用',  # 新增：要維修
-            '要修理': '無法使用',  # 新增：要修理
-            '維修': '無法使用',  # 新增：維修
-            '修理': '無法使用',  # 新增：修理
-            '損壞': '部分損壞',
-            'damaged': '部分損壞',
-            '待清潔': '待清潔',
-            '無法使用': '無法使用',
-            '部分損壞': '部分損壞'
-        }
-        
-        # 設施類型關鍵字映射（包含自然語言表達）
-        facility_type_keywords = {
-            '垃圾桶': 'trash',
-            '垃圾': 'trash',  # 當用戶說「垃圾需要收」時，識別為垃圾桶
-            'trash': 'trash',
-            '廁所': 'toilet',
-            'toilet': 'toilet',
-            'restroom': 'toilet',
-            '飲水機': 'water',
-            '飲水': 'water',
-            'water': 'water',
-            'fountain': 'water'
-        }
-        
-        # 查找匹配的狀態
-        query_status = None
-        for keyword, status in status_keywords.items():
-            if keyword in text_lower:
-                query_status = status
-                break
+        # 從用戶消息中提取狀態和設施類型
+        features = self.get_features(tracker)
+        status_keywords = features.status_keywords
         
+        query_status = features.status
         if not query_status:
             # 如果找不到，嘗試從 slot 中獲取
             query_status = tracker.get_slot("status") or "待清潔"
         
-        # 查找匹配的設施類型
-        query_facility_type = None
-        for keyword, facility_type in facility_type_keywords.items():
-            if keyword in text_lower:
-                query_facility_type = facility_type
-                break
+        # 同時提到多種設施時，垃圾桶優先（「垃圾需要收」「廁所垃圾桶滿了」）
+        query_facility_type = next(
+            (ft for ft in ('trash', 'toilet', 'water') if ft in features.facility_types),
+            None
+        )
         
         # 如果找不到，嘗試從 slot 中獲取
         if not query_facility_type:
@@ -845,21 +672,21 @@ class ActionQueryFacilitiesByStatus(_BaseAction):
             campus_display = campus or "所有校區"
             status_display = query_status
             # 根據用戶輸入選擇合適的顯示文字（包含自然語言表達）
-            if '需要收' in text_lower or '要收' in text_lower:
+            if '要收' in status_keywords:
                 status_display = '滿了'  # 垃圾需要收 = 垃圾桶滿了
-            elif '需要清理' in text_lower or '要清理' in text_lower:
+            elif '要清理' in status_keywords:
                 status_display = '髒了'  # 需要清理 = 髒了
-            elif '需要處理' in text_lower or '要處理' in text_lower:
+            elif '要處理' in status_keywords:
                 status_display = '滿了'  # 需要處理 = 滿了
-            elif '滿了' in text_lower or '滿' in text_lower:
+            elif '滿' in status_keywords:
                 status_display = '滿了'
-            elif '髒了' in text_lower or '髒' in text_lower:
+            elif '髒' in status_keywords:
                 status_display = '髒了'
-            elif '需要維修' in text_lower or '需要修理' in text_lower or '要維修' in text_lower or '要修理' in text_lower:
+            elif '要維修' in status_keywords or '要修理' in status_keywords:
                 status_display = '壞了'  # 需要維修/修理 = 壞了
-            elif '壞了' in text_lower or '壞' in text_lower or '故障' in text_lower:
+            elif '壞' in status_keywords or '故障' in status_keywords:
                 status_display = '壞了'
-            elif '損壞' in text_lower:
+            elif '損壞' in status_keywords:
                 status_display = '損壞'
             
             facility_type_display = ""
@@ -1355,14 +1182,6 @@ class ActionUpdateFloorStatus(_BaseAction):
         status = tracker.get_slot("status")
         facility_type = tracker.get_slot("facility_type") or "toilet"  # 默認是廁所
         
-        # 建築名稱映射
-        building_map = {
-            "綜三館": "綜三館",
-            "zongsan building": "綜三館",
-            "zongsan": "綜三館",
-            "zongsan 館": "綜三館"
-        }
-        
         # 狀態映射（中英文對應）
         status_map = {
             "正常": "正常",
@@ -1384,7 +1203,7 @@ class ActionUpdateFloorStatus(_BaseAction):
         }
         
         # 標準化建築名稱
-        building_normalized = building_map.get(building.lower() if building else "", building or "綜三館")
+        building_normalized = building_gazetteer.lookup(building) or building or "綜三館"
         
         # 標準化狀態
         status_normalized = status_map.get(status.lower() if status else "", status or "正常")
@@ -1449,15 +1268,7 @@ class ActionQueryFloorStatus(_BaseAction):
         language = self.get_language(tracker)
         building = tracker.get_slot("building")
         
-        # 建築名稱映射
-        building_map = {
-            "綜三館": "綜三館",
-            "zongsan building": "綜三館",
-            "zongsan": "綜三館",
-            "zongsan 館": "綜三館"
-        }
-        
-        building_normalized = building_map.get(building.lower() if building else "", building or "綜三館")
+        building_normalized = building_gazetteer.lookup(building) or building or "綜三館"
         
         if language == 'en':
             response_text = f"Here's the status of all floors in {building_normalized}:"
@@ -1502,223 +1313,40 @@ class ActionReportFacilityProblem(_BaseAction):
         problem_description = tracker.get_slot("problem_description")
         last_message = tracker.latest_message.get("text", "") or ""
         
-        # 建築名稱映射（擴展所有建築物，包括拼寫變體）
-        building_map = {
-            "綜三館": "綜三館",
-            "粽三館": "綜三館",  # 拼寫變體
-            "粽三": "綜三館",  # 拼寫變體
-            "綜三": "綜三館",
-            "zongsan building": "綜三館",
-            "zongsan": "綜三館",
-            "zongsan 館": "綜三館",
-            "行政大樓": "行政大樓",
-            "行政": "行政大樓",
-            "administration building": "行政大樓",
-            "administration": "行政大樓",
-            "第一教學大樓": "第一教學大樓",
-            "第一教學": "第一教學大樓",
-            "first teaching building": "第一教學大樓",
-            "第二教學大樓": "第二教學大樓",
-            "第二教學": "第二教學大樓",
-            "second teaching building": "第二教學大樓",
-            "第三教學大樓": "第三教學大樓",
-            "第三教學": "第三教學大樓",
-            "third teaching building": "第三教學大樓",
-            "圖書館": "圖書館",
-            "library": "圖書館",
-            "體育館": "體育館",
-            "gymnasium": "體育館",
-            "gym": "體育館",
-            "學生餐廳": "學生餐廳",
-            "餐廳": "學生餐廳",
-            "student cafeteria": "學生餐廳",
-            "cafeteria": "學生餐廳",
-            "實驗大樓": "實驗大樓",
-            "實驗": "實驗大樓",
-            "laboratory building": "實驗大樓",
-            "lab building": "實驗大樓",
-            "工學院大樓": "工學院大樓",
-            "工學院": "工學院大樓",
-            "engineering building": "工學院大樓",
-            "管理學院大樓": "管理學院大樓",
-            "管理學院": "管理學院大樓",
-            "management building": "管理學院大樓",
-            "研究大樓": "研究大樓",
-            "研究": "研究大樓",
-            "research building": "研究大樓",
-            "創新大樓": "創新大樓",
-            "創新": "創新大樓",
-            "innovation building": "創新大樓",
-            "宿舍大樓": "宿舍大樓",
-            "宿舍": "宿舍大樓",
-            "dormitory": "宿舍大樓",
-            "dorm": "宿舍大樓"
-        }
-        
         # 智能提取建築名稱（多層次匹配，包括上下文理解）
         if not building:
-            # 獲取對話歷史，用於上下文理解
-            events = tracker.events
-            recent_messages = []
-            for event in reversed(events[-10:]):  # 只檢查最近10條消息
-                if hasattr(event, 'text') and event.text:
-                    recent_messages.append(event.text)
-            
-            text_lower = last_message.lower()
-            
-            # 1. 先嘗試精確匹配（包括拼寫變體）
-            # 按長度排序，優先匹配較長的建築物名稱（避免誤匹配）
-            sorted_keys = sorted(building_map.keys(), key=len, reverse=True)
-            for key in sorted_keys:
-                if key.lower() in text_lower:
-                    building = building_map[key]
-                    break
+            # 1. 先在當前消息中做最長匹配（包括拼寫變體）
+            building = building_gazetteer.find(last_message)
             
             # 2. 如果沒有找到，從對話歷史中查找（上下文理解）
             if not building:
-                for msg in recent_messages:
-                    if msg and msg != last_message:
-                        msg_lower = msg.lower()
-                        for key in sorted_keys:
-                            if key.lower() in msg_lower:
-                                building = building_map[key]
-                                break
-                        if building:
-                            break
+                building = building_gazetteer.find_in(self.get_recent_user_texts(tracker))
             
-            # 3. 如果還是找不到，使用模糊匹配（Levenshtein 距離）
+            # 3. 如果還是找不到，使用容錯匹配（允許錯字）
             if not building:
-                import difflib
-                best_match = None
-                best_ratio = 0.6  # 相似度閾值
-                
-                for key, value in building_map.items():
-                    # 檢查是否包含關鍵字
-                    if len(key) >= 2:
-                        # 計算相似度
-                        ratio = difflib.SequenceMatcher(None, text_lower, key.lower()).ratio()
-                        if ratio > best_ratio:
-                            best_ratio = ratio
-                            best_match = value
-                
-                if best_match:
-                    building = best_match
+                building = building_index.best_in_text(last_message)
         
-        # 從消息中提取樓層（如果 slot 沒有）
+        # 從消息中提取樓層（如果 slot 沒有），支持 1F、一樓、first floor、B1、2-3樓 等格式
         if not floor:
-            import re
-            # 匹配 "一樓"、"1F"、"1樓" 等
-            floor_patterns = [
-                (r'([1-9]|10)[Ff]', lambda m: f"{m.group(1)}F"),
-                (r'([一|二|三|四|五|六|七|八|九|十])樓', lambda m: {
-                    '一': '1F', '二': '2F', '三': '3F', '四': '4F', '五': '5F',
-                    '六': '6F', '七': '7F', '八': '8F', '九': '9F', '十': '10F'
-                }.get(m.group(1), '1F')),
-                (r'([1-9]|10)樓', lambda m: f"{m.group(1)}F"),
-                (r'first floor', lambda m: '1F'),
-                (r'second floor', lambda m: '2F'),
-                (r'third floor', lambda m: '3F'),
-                (r'fourth floor', lambda m: '4F'),
-                (r'fifth floor', lambda m: '5F'),
-            ]
-            for pattern, converter in floor_patterns:
-                match = re.search(pattern, last_message, re.IGNORECASE)
-                if match:
-                    floor = converter(match)
-                    break
+            floor = extract_floor(last_message)
+        
+        features = self.get_features(tracker)
         
         # 從消息中提取設施類型（如果 slot 沒有）
         if not facility_type:
-            text_lower = last_message.lower()
-            if any(word in text_lower for word in ['廁所', 'toilet', 'restroom', 'bathroom']):
-                facility_type = 'toilet'
-            elif any(word in text_lower for word in ['飲水機', 'water', 'water fountain', 'water dispenser']):
-                facility_type = 'water'
-            elif any(word in text_lower for word in ['垃圾桶', 'trash', 'garbage']):
-                facility_type = 'trash'
+            facility_type = features.facility_type
         
         # 從消息中提取性別（如果是廁所）
         gender = tracker.get_slot("gender")
         if facility_type == 'toilet' and not gender:
-            text_lower = last_message.lower()
-            # 檢查中文性別關鍵詞（包含簡稱）
-            # 優先檢查完整詞彙，避免誤匹配
-            if any(word in last_message for word in ['男生廁所', '男性廁所', '男廁所', '男生', '男性', '男廁', 'men', 'men\'s', 'male', 'men\'s restroom', 'men\'s toilet']):
-                gender = '男'
-            elif any(word in last_message for word in ['女生廁所', '女性廁所', '女廁所', '女生', '女性', '女廁', 'women', 'women\'s', 'female', 'ladies', 'women\'s restroom', 'women\'s toilet', 'ladies\' restroom', 'ladies\' toilet']):
-                gender = '女'
-            elif any(word in last_message for word in ['無性別廁所', '性別友善廁所', '性別友善', '性別中立', '無性別', '中性廁所', '中性', 'unisex', 'gender-neutral', 'gender-inclusive', 'all-gender', 'unisex restroom', 'unisex toilet']):
-                gender = '性別友善'
-            elif any(word in last_message for word in ['無障礙廁所', '無障礙', 'accessible', 'wheelchair', 'accessible restroom', 'accessible toilet']):
-                gender = '無障礙'
+            gender = features.gender
         
         # 從消息中提取問題描述（如果 slot 沒有）
         if not problem_description:
             problem_description = last_message
         
-        # 智能標準化建築名稱（擴展所有建築物）
-        # 擴展 building_map 包含所有建築物
-        full_building_map = {
-            # 第一校區
-            "第一教學大樓": "第一教學大樓", "第一教學": "第一教學大樓", "一教": "第一教學大樓",
-            "第一教": "第一教學大樓", "教學大樓一": "第一教學大樓", "first teaching building": "第一教學大樓",
-            "第二教學大樓": "第二教學大樓", "第二教學": "第二教學大樓", "二教": "第二教學大樓",
-            "第二教": "第二教學大樓", "教學大樓二": "第二教學大樓", "second teaching building": "第二教學大樓",
-            "第三教學大樓": "第三教學大樓", "第三教學": "第三教學大樓", "三教": "第三教學大樓",
-            "第三教": "第三教學大樓", "教學大樓三": "第三教學大樓", "third teaching building": "第三教學大樓",
-            "第四教學大樓": "第四教學大樓", "第四教學": "第四教學大樓", "四教": "第四教學大樓",
-            "第四教": "第四教學大樓", "教學大樓四": "第四教學大樓", "fourth teaching building": "第四教學大樓",
-            "行政大樓": "行政大樓", "行政": "行政大樓", "行政館": "行政大樓",
-            "administration building": "行政大樓", "admin building": "行政大樓",
-            "圖書館": "圖書館", "圖書": "圖書館", "library": "圖書館", "lib": "圖書館",
-            "飛機館": "飛機館", "電機工程館": "飛機館", "電機館": "飛機館", "電機": "飛機館",
-            "electrical engineering building": "飛機館", "ee building": "飛機館",
-            "機械工程館": "機械工程館", "機械館": "機械工程館", "機械": "機械工程館",
-            "mechanical engineering building": "機械工程館", "me building": "機械工程館",
-            "資訊休閒大樓": "資訊休閒大樓", "資訊休閒館": "資訊休閒大樓",
-            "information and recreation building": "資訊休閒大樓",
-            "紅館": "紅館", "red building": "紅館", "red hall": "紅館",
-            "綠館": "綠館", "green building": "綠館", "green hall": "綠館",
-            "學生活動中心": "學生活動中心", "活動中心": "學生活動中心",
-            "student activity center": "學生活動中心", "activity center": "學生活動中心",
-            # 第二校區
-            "科技研究中心": "科技研究中心", "科技中心": "科技研究中心", "研究中心": "科技研究中心",
-            "technology research center": "科技研究中心", "tech center": "科技研究中心",
-            "綜一館": "綜一館", "綜合一館": "綜一館", "綜合教學大樓第一館": "綜一館", "綜一": "綜一館",
-            "comprehensive building one": "綜一館", "comp building 1": "綜一館",
-            "綜二館": "綜二館", "綜合二館": "綜二館", "綜合教學大樓第二館": "綜二館", "綜二": "綜二館",
-            "comprehensive building two": "綜二館", "comp building 2": "綜二館",
-            "綜三館": "綜三館", "粽三館": "綜三館", "粽三": "綜三館", "綜三": "綜三館",
-            "粽三管": "綜三館", "綜三管": "綜三館", "綜合三館": "綜三館", "綜合教學大樓第三館": "綜三館",
-            "zongsan building": "綜三館", "zongsan": "綜三館", "comprehensive building three": "綜三館",
-            "電機館": "電機館", "電機工程館": "電機館", "電機": "電機館",
-            "electrical engineering building": "電機館", "ee building": "電機館",
-            # 第三校區
-            "操場": "操場", "運動場": "操場", "playground": "操場", "sports field": "操場", "field": "操場",
-            "游泳池": "游泳池", "泳池": "游泳池", "swimming pool": "游泳池", "pool": "游泳池",
-            "體育館": "體育館(經國館)", "經國館": "體育館(經國館)", "經國體育館": "體育館(經國館)",
-            "gymnasium": "體育館(經國館)", "gym": "體育館(經國館)", "sports center": "體育館(經國館)",
-            "人文大樓": "人文大樓", "人文館": "人文大樓",
-            "humanities building": "人文大樓", "humanities": "人文大樓",
-            "文理暨管理大樓": "文理暨管理大樓", "文理大樓": "文理暨管理大樓", "文理管理大樓": "文理暨管理大樓",
-            "文理館": "文理暨管理大樓",
-            "liberal arts and management building": "文理暨管理大樓", "lam building": "文理暨管理大樓"
-        }
-        
-        # 標準化建築名稱（優先使用擴展的映射表）
-        building_normalized = full_building_map.get(building.lower() if building else "", 
-                                                     building_map.get(building.lower() if building else "", 
-                                                                      building or ""))
-        
-        # 如果還是找不到，從消息中智能提取
-        if not building_normalized or building_normalized == (building or ""):
-            text_lower = last_message.lower()
-            # 按長度排序，優先匹配較長的建築物名稱
-            sorted_keys = sorted(full_building_map.keys(), key=len, reverse=True)
-            for key in sorted_keys:
-                if key.lower() in text_lower:
-                    building_normalized = full_building_map[key]
-                    break
+        # 標準化建築名稱，找不到時從消息中提取
+        building_normalized = building_gazetteer.normalize(building, last_message) or building or ""
         
         # 標準化樓層
         if floor:
@@ -1993,340 +1621,8 @@ class ActionReportFacilityProblem(_BaseAction):
     
     def _analyze_problem(self, description: str, language: str) -> tuple:
         """分析問題描述，返回 (status, severity, notes, priority)"""
-        if not description:
-            return ("正常", "minor", "", "minor")
-        
-        desc_lower = description.lower()
-        desc_original = description.strip()
-        
-        # 判斷是否為部分問題（單個設備有問題）
-        is_partial = any(word in desc_lower for word in [
-            '一個', 'one', '部分', 'part', '有些', 'some', '幾個', 'few',
-            '小便斗', 'urinal', '馬桶', 'toilet', '水龍頭', 'faucet',
-            '洗手台', 'sink', '烘手機', 'hand dryer',
-            '最靠窗', '最裡面', '最外面', '第一個', '第二個', '第三個',
-            '左側', '右側', '左邊', '右邊', 'near window', 'first', 'second'
-        ])
-        
-        # 1. 衛生問題（有大便、有尿、很髒、有異味等）
-        hygiene_keywords = [
-            # 排泄物相關
-            '大便', 'poop', 'feces', 'stool', '糞便', '排泄物', 'waste',
-            '有尿', 'urine', 'pee', '尿液',
-            '裡面有', 'inside has', '裡面', 'inside', '有東西', 'has something',
-            # 清潔度問題
-            '很髒', 'very dirty', 'dirty', '髒', '不乾淨', 'not clean', '骯髒',
-            '污漬', 'stain', '污垢', 'dirt', '垃圾', 'trash', 'garbage',
-            '未清理', 'not cleaned', '沒清', 'hasn\'t been cleaned',
-            # 異味問題
-            '有異味', '有臭味', 'smell', 'odor', 'stink', '臭', '異味', '臭味',
-            '難聞', 'bad smell', 'foul odor', '惡臭',
-            # 異物問題
-            '有異物', 'foreign object', '異物', '有東西', 'something inside',
-            # 衛生紙問題
-            '沒紙', 'no paper', '沒有衛生紙', 'no toilet paper', '缺紙',
-            '紙用完了', 'paper ran out', '紙沒了'
-        ]
-        is_hygiene = any(word in desc_lower for word in hygiene_keywords)
-        
-        # 2. 堵塞問題
-        clog_keywords = [
-            '堵塞', 'clog', 'blocked', 'blocking', '堵住', '堵了',
-            '不通', 'not working', 'not flowing', '不流通',
-            '沖不掉', '沖不下去', "won't flush", "can't flush", '沖不走',
-            '卡住', 'stuck', 'jam', '卡了',
-            '排水不暢', 'drain slowly', '排水慢', 'slow drain',
-            '倒灌', 'backflow', '回流', 'water backflow'
-        ]
-        is_clogged = any(word in desc_lower for word in clog_keywords)
-        
-        # 3. 損壞問題（壞了、故障、漏水等）
-        broken_keywords = [
-            # 一般損壞
-            '壞', 'broken', '故障', 'malfunction', '不能用', 'not working', '壞了',
-            '損壞', 'damaged', '破損', 'broken down', '失效', '失效',
-            '無法使用', 'unavailable', '不能用', 'cannot use', '無法運作',
-            # 漏水問題
-            '漏水', 'leak', 'leaking', '滴水', 'dripping', '漏', 'leakage',
-            '滲水', 'water seepage', '滲漏', 'seepage',
-            # 供水問題
-            '沒水', 'no water', '沒水了', 'out of water', '停水', 'water outage',
-            '水壓不足', 'low water pressure', '水壓低', 'weak water flow',
-            '出水量小', 'small water flow', '水流小',
-            # 供電問題
-            '沒電', 'no power', '停電', 'power outage', '斷電', 'power cut',
-            '燈不亮', 'light not working', '燈壞了', 'light broken',
-            '閃爍', 'flickering', '燈閃', 'light flickering',
-            # 門鎖問題
-            '門壞', 'door broken', '門鎖壞', 'door lock broken',
-            '關不上', "can't close", '鎖不上', "can't lock",
-            '門卡住', 'door stuck', '門關不緊', 'door not closing properly',
-            # 其他設備問題
-            '烘手機壞', 'hand dryer broken', '烘手機不工作', 'hand dryer not working',
-            '感應器壞', 'sensor broken', '感應不良', 'sensor not working',
-            '按鈕壞', 'button broken', '按鈕不靈', 'button not working'
-        ]
-        is_broken = any(word in desc_lower for word in broken_keywords)
-        
-        # 4. 滿出問題
-        full_keywords = [
-            '滿', 'full', '滿出', 'overflowing', '溢出', 'overflow',
-            '裝滿', 'filled up', '滿了', 'is full',
-            '垃圾桶滿', 'trash full', '垃圾滿了', 'trash can full'
-        ]
-        is_full = any(word in desc_lower for word in full_keywords)
-        
-        # 5. 維修問題
-        maintenance_keywords = [
-            '維修', 'maintenance', '修理', 'repair', '修復', 'fix'
-        ]
-        is_maintenance = any(word in desc_lower for word in maintenance_keywords)
-        
-        # 6. 清潔問題（需要清潔但不算嚴重）
-        cleaning_keywords = [
-            '需要清潔', 'needs cleaning', '要清', 'needs clean', '待清潔',
-            '要打掃', 'needs cleaning', '需要打掃', 'needs sweeping',
-            '清潔', 'cleaning', '打掃', 'sweep', '清理', 'clean up',
-            '髒', 'dirty', '不乾淨', 'not clean', '骯髒', 'filthy',
-            '有灰塵', 'dusty', '有污漬', 'stained', '有異味', 'smelly'
-        ]
-        needs_cleaning = any(word in desc_lower for word in cleaning_keywords)
-        
-        # 7. 水質問題（飲水機相關）
-        water_quality_keywords = [
-            '水有異味', 'water has odor', '水有味道', 'water tastes bad',
-            '水質問題', 'water quality issue', '水不乾淨', 'water not clean',
-            '水有雜質', 'water has impurities', '水混濁', 'water cloudy',
-            '無法出水', 'no water flow', '不出水', 'water not flowing',
-            '水溫異常', 'water temperature abnormal', '水太熱', 'water too hot',
-            '水太冷', 'water too cold'
-        ]
-        is_water_quality = any(word in desc_lower for word in water_quality_keywords)
-        
-        # 8. 溫度問題（空調、暖氣等）
-        temperature_keywords = [
-            '太熱', 'too hot', '太冷', 'too cold', '溫度異常', 'temperature abnormal',
-            '空調壞', 'air conditioning broken', '冷氣壞', 'AC broken',
-            '暖氣壞', 'heating broken', '暖氣不工作', 'heating not working'
-        ]
-        is_temperature = any(word in desc_lower for word in temperature_keywords)
-        
-        # 9. 噪音問題
-        noise_keywords = [
-            '有噪音', 'has noise', '噪音', 'noise', '聲音太大', 'too loud',
-            '異音', 'abnormal sound', '奇怪的聲音', 'strange sound',
-            '運轉聲', 'operating sound', '機器聲', 'machine sound'
-        ]
-        is_noise = any(word in desc_lower for word in noise_keywords)
-        
-        # 10. 牆面問題
-        wall_keywords = [
-            '牆面裂縫', 'wall crack', '牆裂', 'cracked wall', '裂縫', 'crack',
-            '壁癌', 'wall mold', '牆面發霉', 'wall mildew', '發霉', 'mold',
-            '油漆剝落', 'paint peeling', '牆面剝落', 'wall peeling', '剝落', 'peeling'
-        ]
-        is_wall = any(word in desc_lower for word in wall_keywords)
-        
-        # 11. 結構問題（漏水、滲水等）
-        structure_keywords = [
-            '屋頂漏水', 'roof leak', '天花板漏水', 'ceiling leak',
-            '窗戶滲水', 'window seepage', '窗戶漏水', 'window leak',
-            '地板翹起', 'floor warping', '地板破損', 'floor damaged',
-            '天花板滲水', 'ceiling seepage', '天花板有水漬', 'ceiling water stain'
-        ]
-        is_structure = any(word in desc_lower for word in structure_keywords)
-        
-        # 12. 電力系統問題
-        electrical_keywords = [
-            '電線老化', 'wire aging', '電線問題', 'wire issue',
-            '插座故障', 'outlet broken', '插座壞', 'outlet not working',
-            '跳電', 'power trip', '短路', 'short circuit',
-            '電路問題', 'circuit issue', '電力異常', 'power abnormal'
-        ]
-        is_electrical = any(word in desc_lower for word in electrical_keywords)
-        
-        # 13. 通風問題
-        ventilation_keywords = [
-            '通風不良', 'poor ventilation', '空氣不流通', 'poor air circulation',
-            '空氣品質差', 'poor air quality', '悶熱', 'stuffy',
-            '空氣異味', 'air odor', '空氣有味道', 'air has smell'
-        ]
-        is_ventilation = any(word in desc_lower for word in ventilation_keywords)
-        
-        # 判斷問題優先級（輕微、中等、嚴重）
-        priority = "minor"  # 默認輕微
-        
-        # 嚴重問題：影響安全或整個設施無法使用
-        if any([
-            is_electrical and ('短路' in desc_lower or 'short circuit' in desc_lower),
-            is_structure and ('屋頂' in desc_lower or 'roof' in desc_lower),
-            is_broken and not is_partial and ('無法使用' in desc_lower or 'unavailable' in desc_lower),
-            is_water_quality
-        ]):
-            priority = "critical"
-        # 中等問題：影響使用但不危險
-        elif any([
-            is_clogged and not is_partial,
-            is_broken and not is_partial,
-            is_temperature and not is_partial,
-            is_structure,
-            is_electrical
-        ]):
-            priority = "moderate"
-        # 輕微問題：部分設備問題或清潔問題
-        else:
-            priority = "minor"
-        
-        # 優先級判斷：衛生問題 > 結構問題 > 電力問題 > 水質問題 > 堵塞 > 損壞 > 滿出 > 溫度 > 通風 > 牆面 > 噪音 > 清潔 > 維修
-        if is_hygiene:
-            # 衛生問題通常是部分損壞（單個設備），需要清潔 - 映射為"待清潔"狀態
-            status = "待清潔"
-            severity = "minor" if is_partial else "major"
-            if language == 'en':
-                notes = f"Hygiene issue: {desc_original}. Requires immediate cleaning."
-            else:
-                notes = f"衛生問題：{desc_original}。需要立即清潔。"
-        
-        elif is_clogged:
-            # 堵塞問題：如果是單個設備，是部分損壞；如果是整個設施，是故障
-            if is_partial:
-                status = "部分損壞"
-                severity = "minor"
-                if language == 'en':
-                    notes = f"Clogged: {desc_original}. Other facilities are functioning normally."
-                else:
-                    notes = f"堵塞：{desc_original}。其他設施正常運作。"
-            else:
-                # 整個設施無法使用，映射為"無法使用"狀態
-                status = "無法使用"
-                severity = "major"
-                if language == 'en':
-                    notes = f"Clogged: {desc_original}. Facility is out of order."
-                else:
-                    notes = f"堵塞：{desc_original}。設施無法使用。"
-        
-        elif is_broken:
-            # 損壞問題
-            if is_partial:
-                status = "部分損壞"
-                severity = "minor"
-                if language == 'en':
-                    notes = f"Broken: {desc_original}. Other facilities are functioning normally."
-                else:
-                    notes = f"損壞：{desc_original}。其他設施正常運作。"
-            else:
-                # 整個設施無法使用，映射為"無法使用"狀態
-                status = "無法使用"
-                severity = "major"
-                if language == 'en':
-                    notes = f"Broken: {desc_original}. Facility is out of order."
-                else:
-                    notes = f"損壞：{desc_original}。設施無法使用。"
-        
-        elif is_full:
-            # 滿出問題
-            status = "滿出"
-            severity = "minor"
-            if language == 'en':
-                notes = f"Full: {desc_original}."
-            else:
-                notes = f"滿出：{desc_original}。"
-        
-        elif is_maintenance:
-            # 維修問題
-            status = "維修中"
-            severity = "major"
-            if language == 'en':
-                notes = f"Under maintenance: {desc_original}."
-            else:
-                notes = f"維修中：{desc_original}。"
-        
-        elif is_water_quality:
-            # 水質問題（飲水機）- 映射為"無法使用"狀態
-            status = "無法使用"
-            severity = "major"
-            if language == 'en':
-                notes = f"Water quality issue: {desc_original}. Facility is out of order."
-            else:
-                notes = f"水質問題：{desc_original}。設施無法使用。"
-        
-        elif is_temperature:
-            # 溫度問題
-            if is_partial:
-                status = "部分損壞"
-                severity = "minor"
-            else:
-                status = "無法使用"
-                severity = "major"
-            if language == 'en':
-                notes = f"Temperature issue: {desc_original}."
-            else:
-                notes = f"溫度問題：{desc_original}。"
-        
-        elif is_noise:
-            # 噪音問題
-            status = "部分損壞"
-            severity = "minor"
-            if language == 'en':
-                notes = f"Noise issue: {desc_original}. Facility still usable but needs attention."
-            else:
-                notes = f"噪音問題：{desc_original}。設施仍可使用但需要關注。"
-        
-        elif is_structure:
-            # 結構問題（漏水、滲水等）- 映射為"無法使用"狀態
-            status = "無法使用"
-            severity = priority
-            if language == 'en':
-                notes = f"Structural issue: {desc_original}. Requires immediate attention."
-            else:
-                notes = f"結構問題：{desc_original}。需要立即處理。"
-        
-        elif is_electrical:
-            # 電力問題 - 映射為"無法使用"狀態
-            status = "無法使用"
-            severity = priority
-            if language == 'en':
-                notes = f"Electrical issue: {desc_original}. Safety concern, requires immediate attention."
-            else:
-                notes = f"電力問題：{desc_original}。安全隱患，需要立即處理。"
-        
-        elif is_wall:
-            # 牆面問題
-            status = "部分損壞"
-            severity = "minor"
-            if language == 'en':
-                notes = f"Wall issue: {desc_original}. Facility still usable but needs repair."
-            else:
-                notes = f"牆面問題：{desc_original}。設施仍可使用但需要修復。"
-        
-        elif is_ventilation:
-            # 通風問題
-            status = "部分損壞"
-            severity = "minor"
-            if language == 'en':
-                notes = f"Ventilation issue: {desc_original}. Air quality concern."
-            else:
-                notes = f"通風問題：{desc_original}。空氣品質問題。"
-        
-        elif needs_cleaning:
-            # 需要清潔 - 映射為"待清潔"狀態
-            status = "待清潔"
-            severity = "minor"
-            if language == 'en':
-                notes = f"Needs cleaning: {desc_original}."
-            else:
-                notes = f"需要清潔：{desc_original}。"
-        
-        else:
-            # 默認：部分損壞（因為通常是指單個設備的問題）
-            status = "部分損壞"
-            severity = "minor"
-            if language == 'en':
-                notes = f"Issue reported: {desc_original}. Other facilities are functioning normally."
-            else:
-                notes = f"問題回報：{desc_original}。其他設施正常運作。"
-        
-        return (status, severity, notes, priority)
+        # 關鍵詞表和決策表見 problem_classifier，單次掃描得出所有問題類別
+        return classify_problem(description, language)
     
     def _get_problem_suggestion(self, status: str, severity: str, language: str) -> str:
         """根據問題類型和嚴重程度提供解決建議"""
@@ -2371,125 +1667,15 @@ class ActionReportFacilityProblem(_BaseAction):
     
     def _parse_multiple_problems(self, description: str, building: str, floor: str, language: str) -> list:
         """解析多個設備問題，例如：'左側第一個小便斗有大便和最靠窗的馬桶堵塞'"""
-        if not description:
-            return []
-        
-        problems = []
-        desc = description.strip()
-        
-        # 分隔符號：和、與、and、,、、
-        separators = ['和', '與', 'and', '、', ',', '，', '還有', 'also']
-        
-        # 檢查是否包含多個問題
-        has_multiple = any(sep in desc for sep in separators)
-        
-        if not has_multiple:
-            # 單一問題
-            return [{
-                'description': desc,
-                'location': self._extract_location_keywords(desc, language),
-                'equipment': self._extract_equipment_keywords(desc, language)
-            }]
-        
-        # 分割多個問題
-        parts = []
-        current_part = desc
-        for sep in separators:
-            if sep in current_part:
-                parts = [p.strip() for p in current_part.split(sep) if p.strip()]
-                break
-        
-        if len(parts) < 2:
-            # 分割失敗，當作單一問題
-            return [{
-                'description': desc,
-                'location': self._extract_location_keywords(desc, language),
-                'equipment': self._extract_equipment_keywords(desc, language)
-            }]
-        
-        # 處理每個部分
-        for part in parts:
-            problems.append({
-                'description': part,
-                'location': self._extract_location_keywords(part, language),
-                'equipment': self._extract_equipment_keywords(part, language)
-            })
-        
-        return problems
+        return parse_multiple_problems(description, language)
     
     def _extract_location_keywords(self, text: str, language: str) -> dict:
         """提取位置關鍵字，例如：左側、右側、最靠窗、第一個等"""
-        location_info = {
-            'side': None,  # 左側、右側
-            'position': None,  # 第一個、第二個、最靠窗
-            'specific': None  # 其他特定位置描述
-        }
-        
-        text_lower = text.lower()
-        
-        # 提取側邊信息（優先檢查完整詞組）
-        if any(word in text for word in ['左側', '左邊', 'left side', 'left']):
-            location_info['side'] = 'left'
-        elif any(word in text for word in ['右側', '右邊', 'right side', 'right']):
-            location_info['side'] = 'right'
-        elif any(word in text for word in ['中間', 'middle', 'center', '中央']):
-            location_info['side'] = 'middle'
-        
-        # 提取位置信息
-        import re
-        
-        # 第一個、第二個等（中文數字或阿拉伯數字）
-        order_patterns = [
-            r'第([一二三四五六七八九十\d]+)[個項]',
-            r'([一二三四五六七八九十\d]+)號',
-            r'第(\d+)[個項]',
-            r'(\d+)號'
-        ]
-        for pattern in order_patterns:
-            order_match = re.search(pattern, text)
-            if order_match:
-                location_info['position'] = order_match.group(0)
-                break
-        
-        # 最靠窗、最裡面、最外面等
-        if any(word in text for word in ['最靠窗', '靠窗', 'near window', 'by window']):
-            location_info['position'] = 'specific'
-            location_info['specific'] = 'window'
-        elif any(word in text for word in ['最裡面', '裡面', 'inside', 'inner']):
-            location_info['position'] = 'specific'
-            location_info['specific'] = 'inside'
-        elif any(word in text for word in ['最外面', '外面', 'outside', 'outer']):
-            location_info['position'] = 'specific'
-            location_info['specific'] = 'outside'
-        elif any(word in text for word in ['最靠近', '靠近', 'near', 'close to']):
-            location_info['position'] = 'specific'
-            location_info['specific'] = 'near'
-        
-        return location_info
+        return extract_location_keywords(text)
     
     def _extract_equipment_keywords(self, text: str, language: str) -> str:
         """提取設備類型關鍵字"""
-        text_lower = text.lower()
-        
-        # 優先檢查完整詞組，避免誤判
-        if any(word in text_lower for word in ['小便斗', 'urinal', '小便池', '小便器']):
-            return 'urinal'
-        elif any(word in text_lower for word in ['馬桶', 'toilet', '坐式馬桶', '坐廁', '座便器']):
-            return 'toilet'
-        elif any(word in text_lower for word in ['洗手台', 'sink', '洗手盆', 'washbasin']):
-            return 'sink'
-        elif any(word in text_lower for word in ['水龍頭', 'faucet', 'tap', '水喉']):
-            return 'faucet'
-        elif any(word in text_lower for word in ['烘手機', 'hand dryer', '乾手機', '烘手器']):
-            return 'hand_dryer'
-        elif any(word in text_lower for word in ['衛生紙', 'toilet paper', '紙巾', 'tissue']):
-            return 'toilet_paper'
-        elif any(word in text_lower for word in ['門', 'door', '門鎖', 'door lock']):
-            return 'door'
-        elif any(word in text_lower for word in ['燈', 'light', '照明', 'lighting']):
-            return 'light'
-        else:
-            return 'unknown'
+        return extract_equipment(text)
     
     def _handle_multiple_problems(
         self, dispatcher, problems: list, building: str, floor: str, 
@@ -2500,7 +1686,11 @@ class ActionReportFacilityProblem(_BaseAction):
         
         for i, problem in enumerate(problems, 1):
             desc = problem['description']
-            status, severity, notes, priority = self._analyze_problem(desc, language)
+            # 解析時已按片段分類，無需再掃描一次
+            if 'status' in problem:
+                status, severity, notes = problem['status'], problem['severity'], problem['notes']
+            else:
+                status, severity, notes, priority = self._analyze_problem(desc, language)
             
             # 構建設備描述
             equipment = problem.get('equipment', 'unknown')
@@ -2606,49 +1796,9 @@ class ActionQueryBuildingFacilities(_BaseAction):
         language = self.get_language(tracker)
         building = tracker.get_slot("building")
         
-        # 建築名稱映射（支持所有建築，包括拼寫變體）
-        building_map = {
-            # 第一校區
-            "第一教學大樓": "第一教學大樓", "first teaching building": "第一教學大樓",
-            "第二教學大樓": "第二教學大樓", "second teaching building": "第二教學大樓",
-            "第三教學大樓": "第三教學大樓", "third teaching building": "第三教學大樓",
-            "第四教學大樓": "第四教學大樓", "fourth teaching building": "第四教學大樓",
-            "行政大樓": "行政大樓", "administration building": "行政大樓", "行政": "行政大樓",
-            "圖書館": "圖書館", "library": "圖書館",
-            "飛機館": "飛機館", "電機工程館": "飛機館", "電機館": "飛機館",
-            "機械工程館": "機械工程館", "機械館": "機械工程館",
-            "資訊休閒大樓": "資訊休閒大樓",
-            "紅館": "紅館",
-            "綠館": "綠館",
-            "學生活動中心": "學生活動中心", "活動中心": "學生活動中心",
-            # 第二校區
-            "科技研究中心": "科技研究中心", "科技中心": "科技研究中心",
-            "綜一館": "綜一館", "綜合一館": "綜一館",
-            "綜二館": "綜二館", "綜合二館": "綜二館",
-            "綜三館": "綜三館", "粽三館": "綜三館", "粽三": "綜三館", "綜三": "綜三館",
-            "綜合三館": "綜三館", "zongsan building": "綜三館", "zongsan": "綜三館",
-            "電機館": "電機館", "第二校區電機館": "電機館",
-            # 第三校區
-            "操場": "操場", "playground": "操場",
-            "游泳池": "游泳池", "swimming pool": "游泳池",
-            "體育館": "體育館(經國館)", "經國館": "體育館(經國館)", "經國體育館": "體育館(經國館)",
-            "人文大樓": "人文大樓",
-            "文理暨管理大樓": "文理暨管理大樓", "文理大樓": "文理暨管理大樓"
-        }
-        
-        # 標準化建築物名稱（支持拼寫變體）
-        building_normalized = building_map.get(building, building_map.get(building.lower() if building else "", building or ""))
-        
-        # 如果還是找不到，嘗試從消息中提取
-        if not building_normalized or building_normalized == (building or ""):
-            last_message = tracker.latest_message.get("text", "") or ""
-            text_lower = last_message.lower()
-            # 按長度排序，優先匹配較長的建築物名稱
-            sorted_keys = sorted(building_map.keys(), key=len, reverse=True)
-            for key in sorted_keys:
-                if key.lower() in text_lower:
-                    building_normalized = building_map[key]
-                    break
+        # 標準化建築物名稱（支持拼寫變體），找不到時從消息中提取
+        last_message = tracker.latest_message.get("text", "") or ""
+        building_normalized = building_gazetteer.normalize(building, last_message) or building or ""
         
         if language == 'en':
             response_text = f"Querying facilities in {building_normalized}..."
@@ -2687,19 +1837,9 @@ class ActionGetSmartRoute(_BaseAction):
         domain: Dict[Text, Any],
     ) -> List[Dict[Text, Any]]:
         language = self.get_language(tracker)
-        last_message = tracker.latest_message.get("text", "") or ""
         
         # 從消息中提取設施類型
-        facility_type = None
-        text_lower = last_message.lower()
-        if any(word in text_lower for word in ['廁所', 'toilet', 'restroom', 'bathroom']):
-            facility_type = 'toilet'
-        elif any(word in text_lower for word in ['飲水機', 'water', 'water fountain']):
-            facility_type = 'water'
-        elif any(word in text_lower for word in ['垃圾桶', 'trash', 'garbage']):
-            facility_type = 'trash'
-        else:
-            facility_type = 'toilet'  # 默認
+        facility_type = self.get_features(tracker).facility_type or 'toilet'  # 默認廁所
         
         if language == 'en':
             response_data = {
@@ -2801,17 +1941,9 @@ class ActionSetPreference(_BaseAction):
         domain: Dict[Text, Any],
     ) -> List[Dict[Text, Any]]:
         language = self.get_language(tracker)
-        last_message = tracker.latest_message.get("text", "") or ""
-        text_lower = last_message.lower()
         
         # 從消息中提取設施類型
-        facility_type = None
-        if any(word in text_lower for word in ['廁所', 'toilet', 'restroom', 'bathroom']):
-            facility_type = 'toilet'
-        elif any(word in text_lower for word in ['飲水機', 'water', 'water fountain']):
-            facility_type = 'water'
-        elif any(word in text_lower for word in ['垃圾桶', 'trash', 'garbage']):
-            facility_type = 'trash'
+        facility_type = self.get_features(tracker).facility_type
         
         # 記住用戶偏好
         if facility_type:
@@ -2898,20 +2030,13 @@ class ActionQuickReport(_BaseAction):
         domain: Dict[Text, Any],
     ) -> List[Dict[Text, Any]]:
         language = self.get_language(tracker)
+        response_key = 'en' if language == 'en' else 'zh'
         
-        if language == 'en':
-            response_text = "I'll help you quickly report a problem at your current location. Please describe the issue."
-        else:
-            response_text = "我將幫您快速回報當前位置的問題。請描述一下問題。"
-        
-        dispatcher.utter_message(text=response_text)
+        dispatcher.utter_message(text=response_registry.get('action_quick_report.text', response_key))
         
-        response_data = {
-            "action": "quick_report",
-            "message": response_text,
-            "language": language,
-            "timestamp": datetime.now().isoformat()
-        }
+        response_data = response_registry.get('action_quick_report', response_key)
+        response_data["language"] = language
+        response_data["timestamp"] = datetime.now().isoformat()
         
         dispatcher.utter_message(custom=response_data)
         return [SlotSet("language", language)]
@@ -2963,18 +2088,7 @@ class ActionGetUserLocation(_BaseAction):
     ) -> List[Dict[Text, Any]]:
         language = self.get_language(tracker)
         
-        if language == 'en':
-            response_data = {
-                "action": "get_user_location",
-                "message": "Getting your current GPS location...",
-                "language": "en"
-            }
-        else:
-            response_data = {
-                "action": "get_user_location",
-                "message": "正在獲取您目前的 GPS 位置...",
-                "language": "zh"
-            }
+        response_data = response_registry.get('action_get_user_location', 'en' if language == 'en' else 'zh')
         
         dispatcher.utter_message(custom=response_data)
         return [SlotSet("language", language)]
@@ -2993,19 +2107,9 @@ class ActionFindNearestFunctionalFacility(_BaseAction):
         domain: Dict[Text, Any],
     ) -> List[Dict[Text, Any]]:
         language = self.get_language(tracker)
-        last_message = tracker.latest_message.get("text", "") or ""
         
         # 從消息中提取設施類型
-        facility_type = None
-        text_lower = last_message.lower()
-        if any(word in text_lower for word in ['廁所', 'toilet', 'restroom', 'bathroom']):
-            facility_type = 'toilet'
-        elif any(word in text_lower for word in ['飲水機', 'water', 'water fountain', 'water dispenser']):
-            facility_type = 'water'
-        elif any(word in text_lower for word in ['垃圾桶', 'trash', 'garbage', 'trash can']):
-            facility_type = 'trash'
-        else:
-            facility_type = tracker.get_slot("facility_type") or 'toilet'
+        facility_type = self.get_features(tracker).facility_type or tracker.get_slot("facility_type") or 'toilet'
         
         if language == 'en':
             facility_name = {
@@ -3145,19 +2249,9 @@ class ActionNavigateToFunctionalFacility(_BaseAction):
         domain: Dict[Text, Any],
     ) -> List[Dict[Text, Any]]:
         language = self.get_language(tracker)
-        last_message = tracker.latest_message.get("text", "") or ""
         
         # 從消息中提取設施類型
-        facility_type = None
-        text_lower = last_message.lower()
-        if any(word in text_lower for word in ['廁所', 'toilet', 'restroom', 'bathroom']):
-            facility_type = 'toilet'
-        elif any(word in text_lower for word in ['飲水機', 'water', 'water fountain']):
-            facility_type = 'water'
-        elif any(word in text_lower for word in ['垃圾桶', 'trash', 'garbage']):
-            facility_type = 'trash'
-        else:
-            facility_type = tracker.get_slot("facility_type") or 'toilet'
+        facility_type = self.get_features(tracker).facility_type or tracker.get_slot("facility_type") or 'toilet'
         
         if language == 'en':
             facility_name = {
@@ -3416,20 +2510,13 @@ class ActionRecommendFacility(_BaseAction):
         domain: Dict[Text, Any],
     ) -> List[Dict[Text, Any]]:
         language = self.get_language(tracker)
-        last_message = tracker.latest_message.get("text", "") or ""
         
-        # 從消息中提取設施類型
-        facility_type = None
-        text_lower = last_message.lower()
-        if any(word in text_lower for word in ['廁所', 'toilet', 'restroom', 'bathroom']):
-            facility_type = 'toilet'
-        elif any(word in text_lower for word in ['飲水機', 'water', 'water fountain']):
-            facility_type = 'water'
-        elif any(word in text_lower for word in ['垃圾桶', 'trash', 'garbage']):
-            facility_type = 'trash'
-        else:
-            # 使用用戶偏好
-            facility_type = self.recall(tracker, "preferred_facility_type") or 'toilet'
+        # 從消息中提取設施類型，沒有時使用用戶偏好
+        facility_type = (
+            self.get_features(tracker).facility_type
+            or self.recall(tracker, "preferred_facility_type")
+            or 'toilet'
+        )
         
         # 推薦因素
         recommendation_factors = {
@@ -3655,19 +2742,9 @@ class ActionBatchQueryFacilities(_BaseAction):
         domain: Dict[Text, Any],
     ) -> List[Dict[Text, Any]]:
         language = self.get_language(tracker)
-        last_message = tracker.latest_message.get("text", "") or ""
         
         # 從消息中提取多個設施類型
-        facility_types = []
-        text_lower = last_message.lower()
-        
-        # 檢測多個設施類型
-        if any(word in text_lower for word in ['廁所', 'toilet', 'restroom', 'bathroom']):
-            facility_types.append('toilet')
-        if any(word in text_lower for word in ['飲水機', 'water', 'water fountain', 'water dispenser']):
-            facility_types.append('water')
-        if any(word in text_lower for word in ['垃圾桶', 'trash', 'garbage', 'trash can']):
-            facility_types.append('trash')
+        facility_types = list(self.get_features(tracker).facility_types)
         
         # 如果沒有檢測到，使用 slot
         if not facility_types:
@@ -4262,108 +3339,17 @@ class ActionAskBuildingInfo(_BaseAction):
         building = tracker.get_slot("building") or ""
         last_message = tracker.latest_message.get("text", "") or ""
         
-        # 獲取對話歷史，用於上下文理解
-        events = tracker.events
-        recent_messages = []
-        for event in reversed(events[-10:]):  # 只檢查最近10條消息
-            if hasattr(event, 'text') and event.text:
-                recent_messages.append(event.text)
-        
-        # 建築名稱映射（包括拼寫變體和所有別名）
-        building_map = {
-            # 第一校區
-            "第一教學大樓": "第一教學大樓", "第一教學": "第一教學大樓", "一教": "第一教學大樓", 
-            "第一教": "第一教學大樓", "教學大樓一": "第一教學大樓", "first teaching building": "第一教學大樓",
-            "第二教學大樓": "第二教學大樓", "第二教學": "第二教學大樓", "二教": "第二教學大樓",
-            "第二教": "第二教學大樓", "教學大樓二": "第二教學大樓", "second teaching building": "第二教學大樓",
-            "第三教學大樓": "第三教學大樓", "第三教學": "第三教學大樓", "三教": "第三教學大樓",
-            "第三教": "第三教學大樓", "教學大樓三": "第三教學大樓", "third teaching building": "第三教學大樓",
-            "第四教學大樓": "第四教學大樓", "第四教學": "第四教學大樓", "四教": "第四教學大樓",
-            "第四教": "第四教學大樓", "教學大樓四": "第四教學大樓", "fourth teaching building": "第四教學大樓",
-            "行政大樓": "行政大樓", "行政": "行政大樓", "行政館": "行政大樓",
-            "administration building": "行政大樓", "admin building": "行政大樓",
-            "圖書館": "圖書館", "圖書": "圖書館", "library": "圖書館", "lib": "圖書館",
-            "飛機館": "飛機館", "電機工程館": "飛機館", "電機館": "飛機館", "電機": "飛機館",
-            "electrical engineering building": "飛機館", "ee building": "飛機館",
-            "機械工程館": "機械工程館", "機械館": "機械工程館", "機械": "機械工程館",
-            "mechanical engineering building": "機械工程館", "me building": "機械工程館",
-            "資訊休閒大樓": "資訊休閒大樓", "資訊休閒館": "資訊休閒大樓",
-            "information and recreation building": "資訊休閒大樓",
-            "紅館": "紅館", "red building": "紅館", "red hall": "紅館",
-            "綠館": "綠館", "green building": "綠館", "green hall": "綠館",
-            "學生活動中心": "學生活動中心", "活動中心": "學生活動中心",
-            "student activity center": "學生活動中心", "activity center": "學生活動中心",
-            # 第二校區
-            "科技研究中心": "科技研究中心", "科技中心": "科技研究中心", "研究中心": "科技研究中心",
-            "technology research center": "科技研究中心", "tech center": "科技研究中心",
-            "綜一館": "綜一館", "綜合一館": "綜一館", "綜合教學大樓第一館": "綜一館", "綜一": "綜一館",
-            "comprehensive building one": "綜一館", "comp building 1": "綜一館",
-            "綜二館": "綜二館", "綜合二館": "綜二館", "綜合教學大樓第二館": "綜二館", "綜二": "綜二館",
-            "comprehensive building two": "綜二館", "comp building 2": "綜二館",
-            "綜三館": "綜三館", "粽三館": "綜三館", "粽三": "綜三館", "綜三": "綜三館",
-            "粽三管": "綜三館", "綜三管": "綜三館", "綜合三館": "綜三館", "綜合教學大樓第三館": "綜三館",
-            "zongsan building": "綜三館", "zongsan": "綜三館", "comprehensive building three": "綜三館",
-            "電機館": "電機館", "電機工程館": "電機館", "電機": "電機館",
-            "electrical engineering building": "電機館", "ee building": "電機館",
-            # 第三校區
-            "操場": "操場", "運動場": "操場", "playground": "操場", "sports field": "操場", "field": "操場",
-            "游泳池": "游泳池", "泳池": "游泳池", "swimming pool": "游泳池", "pool": "游泳池",
-            "體育館": "體育館(經國館)", "經國館": "體育館(經國館)", "經國體育館": "體育館(經國館)",
-            "gymnasium": "體育館(經國館)", "gym": "體育館(經國館)", "sports center": "體育館(經國館)",
-            "人文大樓": "人文大樓", "人文館": "人文大樓",
-            "humanities building": "人文大樓", "humanities": "人文大樓",
-            "文理暨管理大樓": "文理暨管理大樓", "文理大樓": "文理暨管理大樓", "文理管理大樓": "文理暨管理大樓",
-            "文理館": "文理暨管理大樓",
-            "liberal arts and management building": "文理暨管理大樓", "lam building": "文理暨管理大樓"
-        }
-        
         # 智能提取建築物名稱（多層次匹配）
-        building_normalized = None
-        
-        # 1. 優先使用 slot 中的值
-        if building:
-            building_normalized = building_map.get(building, building_map.get(building.lower() if building else "", building))
-        
-        # 2. 如果 slot 沒有，從當前消息中提取
-        if not building_normalized or building_normalized == building:
-            text_lower = last_message.lower()
-            # 按長度排序，優先匹配較長的建築物名稱（避免誤匹配）
-            sorted_keys = sorted(building_map.keys(), key=len, reverse=True)
-            for key in sorted_keys:
-                if key.lower() in text_lower:
-                    building_normalized = building_map[key]
-                    break
+        # 1. 優先使用 slot 中的值；2. 從當前消息中提取
+        building_normalized = building_gazetteer.normalize(building, last_message)
         
         # 3. 如果還是找不到，從對話歷史中查找（上下文理解）
-        if not building_normalized or building_normalized == building:
-            for msg in recent_messages:
-                if msg and msg != last_message:
-                    msg_lower = msg.lower()
-                    sorted_keys = sorted(building_map.keys(), key=len, reverse=True)
-                    for key in sorted_keys:
-                        if key.lower() in msg_lower:
-                            building_normalized = building_map[key]
-                            break
-                    if building_normalized:
-                        break
-        
-        # 4. 如果還是找不到，使用模糊匹配（Levenshtein 距離）
-        if not building_normalized or building_normalized == building:
-            import difflib
-            text_lower = last_message.lower()
-            best_match = None
-            best_ratio = 0.6  # 相似度閾值
-            
-            for key, value in building_map.items():
-                # 檢查是否包含關鍵字
-                if len(key) >= 2 and key.lower() in text_lower:
-                    ratio = difflib.SequenceMatcher(None, text_lower, key.lower()).ratio()
-                    if ratio > best_ratio:
-                        best_ratio = ratio
-                        best_match = value
-            
-            if best_match:
-                building_normalized = best_match
+        if not building_normalized:
+            building_normalized = building_gazetteer.find_in(self.get_recent_user_texts(tracker))
+        
+        # 4. 如果還是找不到，使用容錯匹配（允許錯字）
+        if not building_normalized:
+            building_normalized = building_index.best_in_text(last_message)
         
         # 如果最終還是找不到，使用原始值
         if not building_normalized:
@@ -4540,7 +3526,25 @@ class ActionGeminiFallback(_BaseAction):
     def name(self) -> Text:
         return "action_gemini_fallback"
     
-    def _run(
+    async def run(
+        self,
+        dispatcher: CollectingDispatcher,
+        tracker: Tracker,
+        domain: Dict[Text, Any],
+    ) -> List[Dict[Text, Any]]:
+        """
+        異步執行：等待 Gemini 回應和配額重試時不佔用 action server 的線程
+        錯誤處理與 safe_run 相同
+        """
+        try:
+            return await self._run_async(dispatcher, tracker, domain)
+        except Exception as e:
+            logger.error(f"Error in {self.name()}: {str(e)}", exc_info=True)
+            language = self.get_language(tracker)
+            dispatcher.utter_message(text=self.get_error_message('general', language))
+            return []
+    
+    async def _run_async(
         self,
         dispatcher: CollectingDispatcher,
         tracker: Tracker,
@@ -4606,13 +3610,23 @@ class ActionGeminiFallback(_BaseAction):
                 return self._send_default_response(dispatcher, language)
             
             # 構建對話上下文（可選，智能選擇）
-            conversation_context = self._build_conversation_context(tracker)
+            conversation_context = self._build_conversation_context(tracker, latest_message, language)
             
             # 決定是否使用上下文（簡單問題不需要上下文）
             use_context = len(latest_message) > 30 or conversation_context
             
-            # 生成回應（帶重試機制和緩存）
-            gemini_response = gemini_client.generate_response(
+            # 前端支持 SSE 時（訊息 metadata 帶 stream: true）先返回 stream_id，回應在後台逐段生成
+            if self._wants_stream(tracker):
+                return self._start_stream(
+                    dispatcher,
+                    gemini_client,
+                    latest_message,
+                    conversation_context if use_context else None,
+                    language
+                )
+            
+            # 生成回應（帶重試機制和緩存，總時限為 GEMINI_TIMEOUT）
+            gemini_response = await gemini_client.generate_response_async(
                 user_message=latest_message,
                 conversation_context=conversation_context if use_context else None,
                 language=language,
@@ -4642,53 +3656,96 @@ class ActionGeminiFallback(_BaseAction):
             logger.error(f"Gemini fallback 處理失敗: {error_msg}。使用默認 fallback 回應。", exc_info=False)
             return self._send_default_response(dispatcher, language)
     
-    def _build_conversation_context(self, tracker: Tracker) -> list:
+    def _wants_stream(self, tracker: Tracker) -> bool:
         """
-        構建對話上下文
+        判斷是否以流式模式回應
         
         Args:
             tracker: Rasa tracker
             
         Returns:
-            list: 對話上下文列表
+            bool: 前端請求流式回應且當前服務器提供 /stream 路由時返回 True
+        """
+        from .streaming import stream_registry
+        
+        if not stream_registry.enabled:
+            return False
+        metadata = (tracker.latest_message or {}).get('metadata') or {}
+        return bool(metadata.get('stream'))
+    
+    def _start_stream(
+        self,
+        dispatcher: CollectingDispatcher,
+        gemini_client: Any,
+        user_message: str,
+        conversation_context: Optional[list],
+        language: str
+    ) -> List[Dict[Text, Any]]:
         """
-        context = []
+        在後台生成回應並寫入回應流，立即返回 stream_id 給前端
         
+        Args:
+            dispatcher: Rasa dispatcher
+            gemini_client: Gemini 客戶端
+            user_message: 用戶訊息
+            conversation_context: 對話上下文
+            language: 語言代碼
+            
+        Returns:
+            List of events
+        """
+        from .streaming import stream_registry
+        
+        stream = stream_registry.create()
+        
+        async def produce() -> None:
+            final_text = None
+            try:
+                final_text = await gemini_client.generate_response_async(
+                    user_message=user_message,
+                    conversation_context=conversation_context,
+                    language=language,
+                    max_retries=1,
+                    use_cache=True,
+                    on_chunk=stream.append
+                )
+            except Exception as e:
+                logger.error(f"Gemini 流式回應生成失敗: {str(e)}")
+            finally:
+                stream.finish(final_text)
+        
+        stream.task = asyncio.get_running_loop().create_task(produce())
+        
+        dispatcher.utter_message(custom={
+            "action": "stream_response",
+            "stream_id": stream.stream_id,
+            "stream_path": f"/stream/{stream.stream_id}",
+            "fallback_message": self._default_response_text(language),
+            "language": language
+        })
+        logger.info(f"Gemini 流式回應已開始（stream_id: {stream.stream_id}，語言: {language}）")
+        return [SlotSet("language", language)]
+    
+    def _build_conversation_context(self, tracker: Tracker, latest_message: str, language: str) -> list:
+        """
+        構建對話上下文（按 GEMINI_CONTEXT_BUDGET 的 token 預算，
+        丟棄按鈕 payload 和重複的模板回覆，較早的輪次折疊成話題摘要）
+        
+        Args:
+            tracker: Rasa tracker
+            latest_message: 當前用戶訊息
+            language: 語言代碼
+            
+        Returns:
+            list: 對話上下文列表
+        """
         try:
-            # 獲取最近的對話歷史（智能選擇，最多 3 條）
-            recent_events = []
-            for event in reversed(tracker.events):
-                if len(recent_events) >= 3:  # 進一步減少到 3 條以節省 token
-                    break
-                
-                # 處理不同格式的 event
-                event_type = None
-                text = None
-                
-                if isinstance(event, dict):
-                    event_type = event.get('event')
-                    text = event.get('text', '')
-                elif hasattr(event, 'event_type'):
-                    event_type = event.event_type
-                    text = getattr(event, 'text', '')
-                elif hasattr(event, 'type'):
-                    event_type = event.type
-                    text = getattr(event, 'text', '')
-                
-                if event_type == 'user' and text:
-                    text_clean = text.strip()
-                    if text_clean and len(text_clean) <= 200:  # 限制長度
-                        recent_events.insert(0, f"用戶: {text_clean}")
-                elif event_type == 'bot' and text:
-                    text_clean = text.strip()
-                    if text_clean and len(text_clean) <= 200:  # 限制長度
-                        recent_events.insert(0, f"助手: {text_clean}")
+            from .context_builder import context_builder
             
-            context = recent_events
+            return context_builder.build(tracker.sender_id, tracker.events, latest_message, language)
         except Exception as e:
             logger.warning(f"構建對話上下文失敗: {str(e)}")
-        
-        return context
+            return []
     
     def _send_default_response(
         self,
@@ -4705,6 +3762,19 @@ class ActionGeminiFallback(_BaseAction):
         Returns:
             List of events
         """
+        dispatcher.utter_message(text=self._default_response_text(language))
+        return [SlotSet("language", language)]
+    
+    def _default_response_text(self, language: str) -> str:
+        """
+        隨機選擇一條默認 fallback 回應
+        
+        Args:
+            language: 語言代碼
+            
+        Returns:
+            str: 默認回應文字
+        """
         default_responses = {
             'zh': [
                 "抱歉，我不太確定您的意思。您可以問我關於校園設施的問題，例如：\n• 最近的廁所在哪裡？\n• 哪裡有飲水機？\n• 查詢設施狀態",
@@ -4719,10 +3789,7 @@ class ActionGeminiFallback(_BaseAction):
         }
         
         response_list = default_responses.get(language, default_responses['zh'])
-        response = random.choice(response_list)
-        
-        dispatcher.utter_message(text=response)
-        return [SlotSet("language", language)]
+        return random.choice(response_list)
 
 
 class ActionGeminiStats(_BaseAction):
@@ -4767,6 +3834,7 @@ class ActionGeminiStats(_BaseAction):
                 return [SlotSet("language", language)]
             
             stats = gemini_client.get_stats()
+            breaker_states = ', '.join(f"{name} {breaker['state']}" for name, breaker in stats['breakers'].items())
             
             # 格式化統計資訊
             if language == 'en':
@@ -4776,10 +3844,13 @@ class ActionGeminiStats(_BaseAction):
 💾 Cache Hits: {stats['cache_hits']}
 🔄 Cache Misses: {stats['cache_misses']}
 📈 Cache Hit Rate: {stats['cache_hit_rate']}
+🔗 Coalesced Requests: {stats['coalesced_requests']}
 ✅ Successful Responses: {stats['successful_responses']}
 ❌ API Errors: {stats['api_errors']}
+🔀 Model Failovers: {stats['failovers']}
 💾 Cache Size: {stats['cache_size']} entries
-🤖 Model: {stats['model']}"""
+🤖 Model: {stats['model']}
+🔌 Circuit Breakers: {breaker_states}"""
             else:
                 stats_message = f"""📊 Gemini API 統計資訊：
 
@@ -4787,10 +3858,13 @@ class ActionGeminiStats(_BaseAction):
 💾 緩存命中：{stats['cache_hits']}
 🔄 緩存未命中：{stats['cache_misses']}
 📈 緩存命中率：{stats['cache_hit_rate']}
+🔗 合併的相同請求：{stats['coalesced_requests']}
 ✅ 成功回應：{stats['successful_responses']}
 ❌ API 錯誤：{stats['api_errors']}
+🔀 切換備用模型：{stats['failovers']}
 💾 緩存大小：{stats['cache_size']} 條
-🤖 模型：{stats['model']}"""
+🤖 模型：{stats['model']}
+🔌 熔斷器：{breaker_states}"""
             
             dispatcher.utter_message(text=stats_message)
             return [SlotSet("language", language)]
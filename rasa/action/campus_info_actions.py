@@ -11,6 +11,9 @@ from datetime import datetime
 import random
 import logging
 
+from .responses import response_registry
+from .utils import detect_language
+
 logger = logging.getLogger(__name__)
 
 # 嘗試導入 _BaseAction（以下劃線開頭，避免被 Rasa SDK 註冊）
@@ -36,17 +39,49 @@ def get_language_from_tracker(tracker: Tracker) -> str:
         if not last_message:
             return 'zh'
         
-        # 檢查是否包含中文字符
-        import re
-        chinese_pattern = re.compile(r'[\u4e00-\u9fff]')
-        has_chinese = bool(chinese_pattern.search(last_message))
-        
-        return 'zh' if has_chinese else 'en'
+        return detect_language(last_message)
     except Exception as e:
         logger.error(f"Error getting language: {str(e)}")
         return 'zh'
 
 
+# 常見建築資訊（名稱的小寫形式預先計算，匹配時不必每次轉換）
+_BUILDINGS_INFO_TEXT = {
+    'zh': {
+        '綜三館': '綜三館是校園內的主要建築之一，設有1-10樓，每層樓都有獨立的設施狀態管理。',
+        '行政大樓': '行政大樓是校園的行政中心，提供各項行政服務。',
+        '圖書館': '圖書館提供豐富的學習資源和安靜的學習環境。'
+    },
+    'en': {
+        'Zongsan Building': 'Zongsan Building is one of the main buildings on campus, with floors 1-10, each with independent facility status management.',
+        'Administration Building': 'The Administration Building is the administrative center of the campus, providing various administrative services.',
+        'Library': 'The library provides rich learning resources and a quiet study environment.'
+    }
+}
+BUILDINGS_INFO = {
+    language: {'info': info, 'names': tuple((name, name.lower()) for name in info)}
+    for language, info in _BUILDINGS_INFO_TEXT.items()
+}
+
+# 校園小貼士
+CAMPUS_TIPS = {
+    'zh': (
+        "使用 AI 助手快速找到最近的設施",
+        "定期檢查設施狀態，選擇最佳設施使用",
+        "回報設施問題有助於維護校園環境",
+        "利用智能路線規劃功能節省時間",
+        "三個校區都有豐富的設施資源"
+    ),
+    'en': (
+        "Use AI assistant to quickly find nearest facilities",
+        "Regularly check facility status to choose the best ones",
+        "Reporting facility issues helps maintain campus environment",
+        "Use smart route planning to save time",
+        "All three campuses have rich facility resources"
+    ),
+}
+
+
 # 使用 BaseAction 如果可用，否則使用 Action
 BaseActionClass = BaseAction if BASE_ACTION_AVAILABLE else Action
 
@@ -66,27 +101,8 @@ class ActionAskCampusEvents(BaseActionClass):
         try:
             language = get_language_from_tracker(tracker)
             
-            # 模擬校園活動資料（專題展示用）
-            events = [
-                {"name": "校園導覽日", "date": "每月第一個週六", "location": "行政大樓"},
-                {"name": "校園開放日", "date": "每學期初", "location": "各校區"},
-                {"name": "設施體驗活動", "date": "不定期舉辦", "location": "各校區設施"}
-            ] if language == 'zh' else [
-                {"name": "Campus Tour Day", "date": "First Saturday of each month", "location": "Administration Building"},
-                {"name": "Campus Open Day", "date": "Beginning of each semester", "location": "All Campuses"},
-                {"name": "Facility Experience Event", "date": "Occasionally", "location": "Campus Facilities"}
-            ]
-            
-            if language == 'en':
-                response_text = "📅 **Campus Events:**\n\n"
-                for event in events:
-                    response_text += f"• **{event['name']}**\n  📍 Location: {event['location']}\n  📆 Date: {event['date']}\n\n"
-                response_text += "💡 This is a demonstration project. For actual event information, please check the official campus website."
-            else:
-                response_text = "📅 **校園活動：**\n\n"
-                for event in events:
-                    response_text += f"• **{event['name']}**\n  📍 地點：{event['location']}\n  📆 時間：{event['date']}\n\n"
-                response_text += "💡 這是專題展示系統。實際活動資訊請查閱校園官方網站。"
+            # 活動文本在導入時已組裝好（見 responses.py）
+            response_text = response_registry.get(self.name(), 'en' if language == 'en' else 'zh')
             
             dispatcher.utter_message(text=response_text)
             return [SlotSet("language", language)]
@@ -112,30 +128,17 @@ class ActionAskBuildingInfo(Action):
         language = get_language_from_tracker(tracker)
         last_message = tracker.latest_message.get("text", "") or ""
         
-        # 常見建築資訊
-        buildings_info = {
-            'zh': {
-                '綜三館': '綜三館是校園內的主要建築之一，設有1-10樓，每層樓都有獨立的設施狀態管理。',
-                '行政大樓': '行政大樓是校園的行政中心，提供各項行政服務。',
-                '圖書館': '圖書館提供豐富的學習資源和安靜的學習環境。'
-            },
-            'en': {
-                'Zongsan Building': 'Zongsan Building is one of the main buildings on campus, with floors 1-10, each with independent facility status management.',
-                'Administration Building': 'The Administration Building is the administrative center of the campus, providing various administrative services.',
-                'Library': 'The library provides rich learning resources and a quiet study environment.'
-            }
-        }
-        
-        info_dict = buildings_info[language]
+        info_dict = BUILDINGS_INFO['en' if language == 'en' else 'zh']
         building_found = None
         
-        for building_name in info_dict.keys():
-            if building_name.lower() in last_message.lower():
+        last_message_lower = last_message.lower()
+        for building_name, building_name_lower in info_dict['names']:
+            if building_name_lower in last_message_lower:
                 building_found = building_name
                 break
         
         if building_found:
-            response_text = f"🏢 **{building_found}**\n\n{info_dict[building_found]}"
+            response_text = f"🏢 **{building_found}**\n\n{info_dict['info'][building_found]}"
         else:
             if language == 'en':
                 response_text = "🏢 **Building Information**\n\nI can provide information about buildings on campus such as Zongsan Building, Administration Building, and Library. Which building would you like to know about?"
@@ -362,19 +365,7 @@ class ActionAskCampusTips(Action):
     ) -> List[Dict[Text, Any]]:
         language = get_language_from_tracker(tracker)
         
-        tips = [
-            "使用 AI 助手快速找到最近的設施",
-            "定期檢查設施狀態，選擇最佳設施使用",
-            "回報設施問題有助於維護校園環境",
-            "利用智能路線規劃功能節省時間",
-            "三個校區都有豐富的設施資源"
-        ] if language == 'zh' else [
-            "Use AI assistant to quickly find nearest facilities",
-            "Regularly check facility status to choose the best ones",
-            "Reporting facility issues helps maintain campus environment",
-            "Use smart route planning to save time",
-            "All three campuses have rich facility resources"
-        ]
+        tips = CAMPUS_TIPS['zh'] if language == 'zh' else CAMPUS_TIPS['en']
         
         selected_tips = random.sample(tips, 3)
         
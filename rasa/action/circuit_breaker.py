@@ -0,0 +1,150 @@
+"""
+模型熔斷器
+每個 Gemini 模型一個熔斷器：連續出現配額限制（429）或超時達到閾值時打開，
+打開期間請求直接改用下一個可用的備用模型，不再等待重試；
+冷卻時間過後進入半開狀態，只放行一個探測請求，成功則關閉，失敗則重新打開
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    單個模型的熔斷器（線程安全）
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 3, recovery_timeout: float = 30.0):
+        """
+        初始化熔斷器
+
+        Args:
+            name: 模型名稱
+            failure_threshold: 連續失敗多少次後打開
+            recovery_timeout: 打開後多久進入半開狀態（秒）；半開探測超過此時間沒有結果時允許新的探測
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_until = 0.0
+        self._probe_started: Optional[float] = None
+
+        # 統計資訊
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        """當前狀態（打開且冷卻時間已過時報告為半開）"""
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() >= self._opened_until:
+                return self.HALF_OPEN
+            return self._state
+
+    def available(self) -> bool:
+        """
+        是否可以發送請求（不佔用半開狀態的探測名額）
+
+        Returns:
+            bool: 關閉狀態，或可以發送探測請求時返回 True
+        """
+        with self._lock:
+            return self._can_pass(time.monotonic())
+
+    def allow(self) -> bool:
+        """
+        申請發送請求；半開狀態下只有第一個申請者獲得探測名額
+
+        Returns:
+            bool: 允許發送時返回 True
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not self._can_pass(now):
+                self.rejected += 1
+                return False
+            if self._state != self.CLOSED:
+                self._state = self.HALF_OPEN
+                self._probe_started = now
+            return True
+
+    def _can_pass(self, now: float) -> bool:
+        """是否可以放行（調用方持有鎖）"""
+        if self._state == self.CLOSED:
+            return True
+        if self._state == self.OPEN:
+            return now >= self._opened_until
+        # 半開：沒有進行中的探測，或探測已超時（例如被取消、沒有回報結果）
+        return self._probe_started is None or now - self._probe_started >= self.recovery_timeout
+
+    def record_success(self) -> None:
+        """記錄成功，關閉熔斷器"""
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit breaker for {self.name} closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_started = None
+
+    def record_failure(self, retry_after: float = 0.0) -> None:
+        """
+        記錄一次配額限制或超時
+
+        Args:
+            retry_after: 服務端建議的重試等待時間（秒），打開時冷卻時間至少為此值
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._failures += 1
+            if self._state == self.CLOSED and self._failures < self.failure_threshold:
+                return
+            self._state = self.OPEN
+            self._probe_started = None
+            self._opened_until = now + max(self.recovery_timeout, retry_after)
+            self.trips += 1
+        logger.warning(
+            f"Circuit breaker for {self.name} opened after {self._failures} failures "
+            f"(retry in {max(self.recovery_timeout, retry_after):.0f}s)"
+        )
+
+    def get_stats(self) -> Dict[str, object]:
+        """獲取統計資訊"""
+        return {
+            'state': self.state,
+            'failures': self._failures,
+            'trips': self.trips,
+            'rejected': self.rejected
+        }
+
+
+def create_circuit_breakers(model_names: List[str]) -> Dict[str, CircuitBreaker]:
+    """
+    為每個模型創建熔斷器
+
+    GEMINI_BREAKER_THRESHOLD 為連續失敗閾值（默認 3），GEMINI_BREAKER_RECOVERY 為冷卻時間（默認 30 秒）
+
+    Args:
+        model_names: 模型名稱列表（按優先順序）
+
+    Returns:
+        模型名稱 -> CircuitBreaker（保持傳入順序）
+    """
+    threshold = int(os.getenv('GEMINI_BREAKER_THRESHOLD', '3'))
+    recovery = float(os.getenv('GEMINI_BREAKER_RECOVERY', '30'))
+    return {
+        name: CircuitBreaker(name, failure_threshold=threshold, recovery_timeout=recovery)
+        for name in model_names
+    }
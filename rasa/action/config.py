@@ -109,6 +109,58 @@ BUILDINGS = {
     }
 }
 
+# 廁所內設備配置（聲明順序即匹配優先級）
+EQUIPMENT_TYPES = {
+    'urinal': {
+        'zh': '小便斗',
+        'en': 'urinal',
+        'aliases_zh': ['小便斗', '小便池', '小便器'],
+        'aliases_en': ['urinal']
+    },
+    'toilet': {
+        'zh': '馬桶',
+        'en': 'toilet',
+        'aliases_zh': ['馬桶', '坐式馬桶', '坐廁', '座便器'],
+        'aliases_en': ['toilet']
+    },
+    'sink': {
+        'zh': '洗手台',
+        'en': 'sink',
+        'aliases_zh': ['洗手台', '洗手盆'],
+        'aliases_en': ['sink', 'washbasin']
+    },
+    'faucet': {
+        'zh': '水龍頭',
+        'en': 'faucet',
+        'aliases_zh': ['水龍頭', '水喉'],
+        'aliases_en': ['faucet', 'tap']
+    },
+    'hand_dryer': {
+        'zh': '烘手機',
+        'en': 'hand dryer',
+        'aliases_zh': ['烘手機', '乾手機', '烘手器'],
+        'aliases_en': ['hand dryer']
+    },
+    'toilet_paper': {
+        'zh': '衛生紙',
+        'en': 'toilet paper',
+        'aliases_zh': ['衛生紙', '紙巾'],
+        'aliases_en': ['toilet paper', 'tissue']
+    },
+    'door': {
+        'zh': '門',
+        'en': 'door',
+        'aliases_zh': ['門', '門鎖'],
+        'aliases_en': ['door', 'door lock']
+    },
+    'light': {
+        'zh': '燈',
+        'en': 'light',
+        'aliases_zh': ['燈', '照明'],
+        'aliases_en': ['light', 'lighting']
+    }
+}
+
 # 性能配置
 PERFORMANCE_CONFIG = {
     'cache_ttl': 300,  # 緩存過期時間（秒）
@@ -117,13 +169,20 @@ PERFORMANCE_CONFIG = {
     'rate_limit_window': 60,  # 速率限制時間窗口（秒）
     'max_input_length': 500,  # 最大輸入長度
     'default_radius': 500,  # 默認搜索半徑（米）
-    'max_results': 10  # 默認最大結果數
+    'max_results': 10,  # 默認最大結果數
+    'memory_ttl': 3600,  # 會話記憶過期時間（秒）
+    'memory_max_entries': 100000,  # 會話記憶總條目上限
+    'memory_sweep_interval': 300,  # 會話記憶後台清掃間隔（秒）
+    'memory_flush_interval': 2,  # 持久化記憶寫回間隔（秒）
+    'memory_flush_batch': 100,  # 待寫回條目達到此數量時提前寫回
+    'memory_refresh_interval': 5  # 持久化記憶在熱層中最多使用多久（秒）後重新讀取數據庫，以看到其他 worker 的寫入
 }
 
 # 語言檢測配置
 LANGUAGE_CONFIG = {
     'english_threshold': 0.5,  # 英文檢測閾值
-    'default_language': 'zh'  # 默認語言
+    'default_language': 'zh',  # 默認語言
+    'cache_size': 2048  # 語言檢測結果緩存的文本數
 }
 
 # 驗證配置
@@ -144,7 +203,7 @@ GEMINI_CONFIG = {
     'cache_ttl': 3600,  # 緩存過期時間（秒）
     'max_retries': 2,  # 最大重試次數
     'default_temperature': 0.7,  # 默認溫度
-    'context_max_items': 3,  # 上下文最大條數
-    'context_max_length': 150,  # 單條上下文最大長度
+    'context_budget': 200,  # 對話上下文的 token 預算（包括早前話題摘要）
+    'context_turns': 3,  # 保留最近幾條有效輪次（包括當前問題，與原先的最近 3 條事件相同）
 }
 
@@ -0,0 +1,380 @@
+"""
+Gemini 對話上下文構建
+按 token 預算選擇送給 Gemini 的對話歷史：
+- 估算 token 數（中日韓文字每字約 1 個 token，英文單詞約每 4 個字母 1 個 token）
+- 丟棄低價值的輪次：按鈕 payload（例如 /ask_gender{...}，能對應到按鈕時改用按鈕標題）、
+  重複的機器人模板回覆、沒有文字的訊息，以及與當前問題相同的最後一條用戶訊息
+- 只保留最近幾條有效輪次（默認 3 條，與原先的最近 3 條事件相同，其中包括構建時去掉的當前問題）
+- 過長的輪次保留開頭和結尾，中間以省略號代替
+- 每個對話（sender）保存一份滾動狀態：只處理上次之後新增的事件，
+  超出輪次數或預算的舊輪次折疊成「早前話題」摘要
+"""
+
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .config import GEMINI_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 中日韓文字逐字、英文單詞和數字整體、其他非空白符號逐個作為 token 估算單元
+_TOKEN_PATTERN = re.compile(
+    r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]|[A-Za-z0-9]+|[^\sA-Za-z0-9]"
+)
+# 超過 4 個字母的單詞每多 4 個字母多算 1 個 token
+_LONG_WORD_PATTERN = re.compile(r"[A-Za-z0-9]{5,}")
+
+ROLE_LABELS = {'user': "用戶", 'bot': "助手"}
+
+SUMMARY_LABELS = {'zh': "早前話題：", 'en': "Earlier topics: "}
+
+# 摘要中每個話題最多保留的 token 數
+SUMMARY_TOPIC_TOKENS = 16
+
+
+def _unit_tokens(unit: str) -> int:
+    """單個估算單元的 token 數"""
+    if len(unit) > 1:
+        return math.ceil(len(unit) / 4)
+    return 1
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文字的 token 數
+
+    Args:
+        text: 文字
+
+    Returns:
+        估算的 token 數
+    """
+    units = len(_TOKEN_PATTERN.findall(text))
+    return units + sum((len(word) - 1) // 4 for word in _LONG_WORD_PATTERN.findall(text))
+
+
+def compress_text(text: str, max_tokens: int) -> str:
+    """
+    把文字壓縮到 max_tokens 以內：保留開頭約三分之二和結尾約三分之一
+
+    Args:
+        text: 文字
+        max_tokens: token 上限
+
+    Returns:
+        壓縮後的文字（未超出上限時原樣返回）
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    units = [(match.start(), match.end(), _unit_tokens(match.group())) for match in _TOKEN_PATTERN.finditer(text)]
+
+    head_budget = max(1, (max_tokens * 2) // 3)
+    tail_budget = max(0, max_tokens - head_budget - 1)  # 省略號佔 1 個 token
+
+    head_end, used = 0, 0
+    for _, end, cost in units:
+        if used + cost > head_budget:
+            break
+        head_end, used = end, used + cost
+
+    tail_start, used = len(text), 0
+    for start, _, cost in reversed(units):
+        if used + cost > tail_budget or start < head_end:
+            break
+        tail_start, used = start, used + cost
+
+    return text[:head_end].rstrip() + "…" + text[tail_start:].lstrip()
+
+
+def fit_to_budget(lines: List[str], budget: int, max_line_tokens: Optional[int] = None) -> List[str]:
+    """
+    從最新的一條開始保留，直到用完 token 預算
+
+    Args:
+        lines: 上下文列表（從舊到新）
+        budget: token 預算
+        max_line_tokens: 單條的 token 上限（默認為預算的三分之一）
+
+    Returns:
+        預算內的上下文列表（從舊到新）
+    """
+    max_line_tokens = max_line_tokens or max(1, budget // 3)
+    selected: List[str] = []
+    used = 0
+    for line in reversed(lines):
+        line = compress_text(line, max_line_tokens)
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            break
+        selected.append(line)
+        used += cost
+    selected.reverse()
+    return selected
+
+
+_ROLE_PREFIX_TOKENS = {role: estimate_tokens(f"{label}: ") for role, label in ROLE_LABELS.items()}
+
+
+def _event_fields(event: Any) -> Tuple[Optional[str], str, Dict[str, Any]]:
+    """取出事件的類型、文字和附加數據（兼容 dict 和對象形式的事件）"""
+    if isinstance(event, dict):
+        return event.get('event'), event.get('text') or '', event.get('data') or {}
+    event_type = getattr(event, 'event_type', None) or getattr(event, 'type', None)
+    return event_type, getattr(event, 'text', None) or '', getattr(event, 'data', None) or {}
+
+
+class _Turn:
+    """保留的對話輪次（source 為壓縮和按鈕標題替換前的原文，用於識別當前問題）"""
+
+    __slots__ = ('role', 'text', 'tokens', 'source')
+
+    def __init__(self, role: str, text: str, tokens: int, source: str):
+        self.role = role
+        self.text = text
+        self.tokens = tokens
+        self.source = source
+
+    def render(self) -> str:
+        return f"{ROLE_LABELS[self.role]}: {self.text}"
+
+
+class _SenderContext:
+    """單個對話的滾動狀態"""
+
+    def __init__(self):
+        self.processed = 0  # 已處理的事件數
+        self.marker: Optional[Tuple[Any, ...]] = None  # 最後處理的事件，用於發現事件列表被重置
+        self.turns: Deque[_Turn] = deque()
+        self.turn_tokens = 0
+        self.topics: Deque[Tuple[str, int]] = deque()  # (話題, token 數)
+        self.summary: Optional[Tuple[str, Optional[str]]] = None  # (語言, 摘要)，話題改變時清除
+        self.bot_seen: "OrderedDict[str, None]" = OrderedDict()
+        self.buttons: Dict[str, str] = {}
+        self.last_used = time.time()
+
+
+class ContextBuilder:
+    """
+    按 token 預算構建對話上下文，每個 sender 一份滾動狀態（LRU，閒置超時後丟棄）；線程安全
+    """
+
+    # 記住多少條機器人回覆用於去重
+    MAX_BOT_SEEN = 64
+    # 摘要最多保留的話題數
+    MAX_TOPICS = 6
+
+    def __init__(self, budget: int = 200, max_turns: int = 3, max_senders: int = 1000, ttl: int = 3600):
+        """
+        初始化上下文構建器
+
+        Args:
+            budget: 上下文（包括摘要）的 token 預算
+            max_turns: 保留的輪次數（包括當前問題）
+            max_senders: 最多保存狀態的對話數
+            ttl: 對話閒置多久後丟棄狀態（秒）
+        """
+        self.budget = budget
+        self.max_turns = max(1, max_turns)
+        self.max_senders = max_senders
+        self.ttl = ttl
+        # 單條輪次的上限，避免一條長回覆佔滿預算
+        self.max_turn_tokens = max(1, budget // 2)
+        # 摘要的上限（約一兩個早前的問題）
+        self.summary_tokens = max(1, budget // 10)
+
+        self._senders: "OrderedDict[str, _SenderContext]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def build(self, sender_id: Optional[str], events: List[Any], latest_message: str, language: str) -> List[str]:
+        """
+        構建對話上下文
+
+        Args:
+            sender_id: 對話 ID
+            events: tracker.events
+            latest_message: 當前用戶訊息（已在提示詞中，不重複放入上下文）
+            language: 語言代碼
+
+        Returns:
+            上下文列表（從舊到新，例如 ["早前話題：...", "用戶: ...", "助手: ..."]），總 token 數不超過預算
+        """
+        with self._lock:
+            state = self._state(sender_id or 'default')
+            self._consume(state, events)
+            turns = list(state.turns)
+            summary = self._summary(state, language)
+
+        # 最後一條用戶訊息就是當前問題
+        if turns and turns[-1].role == 'user' and turns[-1].source == latest_message.strip():
+            turns.pop()
+
+        budget = self.budget - (estimate_tokens(summary) if summary else 0)
+        selected: List[str] = []
+        for turn in reversed(turns):
+            if turn.tokens > budget:
+                break
+            selected.append(turn.render())
+            budget -= turn.tokens
+        selected.reverse()
+
+        if summary:
+            selected.insert(0, summary)
+        return selected
+
+    def _state(self, sender_id: str) -> _SenderContext:
+        """獲取（必要時創建）對話狀態，並清除閒置的狀態（調用方持有鎖）"""
+        now = time.time()
+        state = self._senders.get(sender_id)
+        if state is None or now - state.last_used > self.ttl:
+            state = _SenderContext()
+            self._senders[sender_id] = state
+        self._senders.move_to_end(sender_id)
+        state.last_used = now
+
+        while len(self._senders) > self.max_senders:
+            self._senders.popitem(last=False)
+        while self._senders:
+            oldest = next(iter(self._senders.values()))
+            if now - oldest.last_used <= self.ttl:
+                break
+            self._senders.popitem(last=False)
+        return state
+
+    def _consume(self, state: _SenderContext, events: List[Any]) -> None:
+        """處理上次之後新增的事件（調用方持有鎖）"""
+        if len(events) < state.processed or (
+            state.processed and self._marker(events[state.processed - 1]) != state.marker
+        ):
+            # 事件列表被重置（例如重新開始對話），重新處理
+            state.processed = 0
+            self._reset_turns(state)
+
+        for event in events[state.processed:]:
+            event_type, text, data = _event_fields(event)
+            if event_type in ('restart', 'session_started'):
+                self._reset_turns(state)
+            elif event_type == 'user':
+                self._add_user(state, text.strip())
+            elif event_type == 'bot':
+                self._add_bot(state, text.strip(), data)
+
+        state.processed = len(events)
+        state.marker = self._marker(events[-1]) if events else None
+
+    @staticmethod
+    def _marker(event: Any) -> Tuple[Any, ...]:
+        """事件的標識（類型、文字、時間戳）"""
+        event_type, text, _ = _event_fields(event)
+        timestamp = event.get('timestamp') if isinstance(event, dict) else getattr(event, 'timestamp', None)
+        return event_type, text, timestamp
+
+    def _reset_turns(self, state: _SenderContext) -> None:
+        """新會話開始時清空輪次和摘要"""
+        state.turns.clear()
+        state.turn_tokens = 0
+        state.topics.clear()
+        state.summary = None
+        state.bot_seen.clear()
+        state.buttons = {}
+
+    def _add_user(self, state: _SenderContext, text: str) -> None:
+        """加入用戶輪次（按鈕 payload 換成按鈕標題，無法對應的 payload 丟棄）"""
+        if not text:
+            return
+        title = state.buttons.get(text)
+        if title is not None:
+            self._append(state, 'user', title, text)
+        elif not text.startswith('/'):
+            self._append(state, 'user', text)
+
+    def _add_bot(self, state: _SenderContext, text: str, data: Dict[str, Any]) -> None:
+        """加入機器人輪次（重複的模板回覆只保留第一次）"""
+        buttons = data.get('buttons') if isinstance(data, dict) else None
+        state.buttons = {
+            str(button['payload']).strip(): str(button.get('title') or '').strip()
+            for button in buttons or []
+            if isinstance(button, dict) and button.get('payload') and button.get('title')
+        }
+        if not text:
+            return
+
+        normalized = ' '.join(text.split())
+        if normalized in state.bot_seen:
+            return
+        state.bot_seen[normalized] = None
+        if len(state.bot_seen) > self.MAX_BOT_SEEN:
+            state.bot_seen.popitem(last=False)
+        self._append(state, 'bot', text)
+
+    def _append(self, state: _SenderContext, role: str, text: str, source: Optional[str] = None) -> None:
+        """加入輪次，超出輪次數或預算的舊輪次折疊進摘要（source 默認為 text）"""
+        prefix_tokens = _ROLE_PREFIX_TOKENS[role]
+        compressed = compress_text(text, max(1, self.max_turn_tokens - prefix_tokens))
+        turn = _Turn(role, compressed, prefix_tokens + estimate_tokens(compressed), source or text)
+        state.turns.append(turn)
+        state.turn_tokens += turn.tokens
+
+        while (len(state.turns) > self.max_turns or state.turn_tokens > self.budget) and len(state.turns) > 1:
+            evicted = state.turns.popleft()
+            state.turn_tokens -= evicted.tokens
+            # 只有用戶的問題進入摘要，機器人的回覆不再保留
+            if evicted.role == 'user':
+                topic = compress_text(evicted.text, SUMMARY_TOPIC_TOKENS)
+                state.topics.append((topic, estimate_tokens(topic)))
+                if len(state.topics) > self.MAX_TOPICS:
+                    state.topics.popleft()
+                state.summary = None
+
+    def _summary(self, state: _SenderContext, language: str) -> Optional[str]:
+        """早前話題摘要（超出摘要上限時丟棄最舊的話題；結果緩存到話題改變為止）"""
+        if state.summary is not None and state.summary[0] == language:
+            return state.summary[1]
+        state.summary = (language, self._render_summary(state, language))
+        return state.summary[1]
+
+    def _render_summary(self, state: _SenderContext, language: str) -> Optional[str]:
+        """生成摘要文字"""
+        label = SUMMARY_LABELS['en' if language == 'en' else 'zh']
+        separator = "; " if language == 'en' else "；"
+        # 每個分隔符 1 個 token
+        budget = self.summary_tokens - estimate_tokens(label) + 1
+        topics: List[str] = []
+        for topic, tokens in reversed(state.topics):
+            if tokens + 1 > budget:
+                break
+            topics.append(topic)
+            budget -= tokens + 1
+        if not topics:
+            return None
+        return label + separator.join(reversed(topics))
+
+    def __len__(self) -> int:
+        return len(self._senders)
+
+
+def create_context_builder() -> ContextBuilder:
+    """
+    根據環境變數創建上下文構建器
+
+    GEMINI_CONTEXT_BUDGET 為上下文的 token 預算（默認 GEMINI_CONFIG['context_budget']），
+    GEMINI_CONTEXT_TURNS 為保留的輪次數（默認 GEMINI_CONFIG['context_turns']），
+    GEMINI_CONTEXT_SENDERS 為最多保存滾動狀態的對話數（默認 1000）
+
+    Returns:
+        ContextBuilder 實例
+    """
+    budget = int(os.getenv('GEMINI_CONTEXT_BUDGET', str(GEMINI_CONFIG['context_budget'])))
+    max_turns = int(os.getenv('GEMINI_CONTEXT_TURNS', str(GEMINI_CONFIG['context_turns'])))
+    max_senders = int(os.getenv('GEMINI_CONTEXT_SENDERS', '1000'))
+    return ContextBuilder(budget=budget, max_turns=max_turns, max_senders=max_senders)
+
+
+# 全局上下文構建器
+context_builder = create_context_builder()
@@ -0,0 +1,93 @@
+"""
+Action 分派表
+啟動時掃描 action 模組，為每個 action 名稱創建一個可重用的實例；
+備用 Sanic webhook 每次請求只需一次字典查詢，不再按類名反射查找和重新實例化
+"""
+
+import importlib
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from rasa_sdk import Action
+
+logger = logging.getLogger(__name__)
+
+# 掃描順序：後面的模組覆蓋前面的同名 action（與 action/__init__.py 的導出一致）
+ACTION_MODULES: Tuple[str, ...] = ('action.actions', 'action.campus_info_actions')
+
+
+class ActionDispatchTable:
+    """
+    action 名稱 -> action 實例
+    action 類都是無狀態的，同一個實例可以在多個請求之間共用
+    """
+
+    def __init__(self, module_names: Iterable[str] = ACTION_MODULES):
+        """
+        掃描模組並構建分派表
+
+        Args:
+            module_names: 要掃描的模組，按優先級從低到高排列
+        """
+        self.actions: Dict[str, Action] = {}
+        # (action 名稱, 被覆蓋的類, 生效的類)
+        self.duplicates: List[Tuple[str, str, str]] = []
+
+        for module_name in module_names:
+            self._register_module(importlib.import_module(module_name))
+
+        for name, replaced, winner in self.duplicates:
+            logger.warning(f"Action {name} 重複註冊：{replaced} 被 {winner} 覆蓋")
+        logger.info(f"Action 分派表已構建，共 {len(self.actions)} 個 action")
+
+    def _register_module(self, module) -> None:
+        """註冊模組中定義的所有公開 Action 子類"""
+        for attr, obj in vars(module).items():
+            if (
+                attr.startswith('_')
+                or not isinstance(obj, type)
+                or not issubclass(obj, Action)
+                or obj.__module__ != module.__name__
+            ):
+                continue
+
+            try:
+                instance = obj()
+                name = instance.name()
+            except Exception as e:
+                logger.error(f"無法實例化 {obj.__module__}.{obj.__qualname__}: {e}")
+                continue
+            if not name:
+                continue
+
+            existing = self.actions.get(name)
+            if existing is not None and type(existing) is not obj:
+                self.duplicates.append((name, _qualified_name(type(existing)), _qualified_name(obj)))
+            self.actions[name] = instance
+
+    def get(self, name: str) -> Optional[Action]:
+        """
+        查詢 action 實例
+
+        Args:
+            name: action 名稱（如 action_greet）
+
+        Returns:
+            action 實例，未註冊時返回 None
+        """
+        return self.actions.get(name)
+
+    def names(self) -> List[str]:
+        """返回所有已註冊的 action 名稱"""
+        return list(self.actions)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.actions
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+
+def _qualified_name(cls: type) -> str:
+    """類的完整名稱（模組.類名）"""
+    return f"{cls.__module__}.{cls.__qualname__}"
@@ -0,0 +1,204 @@
+"""
+消息實體提取
+把設施類型、性別、狀態、建築、校區的關鍵詞編譯進同一個多模式匹配器，
+每條消息只掃描一遍，得到所有 action 共用的特徵記錄；
+結果按 (sender_id, message_id) 緩存，同一輪對話中連續執行的 action 直接復用
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+from .config import CAMPUSES
+from .gazetteer import building_gazetteer
+from .location import extract_floor
+from .matcher import AliasMatcher
+
+logger = logging.getLogger(__name__)
+
+# 設施類型關鍵詞（列表順序即優先級：同時提到多種設施時取排在前面的）
+FACILITY_KEYWORDS: List[Tuple[str, List[str]]] = [
+    ('toilet', ['廁所', '洗手間', '衛生間', 'toilet', 'restroom', 'bathroom', 'washroom', 'wc']),
+    ('water', ['飲水機', '飲水器', '飲水', 'water', 'water fountain', 'water dispenser', 'fountain']),
+    ('trash', ['垃圾桶', '垃圾箱', '垃圾', 'trash', 'trash can', 'garbage', 'waste bin']),
+]
+
+# 廁所性別關鍵詞
+GENDER_KEYWORDS: List[Tuple[str, List[str]]] = [
+    ('男', ['男生廁所', '男性廁所', '男廁所', '男生', '男性', '男廁', 'men', "men's", 'male',
+           "men's restroom", "men's toilet"]),
+    ('女', ['女生廁所', '女性廁所', '女廁所', '女生', '女性', '女廁', 'women', "women's", 'female', 'ladies',
+           "women's restroom", "women's toilet", "ladies' restroom", "ladies' toilet"]),
+    ('性別友善', ['無性別廁所', '性別友善廁所', '性別友善', '性別中立', '無性別', '中性廁所', '中性',
+              'unisex', 'gender-neutral', 'gender-inclusive', 'all-gender', 'unisex restroom', 'unisex toilet']),
+    ('無障礙', ['無障礙廁所', '無障礙', 'accessible', 'wheelchair', 'accessible restroom', 'accessible toilet']),
+]
+
+# 設施回報狀態關鍵詞（與前端的 待清潔/無法使用/部分損壞 對應，順序即優先級）
+STATUS_KEYWORDS: List[Tuple[str, str]] = [
+    ('滿了', '待清潔'), ('滿', '待清潔'), ('full', '待清潔'),
+    ('髒了', '待清潔'), ('髒', '待清潔'), ('dirty', '待清潔'),
+    ('需要收', '待清潔'), ('需要清理', '待清潔'), ('需要處理', '待清潔'),
+    ('要收', '待清潔'), ('要清理', '待清潔'), ('要處理', '待清潔'),
+    ('壞了', '無法使用'), ('壞', '無法使用'), ('broken', '無法使用'), ('故障', '無法使用'),
+    ('需要維修', '無法使用'), ('需要修理', '無法使用'), ('要維修', '無法使用'), ('要修理', '無法使用'),
+    ('維修', '無法使用'), ('修理', '無法使用'),
+    ('損壞', '部分損壞'), ('damaged', '部分損壞'),
+    ('待清潔', '待清潔'), ('無法使用', '無法使用'), ('部分損壞', '部分損壞'),
+]
+
+
+class MessageFeatures(NamedTuple):
+    """一條用戶消息中提取出的實體"""
+    text: str
+    language: str
+    facility_type: Optional[str]  # 優先級最高的設施類型
+    facility_types: Tuple[str, ...]  # 提到的所有設施類型（按優先級排序）
+    gender: Optional[str]
+    status: Optional[str]
+    status_keywords: FrozenSet[str]  # 命中的狀態關鍵詞（casefold 後）
+    building: Optional[str]
+    floor: Optional[str]
+    campus: Optional[str]  # campus1/campus2/campus3
+
+
+def _build_matcher() -> AliasMatcher:
+    """把所有類別的關鍵詞編譯成一個匹配器，值為 (類別, 標準值, 命中的關鍵詞)"""
+    matcher = AliasMatcher()
+    priority = 0
+
+    def add(category: str, canonical: str, keyword: str) -> None:
+        nonlocal priority
+        matcher.add(keyword, (category, canonical, keyword.casefold()), priority)
+        priority += 1
+
+    for facility_type, keywords in FACILITY_KEYWORDS:
+        for keyword in keywords:
+            add('facility_type', facility_type, keyword)
+    for gender, keywords in GENDER_KEYWORDS:
+        for keyword in keywords:
+            add('gender', gender, keyword)
+    for keyword, status in STATUS_KEYWORDS:
+        add('status', status, keyword)
+    for campus, config in CAMPUSES.items():
+        for alias in config['aliases_zh'] + config['aliases_en']:
+            add('campus', campus, alias)
+    for alias, building in building_gazetteer.items():
+        add('building', building, alias)
+
+    matcher.build()
+    return matcher
+
+
+_MATCHER = _build_matcher()
+_FACILITY_ORDER = {facility_type: index for index, (facility_type, _) in enumerate(FACILITY_KEYWORDS)}
+
+
+def extract_features(text: str, language: str = 'zh') -> MessageFeatures:
+    """
+    單次掃描提取消息中的所有實體
+
+    Args:
+        text: 用戶消息
+        language: 已確定的語言
+
+    Returns:
+        MessageFeatures
+    """
+    # 每個類別保留優先級最高的命中：類別 -> (優先級, 標準值)
+    best: Dict[str, Tuple[int, str]] = {}
+    facility_types = set()
+    status_keywords = set()
+    # 建築取最長的別名（與地名表的最長匹配一致）
+    building: Optional[Tuple[int, int, str]] = None
+
+    for start, end, (category, canonical, keyword), priority in _MATCHER.find_all(text):
+        if category == 'facility_type':
+            facility_types.add(canonical)
+        elif category == 'status':
+            status_keywords.add(keyword)
+        elif category == 'building':
+            candidate = (start - end, priority, canonical)
+            if building is None or candidate < building:
+                building = candidate
+            continue
+
+        current = best.get(category)
+        if current is None or priority < current[0]:
+            best[category] = (priority, canonical)
+
+    def pick(category: str) -> Optional[str]:
+        found = best.get(category)
+        return found[1] if found else None
+
+    return MessageFeatures(
+        text=text,
+        language=language,
+        facility_type=pick('facility_type'),
+        facility_types=tuple(sorted(facility_types, key=_FACILITY_ORDER.__getitem__)),
+        gender=pick('gender'),
+        status=pick('status'),
+        status_keywords=frozenset(status_keywords),
+        building=building[2] if building else None,
+        floor=extract_floor(text),
+        campus=pick('campus'),
+    )
+
+
+class FeatureCache:
+    """
+    按對話輪次緩存的特徵記錄
+    鍵為 (sender_id, message_id 或消息文本, language)，同一輪的多個 action 共用一次提取結果
+    """
+
+    def __init__(self, max_size: int = 1024):
+        """
+        初始化緩存
+
+        Args:
+            max_size: 最多保留的輪次數
+        """
+        self.cache: "OrderedDict[Tuple[str, str, str], MessageFeatures]" = OrderedDict()
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, sender_id: str, message_id: str, text: str, language: str) -> MessageFeatures:
+        """
+        獲取（或提取並緩存）特徵記錄
+
+        Args:
+            sender_id: 用戶標識
+            message_id: 消息 ID，沒有時傳空字串
+            text: 消息文本
+            language: 語言
+
+        Returns:
+            MessageFeatures
+        """
+        key = (sender_id, message_id or text, language)
+        with self._lock:
+            features = self.cache.get(key)
+            if features is not None and features.text == text:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return features
+
+        features = extract_features(text, language)
+        with self._lock:
+            self.misses += 1
+            self.cache[key] = features
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+        return features
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取統計資訊"""
+        return {'size': len(self.cache), 'hits': self.hits, 'misses': self.misses}
+
+
+# 全局特徵緩存實例
+feature_cache = FeatureCache()
@@ -0,0 +1,219 @@
+"""
+容錯（錯字）匹配索引
+採用 SymSpell 的刪除索引：建立時為每個詞條預先生成刪除最多 max_distance 個字元後的變體，
+查詢時只需生成查詢詞的刪除變體並查表，再用編輯距離驗證候選，
+查詢成本與詞彙表大小基本無關
+"""
+
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .config import EQUIPMENT_TYPES
+from .gazetteer import building_gazetteer
+
+logger = logging.getLogger(__name__)
+
+# (值, 命中的詞條, 編輯距離)
+FuzzyMatch = Tuple[Any, str, int]
+
+# 把消息切成 ASCII 單詞段和非 ASCII 段（中文等）
+_SEGMENT_PATTERN = re.compile(r'[a-z0-9]+(?:[ \-\'][a-z0-9]+)*|[^\x00-\x7f]+')
+_ASCII_WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def _deletes(term: str, max_distance: int) -> Set[str]:
+    """生成刪除最多 max_distance 個字元後的所有變體（含原詞）"""
+    results = {term}
+    frontier = {term}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for word in frontier:
+            if len(word) <= 1:
+                continue
+            for i in range(len(word)):
+                variant = word[:i] + word[i + 1:]
+                if variant not in results:
+                    next_frontier.add(variant)
+        results |= next_frontier
+        frontier = next_frontier
+    return results
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """
+    受限 Damerau-Levenshtein 距離（相鄰字元交換算一次編輯）
+
+    Args:
+        a: 字串 a
+        b: 字串 b
+        max_distance: 超過此值即提前返回 max_distance + 1
+
+    Returns:
+        編輯距離
+    """
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous_previous: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+            row_min = min(row_min, current[j])
+        if row_min > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class FuzzyIndex:
+    """
+    SymSpell 風格的刪除索引
+    短詞允許的錯字數較少（長度 2 以下不容錯，3-4 容 1 個，5 以上容 max_distance 個），
+    避免兩個字的簡稱在任何兩字片段上都能「模糊命中」
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, Any]] = (), max_distance: int = 2):
+        """
+        初始化索引
+
+        Args:
+            entries: (詞條, 值) 序列
+            max_distance: 最大編輯距離
+        """
+        self.max_distance = max_distance
+        self.terms: Dict[str, Any] = {}
+        self.deletes: Dict[str, List[str]] = {}
+        self.max_term_length = 0
+        # 非 ASCII 詞條（中文）的最大長度，限制消息中滑動窗口的長度
+        self.max_wide_length = 0
+
+        for term, value in entries:
+            self.add(term, value)
+
+    def allowed_distance(self, term: str) -> int:
+        """詞條允許的最大編輯距離（短英文別名如 lab、lift 只接受精確匹配，避免命中 lib、light）"""
+        if len(term) <= 2 or (term.isascii() and len(term) < 5):
+            return 0
+        if len(term) <= 4:
+            return min(1, self.max_distance)
+        return self.max_distance
+
+    def add(self, term: str, value: Any) -> None:
+        """
+        添加詞條（同一詞條只保留第一次添加的值）
+
+        Args:
+            term: 詞條
+            value: 命中時返回的值
+        """
+        term = term.casefold().strip()
+        if not term or term in self.terms:
+            return
+
+        self.terms[term] = value
+        self.max_term_length = max(self.max_term_length, len(term))
+        if not term.isascii():
+            self.max_wide_length = max(self.max_wide_length, len(term))
+        for variant in _deletes(term, self.allowed_distance(term)):
+            self.deletes.setdefault(variant, []).append(term)
+
+    def lookup(self, query: str, limit: int = 3) -> List[FuzzyMatch]:
+        """
+        查詢與 query 最接近的詞條
+
+        Args:
+            query: 查詢詞
+            limit: 最多返回的候選數
+
+        Returns:
+            (值, 詞條, 編輯距離) 列表，按距離、詞條長度（長者優先）排序
+        """
+        query = query.casefold().strip()
+        if not query or len(query) > self.max_term_length + self.max_distance:
+            return []
+
+        exact = self.terms.get(query)
+        if exact is not None:
+            return [(exact, query, 0)]
+
+        candidates: Set[str] = set()
+        for variant in _deletes(query, self.max_distance):
+            candidates.update(self.deletes.get(variant, ()))
+
+        matches: List[FuzzyMatch] = []
+        for term in candidates:
+            allowed = self.allowed_distance(term)
+            distance = edit_distance(query, term, allowed)
+            if distance <= allowed:
+                matches.append((self.terms[term], term, distance))
+
+        matches.sort(key=lambda match: (match[2], -len(match[1])))
+        return matches[:limit]
+
+    def best(self, query: str) -> Optional[Any]:
+        """返回最接近的詞條的值，沒有候選時返回 None"""
+        matches = self.lookup(query, limit=1)
+        return matches[0][0] if matches else None
+
+    def _windows(self, text: str) -> Iterable[str]:
+        """生成消息中可能是詞條的片段：ASCII 連續單詞組合與中文子串"""
+        longest = self.max_wide_length + self.max_distance
+        for segment in _SEGMENT_PATTERN.findall(text.casefold()):
+            if segment.isascii():
+                words = _ASCII_WORD_PATTERN.findall(segment)
+                for i in range(len(words)):
+                    for j in range(i + 1, min(len(words), i + 5) + 1):
+                        yield ' '.join(words[i:j])
+            else:
+                for length in range(3, min(len(segment), longest) + 1):
+                    for start in range(len(segment) - length + 1):
+                        yield segment[start:start + length]
+
+    def best_in_text(self, text: Optional[str]) -> Optional[Any]:
+        """
+        在整條消息中查找最接近某個詞條的片段
+
+        Args:
+            text: 用戶消息
+
+        Returns:
+            最佳候選的值，沒有候選時返回 None
+        """
+        if not text:
+            return None
+
+        best: Optional[Tuple[Tuple[int, int], Any]] = None
+        seen: Set[str] = set()
+        for window in self._windows(text):
+            if window in seen:
+                continue
+            seen.add(window)
+            for value, term, distance in self.lookup(window, limit=1):
+                key = (distance, -len(term))
+                if best is None or key < best[0]:
+                    best = (key, value)
+        return best[1] if best else None
+
+
+def _vocabulary_entries(vocabulary: Dict[str, Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """把 config.py 格式的詞彙表展開為 (別名, 標準值)"""
+    entries = []
+    for canonical, config in vocabulary.items():
+        for alias in [config.get('zh', ''), config.get('en', '')] + config.get('aliases_zh', []) + config.get('aliases_en', []):
+            if alias:
+                entries.append((alias, canonical))
+    return entries
+
+
+# 全局索引實例（導入時構建一次）；設施類型和狀態由 matcher 的別名匹配處理，不需要容錯索引
+building_index = FuzzyIndex(building_gazetteer.items())
+equipment_index = FuzzyIndex(_vocabulary_entries(EQUIPMENT_TYPES))
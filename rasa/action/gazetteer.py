@@ -0,0 +1,173 @@
+"""
+校園建築地名表
+所有建築名稱、簡稱、拼寫變體和英文名稱集中在這裡，導入時編譯成字典樹，
+各個涉及建築的 action 共用同一份數據，最長匹配查詢只需掃描一遍文本
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .config import BUILDINGS
+from .matcher import AliasMatcher
+
+logger = logging.getLogger(__name__)
+
+# 校區 -> {標準建築名稱: [別名...]}；別名在字典樹中按 casefold 後匹配
+CAMPUS_BUILDINGS: Dict[Optional[str], Dict[str, List[str]]] = {
+    'campus1': {
+        "第一教學大樓": ["第一教學大樓", "第一教學", "一教", "第一教", "教學大樓一", "first teaching building"],
+        "第二教學大樓": ["第二教學大樓", "第二教學", "二教", "第二教", "教學大樓二", "second teaching building"],
+        "第三教學大樓": ["第三教學大樓", "第三教學", "三教", "第三教", "教學大樓三", "third teaching building"],
+        "第四教學大樓": ["第四教學大樓", "第四教學", "四教", "第四教", "教學大樓四", "fourth teaching building"],
+        "行政大樓": ["行政大樓", "行政", "行政館", "administration building", "administration", "admin building"],
+        "圖書館": ["圖書館", "圖書", "library", "lib"],
+        # 「電機館」「電機工程館」等名稱歸第二校區的電機館
+        "飛機館": ["飛機館"],
+        "機械工程館": ["機械工程館", "機械館", "機械", "mechanical engineering building", "me building"],
+        "資訊休閒大樓": ["資訊休閒大樓", "資訊休閒館", "information and recreation building"],
+        "紅館": ["紅館", "red building", "red hall"],
+        "綠館": ["綠館", "green building", "green hall"],
+        "學生活動中心": ["學生活動中心", "活動中心", "student activity center", "activity center"],
+    },
+    'campus2': {
+        "科技研究中心": ["科技研究中心", "科技中心", "研究中心", "technology research center", "tech center"],
+        "綜一館": ["綜一館", "綜合一館", "綜合教學大樓第一館", "綜一", "comprehensive building one", "comp building 1"],
+        "綜二館": ["綜二館", "綜合二館", "綜合教學大樓第二館", "綜二", "comprehensive building two", "comp building 2"],
+        "綜三館": ["綜三館", "粽三館", "粽三", "綜三", "粽三管", "綜三管", "綜合三館", "綜合教學大樓第三館",
+                "zongsan building", "zongsan", "zongsan 館", "comprehensive building three"],
+        "電機館": ["電機館", "第二校區電機館", "電機工程館", "電機", "electrical engineering building", "ee building"],
+    },
+    'campus3': {
+        "操場": ["操場", "運動場", "playground", "sports field", "field"],
+        "游泳池": ["游泳池", "泳池", "swimming pool", "pool"],
+        "體育館(經國館)": ["體育館", "經國館", "經國體育館", "gymnasium", "gym", "sports center"],
+        "人文大樓": ["人文大樓", "人文館", "humanities building", "humanities"],
+        "文理暨管理大樓": ["文理暨管理大樓", "文理大樓", "文理管理大樓", "文理館",
+                     "liberal arts and management building", "lam building"],
+    },
+    # 設施回報中出現、尚未歸入校區的建築
+    None: {
+        "學生餐廳": ["學生餐廳", "餐廳", "student cafeteria", "cafeteria"],
+        "實驗大樓": ["實驗大樓", "實驗", "laboratory building", "lab building"],
+        "工學院大樓": ["工學院大樓", "工學院", "engineering building"],
+        "管理學院大樓": ["管理學院大樓", "管理學院", "management building"],
+        "研究大樓": ["研究大樓", "研究", "research building"],
+        "創新大樓": ["創新大樓", "創新", "innovation building"],
+        "宿舍大樓": ["宿舍大樓", "宿舍", "dormitory", "dorm"],
+    },
+}
+
+
+class BuildingGazetteer:
+    """
+    建築地名表
+    提供別名的精確查詢和文本中的最長匹配查詢
+    """
+
+    def __init__(self, campus_buildings: Dict[Optional[str], Dict[str, List[str]]]):
+        """
+        初始化地名表
+
+        Args:
+            campus_buildings: 校區 -> {標準名稱: [別名...]}
+        """
+        self.aliases: Dict[str, str] = {}
+        self.campus: Dict[str, Optional[str]] = {}
+        patterns: List[Tuple[str, str, int]] = []
+
+        for campus, buildings in campus_buildings.items():
+            for canonical, aliases in buildings.items():
+                self.campus[canonical] = campus
+                for alias in [canonical] + aliases:
+                    key = alias.casefold()
+                    if key in self.aliases and self.aliases[key] != canonical:
+                        logger.debug(f"Building alias {alias} already maps to {self.aliases[key]}, ignored for {canonical}")
+                        continue
+                    self.aliases[key] = canonical
+                    patterns.append((alias, canonical, len(patterns)))
+
+        self.matcher = AliasMatcher(patterns)
+
+    def lookup(self, name: Optional[str]) -> Optional[str]:
+        """
+        精確查詢別名對應的標準建築名稱
+
+        Args:
+            name: 建築名稱或別名
+
+        Returns:
+            標準名稱，未知時返回 None
+        """
+        if not name:
+            return None
+        return self.aliases.get(name.strip().casefold())
+
+    def find(self, text: Optional[str]) -> Optional[str]:
+        """
+        找出文本中最長的建築別名
+
+        Args:
+            text: 輸入文本
+
+        Returns:
+            標準名稱，沒有提到建築時返回 None
+        """
+        if not text:
+            return None
+        return self.matcher.longest(text)
+
+    def find_in(self, texts: Iterable[str]) -> Optional[str]:
+        """
+        依序在多段文本中查找，返回第一段中提到的建築
+
+        Args:
+            texts: 文本序列（例如由新到舊的對話歷史）
+
+        Returns:
+            標準名稱，都沒有時返回 None
+        """
+        for text in texts:
+            building = self.find(text)
+            if building:
+                return building
+        return None
+
+    def normalize(self, name: Optional[str], text: Optional[str] = None) -> Optional[str]:
+        """
+        標準化建築名稱：先精確查詢，再在名稱本身和消息文本中做最長匹配
+
+        Args:
+            name: slot 中的建築名稱
+            text: 用戶消息
+
+        Returns:
+            標準名稱，找不到時返回 None
+        """
+        return self.lookup(name) or self.find(name) or self.find(text)
+
+    def campus_of(self, building: str) -> Optional[str]:
+        """返回建築所在的校區鍵（campus1/campus2/campus3），未知時返回 None"""
+        return self.campus.get(building)
+
+    def items(self) -> Iterable[Tuple[str, str]]:
+        """返回所有 (casefold 後的別名, 標準名稱)"""
+        return self.aliases.items()
+
+
+def _with_config_buildings() -> Dict[Optional[str], Dict[str, List[str]]]:
+    """合併 config.BUILDINGS 中的別名（地名表中已有的標準名稱追加別名）"""
+    merged = {campus: {name: list(aliases) for name, aliases in buildings.items()}
+              for campus, buildings in CAMPUS_BUILDINGS.items()}
+    for canonical, config in BUILDINGS.items():
+        extra = config.get('aliases_zh', []) + config.get('aliases_en', [])
+        for buildings in merged.values():
+            if canonical in buildings:
+                buildings[canonical].extend(extra)
+                break
+        else:
+            merged[None][canonical] = extra
+    return merged
+
+
+# 全局地名表實例（導入時構建一次）
+building_gazetteer = BuildingGazetteer(_with_config_buildings())
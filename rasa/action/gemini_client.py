@@ -7,14 +7,56 @@ Gemini API 客戶端模組
 import os
 import logging
 import time
+import random
+import asyncio
 import hashlib
-from typing import Optional, Dict, Any, List
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 from collections import OrderedDict
 import google.generativeai as genai
 
+from .circuit_breaker import create_circuit_breakers
+from .config import GEMINI_CONFIG
+from .context_builder import fit_to_budget
+from .response_store import ResponseStore, create_response_store
+from .semantic_cache import create_semantic_cache
+from .shared_cache import SharedCacheTier, create_shared_tier
+
 logger = logging.getLogger(__name__)
 
+# 配額重試等待時間的隨機抖動比例
+RETRY_JITTER = 0.2
+
+# 生成配置檔（按問題類型選擇，見 _generation_profile）
+GENERATION_PROFILES: Dict[str, Dict[str, Any]] = {
+    'default': {
+        'temperature': 0.7,  # 平衡創造性和準確性
+        'top_p': 0.8,  # 核採樣
+        'top_k': 40,  # Top-K 採樣
+        'max_output_tokens': 512,  # 減少 token 使用（從 1024 降到 512）
+    },
+    # 簡單問題：更確定性，更短回應
+    'simple': {'temperature': 0.5, 'top_p': 0.8, 'top_k': 40, 'max_output_tokens': 256},
+    # 複雜問題：允許更多創造性，更長回應
+    'complex': {'temperature': 0.8, 'top_p': 0.8, 'top_k': 40, 'max_output_tokens': 512},
+}
+
+# 提示詞中用戶輪次的固定文字
+PROMPT_TEMPLATES: Dict[str, Dict[str, str]] = {
+    'en': {
+        'context_header': "\n\nRecent conversation context:",
+        'question': "\n\nUser question: ",
+        'instruction': "\n\nPlease provide a concise and helpful response:",
+    },
+    'zh': {
+        'context_header': "\n\n最近的對話上下文：",
+        'question': "\n\n用戶問題：",
+        'instruction': "\n\n請提供簡潔且有用的回應：",
+    },
+}
+
 
 class ResponseCache:
     """
@@ -22,24 +64,47 @@ class ResponseCache:
     用於緩存常見問題的回應，減少 API 調用
     """
     
-    def __init__(self, max_size: int = 100, ttl: int = 3600):
+    def __init__(
+        self,
+        max_size: int = 100,
+        ttl: int = 3600,
+        shared: Optional[SharedCacheTier] = None,
+        store: Optional[ResponseStore] = None
+    ):
         """
         初始化緩存
         
         Args:
             max_size: 最大緩存條目數
             ttl: 緩存過期時間（秒）
+            shared: 可選的跨進程共享緩存層，本地未命中時查詢
+            store: 可選的持久化存儲，共享緩存層也未命中時查詢
         """
         self.cache: OrderedDict = OrderedDict()
         self.timestamps: Dict[str, datetime] = {}
         self.max_size = max_size
         self.ttl = ttl
+        self.shared = shared
+        self.store = store
     
     def _generate_key(self, message: str, language: str) -> str:
         """生成緩存鍵"""
         key_string = f"{language}:{message.strip().lower()}"
         return hashlib.md5(key_string.encode('utf-8')).hexdigest()
     
+    def make_key(self, message: str, language: str) -> str:
+        """
+        生成與緩存相同的鍵（用於合併相同問題的進行中請求）
+        
+        Args:
+            message: 用戶訊息
+            language: 語言代碼
+            
+        Returns:
+            str: 緩存鍵
+        """
+        return self._generate_key(message, language)
+    
     def get(self, message: str, language: str) -> Optional[str]:
         """
         獲取緩存回應
@@ -52,7 +117,66 @@ class ResponseCache:
             緩存回應，如果不存在或已過期則返回 None
         """
         key = self._generate_key(message, language)
+        response = self._get_local(key)
+        if response is not None:
+            if self.store is not None:
+                self.store.record_hit(key)
+            return response
+        return self._fill_local(key, self._load_shared(key))
+    
+    async def get_async(self, message: str, language: str) -> Optional[str]:
+        """
+        獲取緩存回應（異步）
+        內存緩存直接查詢，共享緩存層和持久化存儲的 SQLite 查詢在線程池中執行，不阻塞事件循環
         
+        Args:
+            message: 用戶訊息
+            language: 語言代碼
+            
+        Returns:
+            緩存回應，如果不存在或已過期則返回 None
+        """
+        key = self._generate_key(message, language)
+        response = self._get_local(key)
+        loop = asyncio.get_running_loop()
+        if response is not None:
+            if self.store is not None:
+                # 累計的命中次數會批量寫回數據庫，不等待完成
+                loop.run_in_executor(None, self.store.record_hit, key)
+            return response
+        if self.shared is None and self.store is None:
+            return None
+        return self._fill_local(key, await loop.run_in_executor(None, self._load_shared, key))
+    
+    def set(
+        self,
+        message: str,
+        language: str,
+        response: str,
+        model: Optional[str] = None,
+        loop: Optional[asyncio.AbstractEventLoop] = None
+    ) -> None:
+        """
+        設置緩存回應
+        
+        Args:
+            message: 用戶訊息
+            language: 語言代碼
+            response: API 回應
+            model: 實際生成回應的模型（記錄到持久化存儲），默認為主模型
+            loop: 在事件循環中調用時傳入，共享緩存層和持久化存儲的寫入改在線程池中執行（不等待完成）
+        """
+        key = self._generate_key(message, language)
+        self._set_local(key, response, datetime.now())
+        if self.shared is None and self.store is None:
+            return
+        if loop is not None:
+            loop.run_in_executor(None, self._store_shared, key, message.strip(), language, response, model)
+        else:
+            self._store_shared(key, message.strip(), language, response, model)
+    
+    def _get_local(self, key: str) -> Optional[str]:
+        """查詢進程內緩存（過期條目順便刪除）"""
         if key not in self.cache:
             return None
         
@@ -68,31 +192,125 @@ class ResponseCache:
         self.cache[key] = response
         return response
     
-    def set(self, message: str, language: str, response: str) -> None:
-        """
-        設置緩存回應
-        
-        Args:
-            message: 用戶訊息
-            language: 語言代碼
-            response: API 回應
-        """
-        key = self._generate_key(message, language)
-        
-        # 如果緩存已滿，刪除最舊的條目
-        if len(self.cache) >= self.max_size:
+    def _store_shared(self, key: str, message: str, language: str, response: str, model: Optional[str]) -> None:
+        """寫入共享緩存層和持久化存儲（SQLite I/O）"""
+        if self.shared is not None:
+            self.shared.set(key, response, self.ttl)
+        if self.store is not None:
+            self.store.set(key, message, language, response, model)
+    
+    def _set_local(self, key: str, response: str, timestamp: datetime) -> None:
+        """寫入進程內緩存"""
+        if key in self.cache:
+            self.cache.move_to_end(key)
+        elif len(self.cache) >= self.max_size:
+            # 如果緩存已滿，刪除最舊的條目
             oldest_key = next(iter(self.cache))
             del self.cache[oldest_key]
             if oldest_key in self.timestamps:
                 del self.timestamps[oldest_key]
         
         self.cache[key] = response
-        self.timestamps[key] = datetime.now()
+        self.timestamps[key] = timestamp
+    
+    def _load_shared(self, key: str) -> Optional[Tuple[str, float]]:
+        """本地未命中時依次查詢共享緩存層和持久化存儲（SQLite I/O），存儲命中時回填共享緩存層"""
+        result = self.shared.get(key) if self.shared is not None else None
+        if result is None and self.store is not None:
+            result = self.store.get(key)
+            if result is not None and self.shared is not None:
+                self.shared.set(key, result[0], min(self.ttl, result[1]))
+        return result
+    
+    def _fill_local(self, key: str, result: Optional[Tuple[str, float]]) -> Optional[str]:
+        """把下層緩存的命中 (回應, 剩餘存活秒數) 回填進程內緩存"""
+        if result is None:
+            return None
+        
+        response, remaining = result
+        # 回填時保留下層的剩餘存活時間
+        age = max(0.0, self.ttl - remaining)
+        self._set_local(key, response, datetime.now() - timedelta(seconds=age))
+        return response
+    
+    def warm(self, limit: int) -> List[Tuple[str, str, str]]:
+        """
+        從持久化存儲預熱命中次數最多的條目
+        
+        Args:
+            limit: 最多預熱的條目數
+            
+        Returns:
+            [(用戶訊息, 語言代碼, 回應), ...]（用於同時預熱語義緩存）
+        """
+        if self.store is None:
+            return []
+        
+        warmed = []
+        # 從命中最少的開始寫入，命中最多的條目在 LRU 順序中最新
+        for key, message, language, response, remaining in reversed(self.store.warm(limit)):
+            age = max(0.0, self.ttl - remaining)
+            self._set_local(key, response, datetime.now() - timedelta(seconds=age))
+            warmed.append((message, language, response))
+        return warmed
     
     def clear(self) -> None:
-        """清空緩存"""
+        """清空緩存（包括共享緩存層和持久化存儲）"""
         self.cache.clear()
         self.timestamps.clear()
+        if self.shared is not None:
+            self.shared.clear()
+        if self.store is not None:
+            self.store.clear()
+
+
+class SingleFlight:
+    """
+    合併相同鍵的進行中請求
+    第一個調用方（發起方）負責調用 API，同時到達的調用方等待同一個 Future；
+    使用 concurrent.futures.Future，線程和事件循環中的調用方都可以等待
+    """
+    
+    def __init__(self):
+        """初始化進行中請求表"""
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+    
+    def join(self, key: str) -> Tuple[Future, bool]:
+        """
+        加入某個鍵的請求
+        
+        Args:
+            key: 請求鍵（與 ResponseCache 的鍵相同）
+            
+        Returns:
+            (Future, 是否為發起方)；發起方完成後必須調用 finish()
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+    
+    def finish(self, key: str, future: Future, result: Optional[str]) -> None:
+        """
+        發布結果並移除進行中的請求
+        
+        Args:
+            key: 請求鍵
+            future: join() 返回的 Future
+            result: 回應（失敗時為 None）
+        """
+        with self._lock:
+            if self._calls.get(key) is future:
+                del self._calls[key]
+        if not future.done():
+            future.set_result(result)
+    
+    def __len__(self) -> int:
+        return len(self._calls)
 
 
 class GeminiClient:
@@ -110,7 +328,44 @@ class GeminiClient:
         # 初始化緩存
         cache_size = int(os.getenv('GEMINI_CACHE_SIZE', '100'))
         cache_ttl = int(os.getenv('GEMINI_CACHE_TTL', '3600'))
-        self.cache = ResponseCache(max_size=cache_size, ttl=cache_ttl)
+        # 異步生成的總時限（秒，包括配額重試等待）
+        self.timeout = float(os.getenv('GEMINI_TIMEOUT', '20'))
+        
+        # 主模型和備用模型（按優先順序），每個模型一個熔斷器；
+        # 熔斷器打開的模型直接跳過，改用下一個可用的模型
+        fallback_models = os.getenv('GEMINI_FALLBACK_MODELS', ','.join(GEMINI_CONFIG['fallback_models']))
+        self.model_names = list(dict.fromkeys(
+            [self.model_name] + [name.strip() for name in fallback_models.split(',') if name.strip()]
+        ))
+        self.breakers = create_circuit_breakers(self.model_names)
+        # 對話上下文的 token 預算
+        self.context_budget = int(os.getenv('GEMINI_CONTEXT_BUDGET', str(GEMINI_CONFIG['context_budget'])))
+        # 對沖請求：異步請求超過此時間（秒）仍未返回時，同時向下一個可用模型發送請求，採用先返回的結果；0 表示停用
+        self.hedge_after = float(os.getenv('GEMINI_HEDGE_AFTER', '0'))
+        # 各語言的系統提示詞只構建一次；模型實例按 (模型, 語言, 生成配置檔) 緩存，
+        # 系統提示詞作為 system_instruction 綁定在模型上，每次請求只需組裝用戶輪次
+        self._system_prompts = {language: self._build_system_prompt(language) for language in ('zh', 'en')}
+        self._models: Dict[Tuple[str, str, str], Tuple[Any, bool]] = {}
+        self._system_instruction_supported = True
+        
+        # 提示詞版本：系統提示詞或提示詞模板改變後，持久化存儲中的舊回答自動失效
+        self.prompt_version = self._prompt_version()
+        self.cache = ResponseCache(
+            max_size=cache_size,
+            ttl=cache_ttl,
+            shared=create_shared_tier('gemini_responses', ttl=cache_ttl),
+            store=create_response_store(self.model_names, self.prompt_version)
+        )
+        # 可選的語義近似緩存：精確緩存未命中時查找換個說法的相同問題
+        self.semantic_cache = create_semantic_cache(ttl=cache_ttl)
+        
+        # 啟動時從持久化存儲預熱命中次數最多的回答
+        warmed = self.cache.warm(int(os.getenv('GEMINI_STORE_WARM', str(cache_size))))
+        if warmed:
+            if self.semantic_cache is not None:
+                for message, language, response in warmed:
+                    self.semantic_cache.set(message, language, response)
+            logger.info(f"已從持久化存儲預熱 {len(warmed)} 條 Gemini 回應")
         
         # 統計資訊
         self.stats = {
@@ -118,9 +373,18 @@ class GeminiClient:
             'cache_hits': 0,
             'cache_misses': 0,
             'api_errors': 0,
-            'successful_responses': 0
+            'successful_responses': 0,
+            'coalesced_requests': 0,  # 等待相同問題的進行中請求、沒有調用 API 的次數
+            'semantic_hits': 0,  # 由語義近似緩存回答的次數（也計入 cache_hits）
+            'failovers': 0,  # 配額限制後立即改用其他模型重試的次數
+            'hedged_requests': 0,  # 發出對沖請求的次數
+            'hedge_wins': 0,  # 對沖請求先返回的次數
+            'breaker_rejections': 0  # 所有模型的熔斷器都打開、直接放棄的次數
         }
         
+        # 相同問題（與緩存鍵相同）的進行中請求
+        self.inflight = SingleFlight()
+        
         if self.api_key:
             try:
                 genai.configure(api_key=self.api_key)
@@ -162,89 +426,147 @@ class GeminiClient:
         Returns:
             str: Gemini 生成的回應，如果失敗則返回 None
         """
-        if not self.is_available():
-            logger.warning("Gemini API 不可用，無法生成回應")
+        user_message = self._prepare_message(user_message)
+        if user_message is None:
             return None
         
-        # 驗證輸入
-        if not user_message or not user_message.strip():
-            logger.warning("用戶訊息為空，無法生成回應")
+        # 僅對簡單問題使用緩存，不包含上下文
+        if not use_cache or conversation_context:
+            return self._generate(user_message, conversation_context, language, max_retries, False)
+        
+        cached_response = self._get_cached(user_message, language)
+        if cached_response:
+            return cached_response
+        
+        # 相同問題已有請求在進行中時等待其結果，不重複調用 API
+        key = self.cache.make_key(user_message, language)
+        future, is_leader = self.inflight.join(key)
+        if not is_leader:
+            self.stats['coalesced_requests'] += 1
+            logger.debug(f"合併相同的進行中請求（語言: {language}）")
+            try:
+                # 發起方卡住時不無限期佔用當前線程
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                logger.error(f"等待相同問題的進行中請求超過時限（{self.timeout} 秒）")
+                return None
+        
+        response_text = None
+        try:
+            response_text = self._generate(user_message, None, language, max_retries, True)
+            return response_text
+        finally:
+            self.inflight.finish(key, future, response_text)
+    
+    async def generate_response_async(
+        self,
+        user_message: str,
+        conversation_context: Optional[list] = None,
+        language: str = 'zh',
+        max_retries: int = 2,
+        use_cache: bool = True,
+        timeout: Optional[float] = None,
+        on_chunk: Optional[Callable[[str], None]] = None
+    ) -> Optional[str]:
+        """
+        異步生成回應（緩存和重試規則與 generate_response 相同）
+        使用 SDK 的 generate_content_async，配額重試用 asyncio.sleep 等待，
+        等待期間不佔用線程；調用方取消任務時請求和等待都會立即中止
+        
+        指定 on_chunk 時以流式模式請求，每收到一段文字就調用一次；
+        緩存命中或合併到相同的進行中請求時不調用，只返回完整回應
+        
+        Args:
+            user_message: 用戶訊息
+            conversation_context: 對話上下文（可選）
+            language: 語言代碼 ('zh' 或 'en')
+            max_retries: 最大重試次數（用於處理配額限制）
+            use_cache: 是否使用緩存（默認 True）
+            timeout: 總時限（秒，包括重試等待），默認為 GEMINI_TIMEOUT；
+                     剩餘時間不足以等待下一次重試時直接放棄
+            on_chunk: 流式模式下接收每段文字的回調（可選）
+            
+        Returns:
+            str: Gemini 生成的完整回應（已清理，與緩存內容相同），如果失敗或超時則返回 None
+        """
+        user_message = self._prepare_message(user_message)
+        if user_message is None:
             return None
         
-        # 清理和限制輸入長度
-        user_message = user_message.strip()
-        if len(user_message) > 500:  # 限制輸入長度
-            user_message = user_message[:500]
-            logger.warning("用戶訊息過長，已截斷至 500 字符")
+        timeout = self.timeout if timeout is None else timeout
+        deadline = asyncio.get_running_loop().time() + timeout
+        
+        if not use_cache or conversation_context:
+            return await self._generate_async(
+                user_message, conversation_context, language, max_retries, False, deadline, on_chunk
+            )
         
-        # 檢查緩存（僅對簡單問題使用緩存，不包含上下文）
-        if use_cache and not conversation_context:
-            cached_response = self.cache.get(user_message, language)
-            if cached_response:
-                self.stats['cache_hits'] += 1
-                logger.debug(f"從緩存獲取回應（語言: {language}）")
-                return cached_response
+        cached_response = await self._get_cached_async(user_message, language)
+        if cached_response:
+            return cached_response
         
+        key = self.cache.make_key(user_message, language)
+        future, is_leader = self.inflight.join(key)
+        if not is_leader:
+            self.stats['coalesced_requests'] += 1
+            logger.debug(f"合併相同的進行中請求（語言: {language}）")
+            try:
+                # shield：等待方取消或超時不會取消發起方的請求
+                return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"等待相同問題的進行中請求超過時限（{timeout} 秒）")
+                return None
+        
+        response_text = None
+        try:
+            response_text = await self._generate_async(user_message, None, language, max_retries, True, deadline, on_chunk)
+            return response_text
+        finally:
+            # 發起方失敗或被取消時，等待方得到 None 並使用默認回應
+            self.inflight.finish(key, future, response_text)
+    
+    def _generate(
+        self,
+        user_message: str,
+        conversation_context: Optional[list],
+        language: str,
+        max_retries: int,
+        cacheable: bool
+    ) -> Optional[str]:
+        """調用 API 生成回應（同步，配額限制時改用其他模型，沒有可用模型時阻塞等待後重試）"""
         self.stats['cache_misses'] += 1
         self.stats['total_requests'] += 1
         
+        exclude = None
         for attempt in range(max_retries + 1):
+            model_name = self._select_model(exclude)
+            if model_name is None:
+                return None
             try:
-                # 構建系統提示詞
-                system_prompt = self._build_system_prompt(language)
-                
-                # 構建完整提示詞
-                full_prompt = self._build_prompt(
-                    system_prompt,
-                    user_message,
-                    conversation_context,
-                    language
-                )
-                
-                # 獲取模型
-                model = genai.GenerativeModel(self.model_name)
-                
-                # 根據語言和問題類型優化生成配置
-                generation_config = self._get_optimized_generation_config(language, user_message)
-                
                 # 生成回應
-                response = model.generate_content(
-                    full_prompt,
-                    generation_config=generation_config
-                )
-                
-                if response and response.text:
-                    response_text = response.text.strip()
-                    
-                    # 驗證和清理回應
-                    response_text = self._validate_and_clean_response(response_text, language)
-                    
-                    if response_text:
-                        # 保存到緩存（僅對簡單問題）
-                        if use_cache and not conversation_context:
-                            self.cache.set(user_message, language, response_text)
-                        
-                        self.stats['successful_responses'] += 1
-                        logger.info(f"Gemini API 回應生成成功（長度: {len(response_text)} 字符）")
-                        return response_text
-                    else:
-                        logger.warning("Gemini API 回應驗證失敗")
-                        return None
-                else:
-                    logger.warning("Gemini API 返回空回應")
-                    return None
+                response = self._call_model(model_name, user_message, conversation_context, language)
+                return self._handle_response(response, user_message, language, cacheable, model_name)
                     
             except Exception as e:
                 error_msg = str(e)
                 
-                # 處理配額限制（429 錯誤）
-                if "429" in error_msg or "quota" in error_msg.lower() or "Quota exceeded" in error_msg:
+                if self._is_quota_error(error_msg):
                     self.stats['api_errors'] += 1
+                    exclude = None
+                    if attempt < max_retries and self._has_alternative(model_name):
+                        # 其他模型可用時立即改用，不等待配額恢復
+                        self.stats['failovers'] += 1
+                        exclude = model_name
+                        logger.warning(f"Gemini 模型 {model_name} 配額限制，改用備用模型重試 ({attempt + 1}/{max_retries + 1})")
+                        continue
+                    if not self.breakers[model_name].available():
+                        # 熔斷器剛打開且沒有其他可用模型，等待重試也不會被放行
+                        logger.error(f"Gemini 模型 {model_name} 熔斷器已打開，沒有可用的備用模型")
+                        return None
                     if attempt < max_retries:
-                        # 嘗試從錯誤訊息中提取重試延遲時間
-                        retry_delay = self._extract_retry_delay(error_msg)
+                        retry_delay = self._retry_delay(error_msg)
                         logger.warning(
-                            f"Gemini API 配額限制，等待 {retry_delay} 秒後重試 "
+                            f"Gemini API 配額限制，等待 {retry_delay:.1f} 秒後重試 "
                             f"({attempt + 1}/{max_retries + 1})"
                         )
                         time.sleep(retry_delay)
@@ -253,24 +575,499 @@ class GeminiClient:
                         logger.error("Gemini API 配額限制，已達最大重試次數")
                         return None
                 
-                # 處理認證錯誤（401/403）- 不重試
-                if "401" in error_msg or "403" in error_msg or "API_KEY_INVALID" in error_msg:
-                    logger.error("Gemini API 認證失敗，請檢查 API key 是否有效")
-                    return None
+                # 對於非配額錯誤，不重試，直接返回
+                self._log_api_error(error_msg)
+                return None
+        
+        return None
+    
+    async def _generate_async(
+        self,
+        user_message: str,
+        conversation_context: Optional[list],
+        language: str,
+        max_retries: int,
+        cacheable: bool,
+        deadline: float,
+        on_chunk: Optional[Callable[[str], None]] = None
+    ) -> Optional[str]:
+        """調用 API 生成回應（異步，deadline 為事件循環時間；指定 on_chunk 時使用流式模式）"""
+        self.stats['cache_misses'] += 1
+        self.stats['total_requests'] += 1
+        
+        loop = asyncio.get_running_loop()
+        # 已經發給 on_chunk 的文字；已有輸出後不再重試，避免重複內容
+        streamed: List[str] = []
+        exclude = None
+        
+        for attempt in range(max_retries + 1):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            model_name = self._select_model(exclude)
+            if model_name is None:
+                return None
+            try:
+                if on_chunk is None:
+                    response, answered_by = await self._call_model_hedged(
+                        model_name, user_message, conversation_context, language, deadline
+                    )
+                    return self._handle_response(response, user_message, language, cacheable, answered_by, loop)
                 
-                # 處理其他錯誤
-                # 移除可能的 API key 洩露
-                if self.api_key and self.api_key in error_msg:
-                    error_msg = error_msg.replace(self.api_key, '[REDACTED]')
+                response = await self._call_model_async(
+                    model_name, user_message, conversation_context, language, remaining, stream=True
+                )
+                await self._read_stream(response, on_chunk, streamed, deadline)
+                return self._accept_text(''.join(streamed), user_message, language, cacheable, model_name, loop)
+            
+            except asyncio.TimeoutError:
+                break
+            
+            except Exception as e:
+                # asyncio.CancelledError 不是 Exception 的子類，取消會直接向上傳遞
+                error_msg = str(e)
                 
-                logger.error(f"Gemini API 調用失敗: {error_msg}")
+                if self._is_quota_error(error_msg) and not streamed:
+                    self.stats['api_errors'] += 1
+                    exclude = None
+                    if attempt < max_retries and self._has_alternative(model_name):
+                        # 其他模型可用時立即改用，不等待配額恢復
+                        self.stats['failovers'] += 1
+                        exclude = model_name
+                        logger.warning(f"Gemini 模型 {model_name} 配額限制，改用備用模型重試 ({attempt + 1}/{max_retries + 1})")
+                        continue
+                    if not self.breakers[model_name].available():
+                        # 熔斷器剛打開且沒有其他可用模型，等待重試也不會被放行
+                        logger.error(f"Gemini 模型 {model_name} 熔斷器已打開，沒有可用的備用模型")
+                        return None
+                    if attempt >= max_retries:
+                        logger.error("Gemini API 配額限制，已達最大重試次數")
+                        return None
+                    retry_delay = self._retry_delay(error_msg)
+                    if loop.time() + retry_delay >= deadline:
+                        logger.error(f"Gemini API 配額限制，重試需等待 {retry_delay:.1f} 秒，超過剩餘時限")
+                        return None
+                    logger.warning(
+                        f"Gemini API 配額限制，等待 {retry_delay:.1f} 秒後重試 "
+                        f"({attempt + 1}/{max_retries + 1})"
+                    )
+                    await asyncio.sleep(retry_delay)
+                    continue
                 
-                # 對於非配額錯誤，不重試，直接返回
-                # 配額錯誤已經在上面處理了（會 continue 重試）
+                self._log_api_error(error_msg)
                 return None
         
+        self.stats['api_errors'] += 1
+        logger.error("Gemini API 請求超過時限")
         return None
     
+    def _select_model(self, exclude: Optional[str] = None) -> Optional[str]:
+        """
+        按優先順序選擇熔斷器允許請求的模型
+        
+        Args:
+            exclude: 本次不使用的模型（剛剛遇到配額限制的模型）
+            
+        Returns:
+            模型名稱，所有模型的熔斷器都打開時返回 None
+        """
+        for model_name in self.model_names:
+            if model_name != exclude and self.breakers[model_name].allow():
+                return model_name
+        self.stats['breaker_rejections'] += 1
+        logger.error("所有 Gemini 模型的熔斷器均已打開，跳過 API 調用")
+        return None
+    
+    def _has_alternative(self, model_name: str) -> bool:
+        """除 model_name 以外是否還有可用的模型"""
+        return any(
+            name != model_name and breaker.available()
+            for name, breaker in self.breakers.items()
+        )
+    
+    def _record_failure(self, model_name: str, error: BaseException) -> None:
+        """配額限制或超時時記錄到模型的熔斷器（其他錯誤不影響熔斷器）"""
+        if isinstance(error, asyncio.TimeoutError):
+            self.breakers[model_name].record_failure()
+        elif self._is_quota_error(str(error)):
+            self.breakers[model_name].record_failure(self._extract_retry_delay(str(error)))
+    
+    def _call_model(
+        self,
+        model_name: str,
+        user_message: str,
+        conversation_context: Optional[list],
+        language: str
+    ) -> Any:
+        """調用指定模型（同步）並把結果記錄到熔斷器"""
+        model, contents = self._build_request(user_message, conversation_context, language, model_name)
+        try:
+            response = model.generate_content(contents)
+        except Exception as e:
+            self._record_failure(model_name, e)
+            raise
+        self.breakers[model_name].record_success()
+        return response
+    
+    async def _call_model_async(
+        self,
+        model_name: str,
+        user_message: str,
+        conversation_context: Optional[list],
+        language: str,
+        timeout: float,
+        stream: bool = False
+    ) -> Any:
+        """調用指定模型（異步，最多等待 timeout 秒）並把結果記錄到熔斷器"""
+        model, contents = self._build_request(user_message, conversation_context, language, model_name)
+        try:
+            if stream:
+                response = await asyncio.wait_for(model.generate_content_async(contents, stream=True), timeout=timeout)
+            else:
+                response = await asyncio.wait_for(model.generate_content_async(contents), timeout=timeout)
+        except Exception as e:
+            self._record_failure(model_name, e)
+            raise
+        self.breakers[model_name].record_success()
+        return response
+    
+    async def _call_model_hedged(
+        self,
+        model_name: str,
+        user_message: str,
+        conversation_context: Optional[list],
+        language: str,
+        deadline: float
+    ) -> Any:
+        """
+        調用模型；超過 GEMINI_HEDGE_AFTER 秒仍未返回時，向下一個可用模型發送對沖請求，
+        採用先成功返回的結果並取消另一個請求
+        
+        Args:
+            model_name: 首選模型
+            user_message: 用戶訊息
+            conversation_context: 對話上下文
+            language: 語言代碼
+            deadline: 事件循環時間的時限
+            
+        Returns:
+            (generate_content_async 的結果, 返回該結果的模型)；兩個請求都失敗時拋出最後一個錯誤
+        """
+        loop = asyncio.get_running_loop()
+        remaining = deadline - loop.time()
+        if self.hedge_after <= 0 or remaining <= self.hedge_after or not self._has_alternative(model_name):
+            response = await self._call_model_async(model_name, user_message, conversation_context, language, remaining)
+            return response, model_name
+        
+        tasks: Dict[asyncio.Task, str] = {
+            loop.create_task(
+                self._call_model_async(model_name, user_message, conversation_context, language, remaining)
+            ): model_name
+        }
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done:
+                backup = self._select_model(model_name)
+                if backup is not None:
+                    self.stats['hedged_requests'] += 1
+                    logger.info(f"Gemini 模型 {model_name} 超過 {self.hedge_after} 秒未返回，向 {backup} 發送對沖請求")
+                    tasks[loop.create_task(self._call_model_async(
+                        backup, user_message, conversation_context, language, deadline - loop.time()
+                    ))] = backup
+                pending = set(tasks)
+            
+            error: Optional[BaseException] = None
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        if tasks[task] != model_name:
+                            self.stats['hedge_wins'] += 1
+                        return task.result(), tasks[task]
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    # 取出落敗請求的錯誤，避免 "Task exception was never retrieved" 警告
+                    task.exception()
+    
+    async def _read_stream(
+        self,
+        response: Any,
+        on_chunk: Callable[[str], None],
+        streamed: List[str],
+        deadline: float
+    ) -> None:
+        """
+        逐段讀取流式回應並轉發給 on_chunk
+        
+        Args:
+            response: generate_content_async(stream=True) 的結果
+            on_chunk: 接收每段文字的回調
+            streamed: 收到的文字追加到此列表
+            deadline: 事件循環時間的時限，超過時拋出 asyncio.TimeoutError
+        """
+        loop = asyncio.get_running_loop()
+        chunks = response.__aiter__()
+        while True:
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(0.0, deadline - loop.time()))
+            except StopAsyncIteration:
+                return
+            try:
+                text = chunk.text
+            except ValueError:
+                # 沒有文字的片段（例如只有安全評級）
+                continue
+            if text:
+                streamed.append(text)
+                on_chunk(text)
+    
+    def _prompt_version(self) -> str:
+        """
+        計算提示詞版本（各語言的系統提示詞和提示詞模板的哈希）
+        
+        Returns:
+            str: 12 位十六進制字串
+        """
+        prompts = [
+            self._build_prompt(self._build_system_prompt(language), '{user_message}', None, language)
+            for language in ('zh', 'en')
+        ]
+        return hashlib.md5('\n'.join(prompts).encode('utf-8')).hexdigest()[:12]
+    
+    def _prepare_message(self, user_message: str) -> Optional[str]:
+        """
+        檢查 API 是否可用並清理用戶訊息
+        
+        Args:
+            user_message: 用戶訊息
+            
+        Returns:
+            清理後的訊息，無法生成回應時返回 None
+        """
+        if not self.is_available():
+            logger.warning("Gemini API 不可用，無法生成回應")
+            return None
+        
+        # 驗證輸入
+        if not user_message or not user_message.strip():
+            logger.warning("用戶訊息為空，無法生成回應")
+            return None
+        
+        # 清理和限制輸入長度
+        user_message = user_message.strip()
+        if len(user_message) > 500:  # 限制輸入長度
+            user_message = user_message[:500]
+            logger.warning("用戶訊息過長，已截斷至 500 字符")
+        return user_message
+    
+    def _get_cached(self, user_message: str, language: str) -> Optional[str]:
+        """查詢緩存並記錄命中（精確緩存未命中時查詢語義緩存）"""
+        return self._resolve_cached(self.cache.get(user_message, language), user_message, language)
+    
+    async def _get_cached_async(self, user_message: str, language: str) -> Optional[str]:
+        """與 _get_cached 相同，SQLite 查詢和寫入在線程池中執行"""
+        cached_response = await self.cache.get_async(user_message, language)
+        return self._resolve_cached(cached_response, user_message, language, asyncio.get_running_loop())
+    
+    def _resolve_cached(
+        self,
+        cached_response: Optional[str],
+        user_message: str,
+        language: str,
+        loop: Optional[asyncio.AbstractEventLoop] = None
+    ) -> Optional[str]:
+        """記錄精確緩存的命中，未命中時查詢語義緩存（loop 的用法同 ResponseCache.set）"""
+        if cached_response:
+            self.stats['cache_hits'] += 1
+            logger.debug(f"從緩存獲取回應（語言: {language}）")
+            return cached_response
+        
+        if self.semantic_cache is None:
+            return None
+        match = self.semantic_cache.get(user_message, language)
+        if match is None:
+            return None
+        
+        cached_response, similarity = match
+        self.stats['cache_hits'] += 1
+        self.stats['semantic_hits'] += 1
+        logger.debug(f"從語義緩存獲取回應（語言: {language}，相似度: {similarity:.2f}）")
+        # 寫入精確緩存，相同說法下次直接命中
+        self.cache.set(user_message, language, cached_response, loop=loop)
+        return cached_response
+    
+    def _build_request(
+        self,
+        user_message: str,
+        conversation_context: Optional[list],
+        language: str,
+        model_name: Optional[str] = None
+    ) -> Tuple[Any, str]:
+        """
+        選擇模型並構建本次請求的內容
+        
+        Args:
+            user_message: 用戶訊息
+            conversation_context: 對話上下文
+            language: 語言代碼
+            model_name: 模型名稱（默認為主模型）
+            
+        Returns:
+            (模型實例, 請求內容)
+        """
+        language = 'en' if language == 'en' else 'zh'
+        model, has_system_instruction = self._get_model(
+            model_name or self.model_name, language, self._generation_profile(user_message)
+        )
+        user_turn = self._build_user_turn(user_message, conversation_context, language)
+        if has_system_instruction:
+            return model, user_turn.lstrip()
+        # SDK 不支持 system_instruction 時，系統提示詞仍放在提示詞開頭
+        return model, f"{self._system_prompts[language]}\n{user_turn}"
+    
+    def _get_model(self, model_name: str, language: str, profile: str) -> Tuple[Any, bool]:
+        """
+        獲取（必要時創建）模型實例
+        
+        Args:
+            model_name: 模型名稱
+            language: 語言代碼（'zh' 或 'en'）
+            profile: 生成配置檔名稱
+            
+        Returns:
+            (模型實例, 是否已綁定系統提示詞)
+        """
+        key = (model_name, language, profile)
+        cached = self._models.get(key)
+        if cached is not None:
+            return cached
+        
+        generation_config = GENERATION_PROFILES[profile]
+        model = None
+        if self._system_instruction_supported:
+            try:
+                model = genai.GenerativeModel(
+                    model_name,
+                    generation_config=generation_config,
+                    system_instruction=self._system_prompts[language]
+                )
+            except TypeError:
+                logger.warning("google-generativeai 版本不支持 system_instruction，系統提示詞將放在每次請求的提示詞中")
+                self._system_instruction_supported = False
+        if model is None:
+            model = genai.GenerativeModel(model_name, generation_config=generation_config)
+        
+        cached = (model, self._system_instruction_supported)
+        self._models[key] = cached
+        return cached
+    
+    def _handle_response(
+        self,
+        response: Any,
+        user_message: str,
+        language: str,
+        cacheable: bool,
+        model_name: Optional[str] = None,
+        loop: Optional[asyncio.AbstractEventLoop] = None
+    ) -> Optional[str]:
+        """
+        驗證、清理並緩存 API 回應
+        
+        Args:
+            response: generate_content 的結果
+            user_message: 用戶訊息
+            language: 語言代碼
+            cacheable: 是否寫入緩存
+            model_name: 生成回應的模型
+            loop: 在事件循環中調用時傳入（緩存寫入不阻塞事件循環）
+            
+        Returns:
+            清理後的回應，無效時返回 None
+        """
+        return self._accept_text(
+            response.text if response else None, user_message, language, cacheable, model_name, loop
+        )
+    
+    def _accept_text(
+        self,
+        text: Optional[str],
+        user_message: str,
+        language: str,
+        cacheable: bool,
+        model_name: Optional[str] = None,
+        loop: Optional[asyncio.AbstractEventLoop] = None
+    ) -> Optional[str]:
+        """
+        驗證、清理並緩存回應文字（非流式和流式共用）
+        
+        Args:
+            text: 模型返回的完整文字
+            user_message: 用戶訊息
+            language: 語言代碼
+            cacheable: 是否寫入緩存
+            model_name: 生成回應的模型（記錄到持久化存儲）
+            loop: 在事件循環中調用時傳入（緩存寫入不阻塞事件循環）
+            
+        Returns:
+            清理後的回應，無效時返回 None
+        """
+        if not text:
+            logger.warning("Gemini API 返回空回應")
+            return None
+        
+        # 驗證和清理回應
+        response_text = self._validate_and_clean_response(text.strip(), language)
+        if not response_text:
+            logger.warning("Gemini API 回應驗證失敗")
+            return None
+        
+        # 保存到緩存（僅對簡單問題）
+        if cacheable:
+            self.cache.set(user_message, language, response_text, model_name, loop)
+            if self.semantic_cache is not None:
+                self.semantic_cache.set(user_message, language, response_text)
+        
+        self.stats['successful_responses'] += 1
+        logger.info(f"Gemini API 回應生成成功（長度: {len(response_text)} 字符）")
+        return response_text
+    
+    def _is_quota_error(self, error_msg: str) -> bool:
+        """是否為配額限制（429）錯誤"""
+        return "429" in error_msg or "quota" in error_msg.lower() or "Quota exceeded" in error_msg
+    
+    def _log_api_error(self, error_msg: str) -> None:
+        """記錄不重試的錯誤（認證錯誤或其他錯誤）"""
+        # 處理認證錯誤（401/403）
+        if "401" in error_msg or "403" in error_msg or "API_KEY_INVALID" in error_msg:
+            logger.error("Gemini API 認證失敗，請檢查 API key 是否有效")
+            return
+        
+        # 移除可能的 API key 洩露
+        if self.api_key and self.api_key in error_msg:
+            error_msg = error_msg.replace(self.api_key, '[REDACTED]')
+        
+        logger.error(f"Gemini API 調用失敗: {error_msg}")
+    
+    def _retry_delay(self, error_msg: str) -> float:
+        """
+        計算配額重試的等待時間：服務端建議的延遲加上隨機抖動，
+        避免同一時刻被限流的請求在同一時刻一起重試
+        
+        Args:
+            error_msg: 錯誤訊息
+            
+        Returns:
+            float: 等待時間（秒）
+        """
+        retry_delay = self._extract_retry_delay(error_msg)
+        return retry_delay + random.uniform(0, retry_delay * RETRY_JITTER)
+    
     def _extract_retry_delay(self, error_msg: str) -> float:
         """
         從錯誤訊息中提取重試延遲時間
@@ -373,7 +1170,27 @@ Remember: Be helpful, concise, and always try to guide users to useful resources
         Returns:
             str: 完整提示詞
         """
-        prompt_parts = [system_prompt]
+        return f"{system_prompt}\n{self._build_user_turn(user_message, conversation_context, language)}"
+    
+    def _build_user_turn(
+        self,
+        user_message: str,
+        conversation_context: Optional[list],
+        language: str
+    ) -> str:
+        """
+        構建提示詞中的用戶輪次（對話上下文、用戶問題和回應要求）
+        
+        Args:
+            user_message: 用戶訊息
+            conversation_context: 對話上下文
+            language: 語言代碼
+            
+        Returns:
+            str: 用戶輪次
+        """
+        template = PROMPT_TEMPLATES['en' if language == 'en' else 'zh']
+        prompt_parts = []
         
         # 智能添加對話上下文（優化版本）
         if conversation_context:
@@ -381,21 +1198,12 @@ Remember: Be helpful, concise, and always try to guide users to useful resources
             filtered_context = self._filter_and_compress_context(conversation_context, language)
             
             if filtered_context:
-                if language == 'en':
-                    prompt_parts.append("\n\nRecent conversation context:")
-                else:
-                    prompt_parts.append("\n\n最近的對話上下文：")
-                
-                for ctx in filtered_context:
-                    prompt_parts.append(f"- {ctx}")
+                prompt_parts.append(template['context_header'])
+                prompt_parts.extend(f"- {ctx}" for ctx in filtered_context)
         
         # 添加用戶訊息（優化格式）
-        if language == 'en':
-            prompt_parts.append(f"\n\nUser question: {user_message}")
-            prompt_parts.append("\n\nPlease provide a concise and helpful response:")
-        else:
-            prompt_parts.append(f"\n\n用戶問題：{user_message}")
-            prompt_parts.append("\n\n請提供簡潔且有用的回應：")
+        prompt_parts.append(template['question'] + user_message)
+        prompt_parts.append(template['instruction'])
         
         return "\n".join(prompt_parts)
     
@@ -405,29 +1213,38 @@ Remember: Be helpful, concise, and always try to guide users to useful resources
         language: str
     ) -> List[str]:
         """
-        過濾和壓縮對話上下文，只保留相關內容
+        把對話上下文限制在 token 預算（GEMINI_CONTEXT_BUDGET）以內：
+        從最新的一條開始保留，過長的條目保留開頭和結尾
+        （action 已用 ContextBuilder 按相同預算構建時不會再被裁剪）
         
         Args:
             conversation_context: 原始上下文列表
             language: 語言代碼
             
         Returns:
-            List[str]: 過濾後的上下文列表
+            List[str]: 預算內的上下文列表
         """
         if not conversation_context:
             return []
         
-        filtered = []
-        max_context_items = 3  # 減少到 3 條以節省 token
-        
-        # 只取最近的幾條，並壓縮長度
-        for ctx in conversation_context[-max_context_items:]:
-            # 壓縮過長的上下文
-            if len(ctx) > 150:
-                ctx = ctx[:150] + "..."
-            filtered.append(ctx)
+        return fit_to_budget(conversation_context, self.context_budget)
+    
+    def _generation_profile(self, user_message: str) -> str:
+        """
+        根據問題類型選擇生成配置檔
         
-        return filtered
+        Args:
+            user_message: 用戶訊息
+            
+        Returns:
+            str: GENERATION_PROFILES 中的名稱
+        """
+        # 檢測問題類型
+        if len(user_message) < 50:
+            return 'simple'
+        if len(user_message) > 200 or '?' in user_message or '？' in user_message:
+            return 'complex'
+        return 'default'
     
     def _get_optimized_generation_config(self, language: str, user_message: str) -> Dict[str, Any]:
         """
@@ -440,29 +1257,7 @@ Remember: Be helpful, concise, and always try to guide users to useful resources
         Returns:
             Dict: 優化的生成配置
         """
-        # 檢測問題類型
-        is_simple_question = len(user_message) < 50
-        is_complex_question = len(user_message) > 200 or '?' in user_message or '？' in user_message
-        
-        # 基礎配置
-        config = {
-            'temperature': 0.7,  # 平衡創造性和準確性
-            'top_p': 0.8,  # 核採樣
-            'top_k': 40,  # Top-K 採樣
-            'max_output_tokens': 512,  # 減少 token 使用（從 1024 降到 512）
-        }
-        
-        # 根據問題類型調整
-        if is_simple_question:
-            # 簡單問題：更確定性，更短回應
-            config['temperature'] = 0.5
-            config['max_output_tokens'] = 256
-        elif is_complex_question:
-            # 複雜問題：允許更多創造性，更長回應
-            config['temperature'] = 0.8
-            config['max_output_tokens'] = 512
-        
-        return config
+        return dict(GENERATION_PROFILES[self._generation_profile(user_message)])
     
     def _validate_and_clean_response(self, response: str, language: str) -> Optional[str]:
         """
@@ -522,12 +1317,19 @@ Remember: Be helpful, concise, and always try to guide users to useful resources
             **self.stats,
             'cache_hit_rate': f"{cache_hit_rate:.1f}%",
             'cache_size': len(self.cache.cache),
-            'model': self.model_name
+            'inflight_requests': len(self.inflight),
+            'semantic_cache_size': len(self.semantic_cache) if self.semantic_cache is not None else 0,
+            'store_size': self.cache.store.size() if self.cache.store is not None else 0,
+            'prompt_version': self.prompt_version,
+            'model': self.model_name,
+            'breakers': {name: breaker.get_stats() for name, breaker in self.breakers.items()}
         }
     
     def clear_cache(self) -> None:
         """清空緩存"""
         self.cache.clear()
+        if self.semantic_cache is not None:
+            self.semantic_cache.clear()
         logger.info("Gemini 響應緩存已清空")
 
 
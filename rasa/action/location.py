@@ -0,0 +1,185 @@
+"""
+樓層與位置提取
+所有樓層格式（3F、三樓、third floor、B1、地下一樓、2-3樓）和位置短語（左側、第一個、最靠窗）
+在導入時編譯成一個帶命名分組的正則表達式，extract_location() 對文本只掃描一遍
+"""
+
+import re
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 中文數字
+_ZH_DIGITS = {'零': 0, '〇': 0, '一': 1, '二': 2, '兩': 2, '三': 3, '四': 4, '五': 5,
+              '六': 6, '七': 7, '八': 8, '九': 9}
+_EN_ORDINALS = {'ground': 1, 'first': 1, 'second': 2, 'third': 3, 'fourth': 4, 'fifth': 5,
+                'sixth': 6, 'seventh': 7, 'eighth': 8, 'ninth': 9, 'tenth': 10}
+
+_NUMBER = r'\d{1,2}|[一二兩三四五六七八九十]{1,3}'
+_FLOOR_SUFFIX = r'(?:[Ff](?![A-Za-z])|樓)'
+
+
+def _en(phrase: str) -> str:
+    """英文短語只要求兩側不是英文字母或數字（與 matcher 相同），緊貼中文時也能匹配"""
+    return rf'(?<![A-Za-z0-9]){phrase}(?![A-Za-z0-9])'
+
+
+# 分組名即類別；同一位置有多種寫法時，排在前面的分支優先（範圍先於單一樓層，地下樓層先於普通樓層）
+_LOCATION_PATTERN = re.compile(
+    '|'.join([
+        rf'(?P<floor_range>(?P<range_from>{_NUMBER})\s*(?:[Ff]|樓)?\s*(?:-|~|～|到|至)\s*(?P<range_to>{_NUMBER})\s*{_FLOOR_SUFFIX})',
+        rf'(?P<basement>(?:(?<![A-Za-z])[Bb]|地下\s*)(?P<basement_level>\d|[一二三四五])(?:\s*{_FLOOR_SUFFIX})?)',
+        '(?P<basement_en>' + _en(r'basement(?:\s+(?:level\s+)?(?P<basement_en_level>\d))?') + ')',
+        rf'(?P<floor>(?<!\d)(?P<floor_number>{_NUMBER})\s*{_FLOOR_SUFFIX})',
+        '(?P<floor_en>' + _en(
+            r'(?P<floor_ordinal>ground|first|second|third|fourth|fifth|sixth|seventh|eighth|ninth|tenth|'
+            r'(?P<floor_ordinal_number>\d{1,2})(?:st|nd|rd|th))\s+floor'
+        ) + ')',
+        '(?P<floor_en_number>' + _en(r'floor\s+(?P<floor_en_value>\d{1,2})') + ')',
+        r'(?P<order>第(?P<order_value>[一二三四五六七八九十\d]+)[個項]|(?P<number_value>[一二三四五六七八九十\d]+)號)',
+        rf"(?P<side_left>左側|左邊|{_en('left side')}|{_en('left')})",
+        rf"(?P<side_right>右側|右邊|{_en('right side')}|{_en('right')})",
+        rf"(?P<side_middle>中間|中央|{_en('middle')}|{_en('center')})",
+        rf"(?P<specific_window>最靠窗|靠窗|{_en('near window')}|{_en('by window')})",
+        rf"(?P<specific_inside>最裡面|裡面|{_en('inside')}|{_en('inner')})",
+        rf"(?P<specific_outside>最外面|外面|{_en('outside')}|{_en('outer')})",
+        rf"(?P<specific_near>最靠近|靠近|{_en('near')}|{_en('close to')})",
+    ]),
+    re.IGNORECASE
+)
+
+# 同一類別命中多個短語時的優先級（數字越小越優先，與原有的判斷順序一致）
+_SIDE_PRIORITY = {'side_left': 0, 'side_right': 1, 'side_middle': 2}
+_SPECIFIC_PRIORITY = {'specific_window': 0, 'specific_inside': 1, 'specific_outside': 2, 'specific_near': 3}
+
+
+def parse_number(value: str) -> Optional[int]:
+    """
+    把阿拉伯數字或中文數字（最多到九十九）轉成整數
+
+    Args:
+        value: 例如 '3'、'三'、'十二'、'二十'
+
+    Returns:
+        整數，無法解析時返回 None
+    """
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    if '十' in value:
+        tens, _, ones = value.partition('十')
+        tens_value = _ZH_DIGITS.get(tens, 1) if tens else 1
+        ones_value = _ZH_DIGITS.get(ones, 0) if ones else 0
+        return tens_value * 10 + ones_value
+    if len(value) == 1:
+        return _ZH_DIGITS.get(value)
+    return None
+
+
+def extract_location(text: Optional[str]) -> Dict[str, Any]:
+    """
+    單次掃描提取樓層和位置資訊
+
+    Args:
+        text: 輸入文本
+
+    Returns:
+        {
+            'floor': 第一個提到的樓層（如 '3F'、'B1'），沒有時為 None,
+            'floors': 提到的所有樓層（範圍會展開，如 2-3樓 -> ['2F', '3F']）,
+            'side': 'left' / 'right' / 'middle' / None,
+            'position': 序號原文（如 '第一個'）或 'specific' / None,
+            'specific': 'window' / 'inside' / 'outside' / 'near' / None
+        }
+    """
+    return _summarize(_LOCATION_PATTERN.finditer(text or ''))
+
+
+def extract_location_spans(text: Optional[str], spans: List[Tuple[int, int]]) -> List[Dict[str, Any]]:
+    """
+    對整條消息掃描一遍，按片段分別匯總位置資訊（用於一條消息中的多個問題）
+
+    Args:
+        text: 輸入文本
+        spans: 片段的 (起始, 結束) 位置，按起始位置排序且互不重疊
+
+    Returns:
+        每個片段一個 extract_location() 格式的結果；跨越片段邊界的短語不計入
+    """
+    starts = [start for start, _ in spans]
+    buckets: List[List[re.Match]] = [[] for _ in spans]
+    for match in _LOCATION_PATTERN.finditer(text or ''):
+        index = bisect_right(starts, match.start()) - 1
+        if index >= 0 and match.end() <= spans[index][1]:
+            buckets[index].append(match)
+    return [_summarize(matches) for matches in buckets]
+
+
+def _summarize(matches: Iterable[re.Match]) -> Dict[str, Any]:
+    """把正則匹配匯總成 extract_location() 的結果"""
+    floors: List[str] = []
+    side: Optional[str] = None
+    side_priority = len(_SIDE_PRIORITY)
+    specific: Optional[str] = None
+    specific_priority = len(_SPECIFIC_PRIORITY)
+    order: Optional[str] = None
+    order_is_numbered = False
+
+    for match in matches:
+        kind = match.lastgroup
+        groups = match.groupdict()
+
+        if kind == 'floor_range':
+            start = parse_number(groups['range_from'])
+            end = parse_number(groups['range_to'])
+            if start and end and start <= end and end - start < 20:
+                floors.extend(f"{level}F" for level in range(start, end + 1))
+        elif kind == 'basement':
+            level = parse_number(groups['basement_level'])
+            if level:
+                floors.append(f"B{level}")
+        elif kind == 'basement_en':
+            floors.append(f"B{groups['basement_en_level'] or 1}")
+        elif kind == 'floor':
+            level = parse_number(groups['floor_number'])
+            if level:
+                floors.append(f"{level}F")
+        elif kind == 'floor_en':
+            ordinal = groups['floor_ordinal'].lower()
+            level = int(groups['floor_ordinal_number']) if groups['floor_ordinal_number'] else _EN_ORDINALS[ordinal]
+            floors.append(f"{level}F")
+        elif kind == 'floor_en_number':
+            floors.append(f"{int(groups['floor_en_value'])}F")
+        elif kind == 'order':
+            # 「第N個」優先於「N號」
+            numbered = groups['order_value'] is not None
+            if order is None or (numbered and not order_is_numbered):
+                order = match.group(0)
+                order_is_numbered = numbered
+        elif kind in _SIDE_PRIORITY:
+            if _SIDE_PRIORITY[kind] < side_priority:
+                side, side_priority = kind[len('side_'):], _SIDE_PRIORITY[kind]
+        elif kind in _SPECIFIC_PRIORITY:
+            if _SPECIFIC_PRIORITY[kind] < specific_priority:
+                specific, specific_priority = kind[len('specific_'):], _SPECIFIC_PRIORITY[kind]
+
+    return {
+        'floor': floors[0] if floors else None,
+        'floors': list(dict.fromkeys(floors)),
+        'side': side,
+        'position': 'specific' if specific else order,
+        'specific': specific,
+    }
+
+
+def extract_floor(text: Optional[str]) -> Optional[str]:
+    """
+    從文本中提取第一個提到的樓層
+
+    Args:
+        text: 輸入文本
+
+    Returns:
+        樓層（如 '3F'、'B1'），沒有時返回 None
+    """
+    return extract_location(text)['floor']
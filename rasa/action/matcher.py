@@ -0,0 +1,217 @@
+"""
+多模式別名匹配器
+把 config.py 中的詞彙表（設施類型、狀態、校區、建築）在導入時編譯成 Aho-Corasick 自動機，
+每次查詢只需掃描一遍文本
+"""
+
+from bisect import bisect_right
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# (起始位置, 結束位置, 值, 優先級)
+Match = Tuple[int, int, Any, int]
+
+
+def _is_ascii_alnum(char: str) -> bool:
+    """是否為 ASCII 字母或數字"""
+    return char.isascii() and char.isalnum()
+
+
+class AliasMatcher:
+    """
+    Aho-Corasick 多模式匹配器
+
+    鍵在建立時做 casefold，查詢時文本也只 casefold 一次；
+    以 ASCII 字母數字開頭的別名要求左側為詞邊界（避免 "book" 命中 "ok"），
+    右側不限制，以保留 "toilets"、"restrooms" 等複數形式的匹配
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, Any, int]] = (), word_boundary: bool = True):
+        """
+        初始化匹配器
+
+        Args:
+            patterns: (別名, 值, 優先級) 序列，優先級數字越小越優先
+            word_boundary: ASCII 別名是否要求左側詞邊界；False 時為純子字串匹配
+        """
+        self.word_boundary = word_boundary
+        # 每個狀態: 字元 -> 下一狀態
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 每個狀態結束的模式: (長度, 值, 優先級, 是否需要左邊界)
+        self._output: List[List[Tuple[int, Any, int, bool]]] = [[]]
+        self._built = False
+        self.size = 0
+
+        for pattern, value, priority in patterns:
+            self.add(pattern, value, priority)
+        self.build()
+
+    def add(self, pattern: str, value: Any, priority: int = 0) -> None:
+        """
+        添加一個模式（添加後需要重新 build）
+
+        Args:
+            pattern: 別名
+            value: 匹配時返回的值
+            priority: 優先級，數字越小越優先
+        """
+        key = pattern.casefold()
+        if not key:
+            return
+
+        state = 0
+        for char in key:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+
+        self._output[state].append((len(key), value, priority, self.word_boundary and _is_ascii_alnum(key[0])))
+        self.size += 1
+        self._built = False
+
+    def build(self) -> None:
+        """計算失敗指針（BFS）"""
+        queue = deque()
+        for next_state in self._goto[0].values():
+            self._fail[next_state] = 0
+            queue.append(next_state)
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail_next = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail_next if fail_next != next_state else 0
+                # 合併失敗狀態的輸出，查詢時無需沿失敗鏈回溯
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+        self._built = True
+
+    def find_all(self, text: str) -> List[Match]:
+        """
+        找出文本中所有匹配
+
+        Args:
+            text: 輸入文本
+
+        Returns:
+            (起始位置, 結束位置, 值, 優先級) 列表，按結束位置排序；
+            位置以 casefold 後的文本計算（中文與 ASCII 文本與原文一致）
+        """
+        if not self._built:
+            self.build()
+        if not text:
+            return []
+
+        folded = text.casefold()
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        matches: List[Match] = []
+
+        root = goto[0]
+        state = 0
+        for index, char in enumerate(folded):
+            if state == 0:
+                # 大部分字元不是任何別名的開頭，直接跳過
+                state = root.get(char, 0)
+            else:
+                transitions = goto[state]
+                while state and char not in transitions:
+                    state = fail[state]
+                    transitions = goto[state]
+                state = transitions.get(char, 0)
+            if not output[state]:
+                continue
+            end = index + 1
+            for length, value, priority, needs_boundary in output[state]:
+                start = end - length
+                if needs_boundary and start > 0 and _is_ascii_alnum(folded[start - 1]):
+                    continue
+                matches.append((start, end, value, priority))
+
+        return matches
+
+    def first(self, text: str) -> Optional[Any]:
+        """
+        返回優先級最高的匹配值（優先級相同時取最先出現的）
+
+        Args:
+            text: 輸入文本
+
+        Returns:
+            匹配值，沒有匹配時返回 None
+        """
+        best: Optional[Match] = None
+        for match in self.find_all(text):
+            if best is None or match[3] < best[3]:
+                best = match
+        return best[2] if best else None
+
+    def longest(self, text: str) -> Optional[Any]:
+        """
+        返回最長的匹配值（長度相同時取優先級高的）
+
+        Args:
+            text: 輸入文本
+
+        Returns:
+            匹配值，沒有匹配時返回 None
+        """
+        best: Optional[Match] = None
+        best_key: Optional[Tuple[int, int]] = None
+        for match in self.find_all(text):
+            key = (match[0] - match[1], match[3])
+            if best_key is None or key < best_key:
+                best, best_key = match, key
+        return best[2] if best else None
+
+
+def compile_vocabulary(vocabulary: Dict[str, Dict[str, Any]]) -> Tuple[AliasMatcher, Dict[str, str]]:
+    """
+    把 config.py 格式的詞彙表編譯成匹配器和反向別名表
+
+    Args:
+        vocabulary: {標準值: {'aliases_zh': [...], 'aliases_en': [...], ...}}
+
+    Returns:
+        (匹配器, casefold 後的別名 -> 標準值)；優先級即詞彙表中的聲明順序
+    """
+    patterns: List[Tuple[str, str, int]] = []
+    alias_map: Dict[str, str] = {}
+
+    for priority, (canonical, config) in enumerate(vocabulary.items()):
+        for alias in list(config.get('aliases_en', [])) + list(config.get('aliases_zh', [])):
+            patterns.append((alias, canonical, priority))
+            alias_map.setdefault(alias.casefold(), canonical)
+
+    return AliasMatcher(patterns), alias_map
+
+
+def bucket_by_span(matches: Iterable[Match], spans: List[Tuple[int, int]]) -> List[List[Match]]:
+    """
+    把一次掃描得到的匹配按所在片段分組
+
+    Args:
+        matches: find_all() 的結果
+        spans: 片段的 (起始, 結束) 位置，按起始位置排序且互不重疊
+
+    Returns:
+        每個片段的匹配列表；跨越片段邊界或落在片段之間的匹配丟棄
+    """
+    starts = [start for start, _ in spans]
+    buckets: List[List[Match]] = [[] for _ in spans]
+    for match in matches:
+        index = bisect_right(starts, match[0]) - 1
+        if index >= 0 and match[1] <= spans[index][1]:
+            buckets[index].append(match)
+    return buckets
@@ -0,0 +1,334 @@
+"""
+持久化會話記憶
+在 ConversationMemory 的內存熱層之下加一個 SQLAlchemy 存儲：
+寫入先進熱層再批量寫回（write-behind），熱層未命中時從數據庫讀回（read-through），
+用戶偏好因此能跨重新部署保留，並在多個 worker 之間共享：
+熱層中的用戶（以及確認沒有記憶的用戶）超過 refresh_interval 秒後重新讀取數據庫，
+其他 worker 寫入的值最多延遲 refresh_interval + 對方的 flush_interval 秒可見
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import PERFORMANCE_CONFIG
+from .utils import ConversationMemory
+
+logger = logging.getLogger(__name__)
+
+try:
+    import sqlalchemy as sa
+    SQLALCHEMY_AVAILABLE = True
+except ImportError:
+    sa = None
+    SQLALCHEMY_AVAILABLE = False
+
+# 待寫回操作中表示「刪除該用戶所有記憶」的鍵
+_ALL_KEYS = None
+# 待寫回操作中表示「刪除該條記憶」的值
+_DELETED = object()
+
+
+class PersistentConversationMemory(ConversationMemory):
+    """
+    帶持久化後端的會話記憶
+
+    recall() 命中熱層時不接觸數據庫；remember()/forget() 只記錄待寫回操作，
+    由後台線程按 flush_interval 或累積到 flush_batch 條時批量提交
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        ttl: int = 3600,
+        max_entries: int = 100000,
+        sweep_interval: float = 300,
+        flush_interval: float = 2,
+        flush_batch: int = 100,
+        refresh_interval: float = 5,
+        table_name: str = "conversation_memory"
+    ):
+        """
+        初始化持久化會話記憶
+
+        Args:
+            db_url: SQLAlchemy 連線字串，例如 sqlite:////data/conversation_memory.db
+            ttl: 記憶過期時間（秒）
+            max_entries: 熱層條目總上限
+            sweep_interval: 熱層後台清掃間隔（秒）
+            flush_interval: 寫回間隔（秒）
+            flush_batch: 待寫回操作達到此數量時提前寫回
+            refresh_interval: 熱層中的用戶超過此時間（秒）後重新讀取數據庫
+            table_name: 數據表名稱
+        """
+        if not SQLALCHEMY_AVAILABLE:
+            raise ImportError("sqlalchemy is required for PersistentConversationMemory")
+
+        super().__init__(ttl=ttl, max_entries=max_entries, sweep_interval=sweep_interval)
+
+        self.db_url = db_url
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.refresh_interval = refresh_interval
+
+        connect_args = {'check_same_thread': False} if db_url.startswith('sqlite') else {}
+        self.engine = sa.create_engine(db_url, future=True, connect_args=connect_args)
+        if self.engine.dialect.name == 'sqlite':
+            with self.engine.begin() as conn:
+                conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+        metadata = sa.MetaData()
+        self.table = sa.Table(
+            table_name, metadata,
+            sa.Column('user_id', sa.String(255), primary_key=True),
+            sa.Column('key', sa.String(255), primary_key=True),
+            sa.Column('value', sa.Text, nullable=False),
+            sa.Column('expires_at', sa.Float, nullable=False, index=True)
+        )
+        metadata.create_all(self.engine)
+
+        # (user_id, key) -> (value, 過期時間戳) 或 _DELETED；key 為 _ALL_KEYS 表示刪除整個用戶
+        self._pending: "OrderedDict[Tuple[str, Optional[str]], Any]" = OrderedDict()
+        self._pending_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._flusher_pid: Optional[int] = None
+
+        # user_id -> (上次從數據庫讀取的時間（單調時鐘）, 是否讀到記憶)；沒有記憶的用戶即負緩存，
+        # 超過 refresh_interval 後重新讀取。由 self._lock 保護
+        self._loaded_at: "OrderedDict[str, Tuple[float, bool]]" = OrderedDict()
+        self._loaded_max = max_entries
+
+        # 統計資訊
+        self.db_reads = 0
+        self.flushes = 0
+        self.flush_errors = 0
+
+        atexit.register(self.flush)
+
+    def remember(self, user_id: str, key: str, value: Any) -> None:
+        """記住用戶偏好，並排入寫回隊列"""
+        self._ensure_loaded(user_id)
+        super().remember(user_id, key, value)
+        self._enqueue((user_id, key), (value, time.time() + self.ttl))
+
+    def recall(self, user_id: str, key: str, default: Any = None) -> Any:
+        """回憶用戶偏好，熱層未命中時從數據庫讀回"""
+        self._ensure_loaded(user_id)
+        return super().recall(user_id, key, default)
+
+    def forget(self, user_id: str, key: Optional[str] = None) -> None:
+        """忘記用戶記憶，並排入寫回隊列"""
+        self._ensure_loaded(user_id)
+        super().forget(user_id, key)
+        if key:
+            self._enqueue((user_id, key), _DELETED)
+        else:
+            with self._pending_lock:
+                for pending_key in [k for k in self._pending if k[0] == user_id]:
+                    del self._pending[pending_key]
+            self._enqueue((user_id, _ALL_KEYS), _DELETED)
+
+    def get_user_context(self, user_id: str) -> Dict[str, Any]:
+        """獲取用戶完整上下文，熱層未命中時從數據庫讀回"""
+        self._ensure_loaded(user_id)
+        return super().get_user_context(user_id)
+
+    def _ensure_loaded(self, user_id: str) -> None:
+        """
+        熱層中沒有該用戶，或上次讀取已超過 refresh_interval 時，從數據庫讀回其未過期的記憶
+        （尚未寫回的本地操作優先於數據庫中的值）
+        """
+        with self._lock:
+            loaded = self._loaded_at.get(user_id)
+            if loaded is not None and time.monotonic() - loaded[0] < self.refresh_interval:
+                # 讀到過記憶但已被熱層淘汰時需要重新讀取
+                if not loaded[1] or user_id in self.memory:
+                    return
+
+        now = time.time()
+        try:
+            with self.engine.connect() as conn:
+                rows = conn.execute(
+                    sa.select(self.table.c.key, self.table.c.value, self.table.c.expires_at)
+                    .where(self.table.c.user_id == user_id)
+                    .where(self.table.c.expires_at > now)
+                ).fetchall()
+            self.db_reads += 1
+        except sa.exc.SQLAlchemyError as e:
+            logger.warning(f"Conversation memory read failed for {user_id}: {e}")
+            return
+
+        loaded: Dict[str, Tuple[Any, float]] = {key: (json.loads(value), expires_at) for key, value, expires_at in rows}
+
+        # 尚未寫回的操作比數據庫中的數據新
+        with self._pending_lock:
+            for (pending_user, pending_key), op in self._pending.items():
+                if pending_user != user_id:
+                    continue
+                if pending_key is _ALL_KEYS:
+                    loaded.clear()
+                elif op is _DELETED:
+                    loaded.pop(pending_key, None)
+                else:
+                    loaded[pending_key] = op
+
+        # 數據庫存的是牆鐘時間，熱層使用單調時鐘
+        offset = time.monotonic() - now
+        with self._lock:
+            # 以數據庫（加上未寫回操作）的內容替換熱層中該用戶的記憶
+            stale = self.memory.pop(user_id, None)
+            if stale:
+                self._entries -= len(stale)
+            for key, (value, expires_at) in loaded.items():
+                self._put(user_id, key, value, expires_at + offset)
+
+            self._loaded_at.pop(user_id, None)
+            self._loaded_at[user_id] = (time.monotonic(), bool(loaded))
+            while len(self._loaded_at) > self._loaded_max:
+                self._loaded_at.popitem(last=False)
+
+    def _enqueue(self, pending_key: Tuple[str, Optional[str]], op: Any) -> None:
+        """記錄待寫回操作，同一鍵只保留最新的一次"""
+        self._ensure_flusher()
+        with self._pending_lock:
+            self._pending.pop(pending_key, None)
+            self._pending[pending_key] = op
+            if len(self._pending) >= self.flush_batch:
+                self._flush_event.set()
+
+    def flush(self) -> int:
+        """
+        把待寫回操作批量提交到數據庫
+
+        Returns:
+            提交的操作數
+        """
+        with self._pending_lock:
+            if not self._pending:
+                return 0
+            batch = self._pending
+            self._pending = OrderedDict()
+
+        delete_users: List[Dict[str, Any]] = []
+        delete_keys: List[Dict[str, Any]] = []
+        inserts: List[Dict[str, Any]] = []
+        for (user_id, key), op in batch.items():
+            if key is _ALL_KEYS:
+                delete_users.append({'u': user_id})
+                continue
+            delete_keys.append({'u': user_id, 'k': key})
+            if op is not _DELETED:
+                value, expires_at = op
+                inserts.append({'user_id': user_id, 'key': key, 'value': json.dumps(value, ensure_ascii=False), 'expires_at': expires_at})
+
+        table = self.table
+        try:
+            with self.engine.begin() as conn:
+                # 刪除整個用戶的操作發生在之後任何寫入之前（forget 時已移除其更早的寫入）
+                if delete_users:
+                    conn.execute(table.delete().where(table.c.user_id == sa.bindparam('u')), delete_users)
+                if delete_keys:
+                    conn.execute(
+                        table.delete().where(table.c.user_id == sa.bindparam('u')).where(table.c.key == sa.bindparam('k')),
+                        delete_keys
+                    )
+                if inserts:
+                    conn.execute(table.insert(), inserts)
+                conn.execute(table.delete().where(table.c.expires_at <= time.time()))
+        except sa.exc.SQLAlchemyError as e:
+            self.flush_errors += 1
+            logger.error(f"Conversation memory flush failed: {e}")
+            # 放回隊列，保留期間產生的更新操作
+            with self._pending_lock:
+                for pending_key, op in batch.items():
+                    if pending_key not in self._pending:
+                        self._pending[pending_key] = op
+            return 0
+
+        self.flushes += 1
+        logger.debug(f"Flushed {len(batch)} conversation memory operations")
+        return len(batch)
+
+    def _ensure_flusher(self) -> None:
+        """按需啟動寫回線程（fork 後的子進程會重新啟動）"""
+        pid = os.getpid()
+        if self._flusher is not None and self._flusher_pid == pid and self._flusher.is_alive():
+            return
+
+        with self._pending_lock:
+            if self._flusher is not None and self._flusher_pid == pid and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(
+                target=self._flush_loop,
+                name="conversation-memory-flusher",
+                daemon=True
+            )
+            self._flusher_pid = pid
+            self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        """後台寫回循環"""
+        while True:
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Conversation memory flusher error: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取統計資訊"""
+        return {
+            'hot_entries': self.size(),
+            'hot_users': self.user_count(),
+            'pending_writes': len(self._pending),
+            'db_reads': self.db_reads,
+            'flushes': self.flushes,
+            'flush_errors': self.flush_errors
+        }
+
+
+def create_conversation_memory(ttl: int, max_entries: int, sweep_interval: float) -> ConversationMemory:
+    """
+    根據環境變數創建會話記憶
+
+    設置 CONVERSATION_DB_URL（例如 sqlite:////data/conversation_memory.db）時使用持久化後端，
+    未設置或 SQLAlchemy 不可用時使用純內存實現
+
+    Args:
+        ttl: 記憶過期時間（秒）
+        max_entries: 熱層條目總上限
+        sweep_interval: 熱層後台清掃間隔（秒）
+
+    Returns:
+        ConversationMemory 實例
+    """
+    db_url = os.getenv('CONVERSATION_DB_URL')
+    if not db_url:
+        return ConversationMemory(ttl=ttl, max_entries=max_entries, sweep_interval=sweep_interval)
+
+    if not SQLALCHEMY_AVAILABLE:
+        logger.warning("CONVERSATION_DB_URL 已設置但未安裝 sqlalchemy，使用內存會話記憶")
+        return ConversationMemory(ttl=ttl, max_entries=max_entries, sweep_interval=sweep_interval)
+
+    try:
+        memory = PersistentConversationMemory(
+            db_url,
+            ttl=ttl,
+            max_entries=max_entries,
+            sweep_interval=sweep_interval,
+            flush_interval=PERFORMANCE_CONFIG['memory_flush_interval'],
+            flush_batch=PERFORMANCE_CONFIG['memory_flush_batch'],
+            refresh_interval=PERFORMANCE_CONFIG['memory_refresh_interval']
+        )
+        logger.info(f"Persistent conversation memory enabled ({memory.engine.dialect.name})")
+        return memory
+    except Exception as e:
+        logger.warning(f"無法啟用持久化會話記憶: {e}，使用內存會話記憶")
+        return ConversationMemory(ttl=ttl, max_entries=max_entries, sweep_interval=sweep_interval)
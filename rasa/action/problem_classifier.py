@@ -0,0 +1,305 @@
+"""
+設施問題分類器
+問題類別的關鍵詞表以數據形式聲明一次，導入時編譯成一個多模式匹配器；
+分類時只掃描一遍描述文本，得到所有類別標籤，再按固定的決策表得出
+(status, severity, notes, priority)
+"""
+
+from typing import Dict, FrozenSet, List, Tuple
+
+from .matcher import AliasMatcher, bucket_by_span
+
+# 部分問題（單個設備有問題）的線索
+PARTIAL_KEYWORDS: List[str] = [
+    '一個', 'one', '部分', 'part', '有些', 'some', '幾個', 'few',
+    '小便斗', 'urinal', '馬桶', 'toilet', '水龍頭', 'faucet',
+    '洗手台', 'sink', '烘手機', 'hand dryer',
+    '最靠窗', '最裡面', '最外面', '第一個', '第二個', '第三個',
+    '左側', '右側', '左邊', '右邊', 'near window', 'first', 'second'
+]
+
+# 問題類別 -> 關鍵詞
+CATEGORY_KEYWORDS: Dict[str, List[str]] = {
+    # 衛生問題（有大便、有尿、很髒、有異味等）
+    'hygiene': [
+        # 排泄物相關
+        '大便', 'poop', 'feces', 'stool', '糞便', '排泄物', 'waste',
+        '有尿', 'urine', 'pee', '尿液',
+        '裡面有', 'inside has', '裡面', 'inside', '有東西', 'has something',
+        # 清潔度問題
+        '很髒', 'very dirty', 'dirty', '髒', '不乾淨', 'not clean', '骯髒',
+        '污漬', 'stain', '污垢', 'dirt', '垃圾', 'trash', 'garbage',
+        '未清理', 'not cleaned', '沒清', "hasn't been cleaned",
+        # 異味問題
+        '有異味', '有臭味', 'smell', 'odor', 'stink', '臭', '異味', '臭味',
+        '難聞', 'bad smell', 'foul odor', '惡臭',
+        # 異物問題
+        '有異物', 'foreign object', '異物', 'something inside',
+        # 衛生紙問題
+        '沒紙', 'no paper', '沒有衛生紙', 'no toilet paper', '缺紙',
+        '紙用完了', 'paper ran out', '紙沒了'
+    ],
+    # 堵塞問題
+    'clog': [
+        '堵塞', 'clog', 'blocked', 'blocking', '堵住', '堵了',
+        '不通', 'not working', 'not flowing', '不流通',
+        '沖不掉', '沖不下去', "won't flush", "can't flush", '沖不走',
+        '卡住', 'stuck', 'jam', '卡了',
+        '排水不暢', 'drain slowly', '排水慢', 'slow drain',
+        '倒灌', 'backflow', '回流', 'water backflow'
+    ],
+    # 損壞問題（壞了、故障、漏水等）
+    'broken': [
+        # 一般損壞
+        '壞', 'broken', '故障', 'malfunction', '不能用', 'not working', '壞了',
+        '損壞', 'damaged', '破損', 'broken down', '失效',
+        '無法使用', 'unavailable', 'cannot use', '無法運作',
+        # 漏水問題
+        '漏水', 'leak', 'leaking', '滴水', 'dripping', '漏', 'leakage',
+        '滲水', 'water seepage', '滲漏', 'seepage',
+        # 供水問題
+        '沒水', 'no water', '沒水了', 'out of water', '停水', 'water outage',
+        '水壓不足', 'low water pressure', '水壓低', 'weak water flow',
+        '出水量小', 'small water flow', '水流小',
+        # 供電問題
+        '沒電', 'no power', '停電', 'power outage', '斷電', 'power cut',
+        '燈不亮', 'light not working', '燈壞了', 'light broken',
+        '閃爍', 'flickering', '燈閃', 'light flickering',
+        # 門鎖問題
+        '門壞', 'door broken', '門鎖壞', 'door lock broken',
+        '關不上', "can't close", '鎖不上', "can't lock",
+        '門卡住', 'door stuck', '門關不緊', 'door not closing properly',
+        # 其他設備問題
+        '烘手機壞', 'hand dryer broken', '烘手機不工作', 'hand dryer not working',
+        '感應器壞', 'sensor broken', '感應不良', 'sensor not working',
+        '按鈕壞', 'button broken', '按鈕不靈', 'button not working'
+    ],
+    # 滿出問題
+    'full': [
+        '滿', 'full', '滿出', 'overflowing', '溢出', 'overflow',
+        '裝滿', 'filled up', '滿了', 'is full',
+        '垃圾桶滿', 'trash full', '垃圾滿了', 'trash can full'
+    ],
+    # 維修問題
+    'maintenance': [
+        '維修', 'maintenance', '修理', 'repair', '修復', 'fix'
+    ],
+    # 清潔問題（需要清潔但不算嚴重）
+    'cleaning': [
+        '需要清潔', 'needs cleaning', '要清', 'needs clean', '待清潔',
+        '要打掃', '需要打掃', 'needs sweeping',
+        '清潔', 'cleaning', '打掃', 'sweep', '清理', 'clean up',
+        '髒', 'dirty', '不乾淨', 'not clean', '骯髒', 'filthy',
+        '有灰塵', 'dusty', '有污漬', 'stained', '有異味', 'smelly'
+    ],
+    # 水質問題（飲水機相關）
+    'water_quality': [
+        '水有異味', 'water has odor', '水有味道', 'water tastes bad',
+        '水質問題', 'water quality issue', '水不乾淨', 'water not clean',
+        '水有雜質', 'water has impurities', '水混濁', 'water cloudy',
+        '無法出水', 'no water flow', '不出水', 'water not flowing',
+        '水溫異常', 'water temperature abnormal', '水太熱', 'water too hot',
+        '水太冷', 'water too cold'
+    ],
+    # 溫度問題（空調、暖氣等）
+    'temperature': [
+        '太熱', 'too hot', '太冷', 'too cold', '溫度異常', 'temperature abnormal',
+        '空調壞', 'air conditioning broken', '冷氣壞', 'AC broken',
+        '暖氣壞', 'heating broken', '暖氣不工作', 'heating not working'
+    ],
+    # 噪音問題
+    'noise': [
+        '有噪音', 'has noise', '噪音', 'noise', '聲音太大', 'too loud',
+        '異音', 'abnormal sound', '奇怪的聲音', 'strange sound',
+        '運轉聲', 'operating sound', '機器聲', 'machine sound'
+    ],
+    # 牆面問題
+    'wall': [
+        '牆面裂縫', 'wall crack', '牆裂', 'cracked wall', '裂縫', 'crack',
+        '壁癌', 'wall mold', '牆面發霉', 'wall mildew', '發霉', 'mold',
+        '油漆剝落', 'paint peeling', '牆面剝落', 'wall peeling', '剝落', 'peeling'
+    ],
+    # 結構問題（漏水、滲水等）
+    'structure': [
+        '屋頂漏水', 'roof leak', '天花板漏水', 'ceiling leak',
+        '窗戶滲水', 'window seepage', '窗戶漏水', 'window leak',
+        '地板翹起', 'floor warping', '地板破損', 'floor damaged',
+        '天花板滲水', 'ceiling seepage', '天花板有水漬', 'ceiling water stain'
+    ],
+    # 電力系統問題
+    'electrical': [
+        '電線老化', 'wire aging', '電線問題', 'wire issue',
+        '插座故障', 'outlet broken', '插座壞', 'outlet not working',
+        '跳電', 'power trip', '短路', 'short circuit',
+        '電路問題', 'circuit issue', '電力異常', 'power abnormal'
+    ],
+    # 通風問題
+    'ventilation': [
+        '通風不良', 'poor ventilation', '空氣不流通', 'poor air circulation',
+        '空氣品質差', 'poor air quality', '悶熱', 'stuffy',
+        '空氣異味', 'air odor', '空氣有味道', 'air has smell'
+    ],
+}
+
+# 決定嚴重程度（priority）時使用的附加線索
+MARKER_KEYWORDS: Dict[str, List[str]] = {
+    'short_circuit': ['短路', 'short circuit'],
+    'roof': ['屋頂', 'roof'],
+    'unavailable': ['無法使用', 'unavailable'],
+}
+
+# 回報備註模板：鍵 -> (中文, 英文)
+NOTE_TEMPLATES: Dict[str, Tuple[str, str]] = {
+    'hygiene': ("衛生問題：{desc}。需要立即清潔。", "Hygiene issue: {desc}. Requires immediate cleaning."),
+    'clog_partial': ("堵塞：{desc}。其他設施正常運作。", "Clogged: {desc}. Other facilities are functioning normally."),
+    'clog': ("堵塞：{desc}。設施無法使用。", "Clogged: {desc}. Facility is out of order."),
+    'broken_partial': ("損壞：{desc}。其他設施正常運作。", "Broken: {desc}. Other facilities are functioning normally."),
+    'broken': ("損壞：{desc}。設施無法使用。", "Broken: {desc}. Facility is out of order."),
+    'full': ("滿出：{desc}。", "Full: {desc}."),
+    'maintenance': ("維修中：{desc}。", "Under maintenance: {desc}."),
+    'water_quality': ("水質問題：{desc}。設施無法使用。", "Water quality issue: {desc}. Facility is out of order."),
+    'temperature': ("溫度問題：{desc}。", "Temperature issue: {desc}."),
+    'noise': ("噪音問題：{desc}。設施仍可使用但需要關注。", "Noise issue: {desc}. Facility still usable but needs attention."),
+    'structure': ("結構問題：{desc}。需要立即處理。", "Structural issue: {desc}. Requires immediate attention."),
+    'electrical': ("電力問題：{desc}。安全隱患，需要立即處理。", "Electrical issue: {desc}. Safety concern, requires immediate attention."),
+    'wall': ("牆面問題：{desc}。設施仍可使用但需要修復。", "Wall issue: {desc}. Facility still usable but needs repair."),
+    'ventilation': ("通風問題：{desc}。空氣品質問題。", "Ventilation issue: {desc}. Air quality concern."),
+    'cleaning': ("需要清潔：{desc}。", "Needs cleaning: {desc}."),
+    'default': ("問題回報：{desc}。其他設施正常運作。", "Issue reported: {desc}. Other facilities are functioning normally."),
+}
+
+
+def _build_matcher() -> AliasMatcher:
+    """把所有關鍵詞表編譯成一個匹配器，值為標籤（同一關鍵詞可屬於多個標籤）"""
+    tables: Dict[str, List[str]] = {'partial': PARTIAL_KEYWORDS}
+    tables.update(CATEGORY_KEYWORDS)
+    tables.update({f"marker_{name}": keywords for name, keywords in MARKER_KEYWORDS.items()})
+
+    # 與原先的 `word in text.lower()` 語義一致：純子字串匹配，不要求詞邊界
+    matcher = AliasMatcher(word_boundary=False)
+    for tag, keywords in tables.items():
+        for keyword in dict.fromkeys(keywords):
+            matcher.add(keyword, tag)
+    matcher.build()
+    return matcher
+
+
+_MATCHER = _build_matcher()
+
+
+def tag_problem(description: str) -> FrozenSet[str]:
+    """
+    單次掃描描述文本，返回命中的所有標籤
+
+    Args:
+        description: 問題描述
+
+    Returns:
+        標籤集合（'partial'、CATEGORY_KEYWORDS 的鍵、'marker_*'）
+    """
+    return frozenset(match[2] for match in _MATCHER.find_all(description))
+
+
+def tag_problem_spans(text: str, spans: List[Tuple[int, int]]) -> List[FrozenSet[str]]:
+    """
+    對整條消息掃描一遍，返回每個片段命中的標籤
+
+    Args:
+        text: 完整的問題描述
+        spans: 各個問題的 (起始, 結束) 位置
+
+    Returns:
+        每個片段的標籤集合
+    """
+    buckets = bucket_by_span(_MATCHER.find_all(text), spans)
+    return [frozenset(match[2] for match in bucket) for bucket in buckets]
+
+
+def decide(tags: FrozenSet[str], description: str, language: str) -> Tuple[str, str, str, str]:
+    """
+    根據標籤得出分類結果
+
+    Args:
+        tags: tag_problem() 的結果
+        description: 問題描述（用於備註）
+        language: 語言
+
+    Returns:
+        (status, severity, notes, priority)
+    """
+    is_partial = 'partial' in tags
+
+    # 判斷問題優先級（輕微、中等、嚴重）
+    # 嚴重問題：影響安全或整個設施無法使用
+    if (('electrical' in tags and 'marker_short_circuit' in tags)
+            or ('structure' in tags and 'marker_roof' in tags)
+            or ('broken' in tags and not is_partial and 'marker_unavailable' in tags)
+            or 'water_quality' in tags):
+        priority = "critical"
+    # 中等問題：影響使用但不危險
+    elif ((('clog' in tags or 'broken' in tags or 'temperature' in tags) and not is_partial)
+            or 'structure' in tags or 'electrical' in tags):
+        priority = "moderate"
+    # 輕微問題：部分設備問題或清潔問題
+    else:
+        priority = "minor"
+
+    # 狀態判斷順序：衛生 > 堵塞 > 損壞 > 滿出 > 維修 > 水質 > 溫度 > 噪音 > 結構 > 電力 > 牆面 > 通風 > 清潔
+    if 'hygiene' in tags:
+        status, severity, note = "待清潔", ("minor" if is_partial else "major"), 'hygiene'
+    elif 'clog' in tags:
+        if is_partial:
+            status, severity, note = "部分損壞", "minor", 'clog_partial'
+        else:
+            status, severity, note = "無法使用", "major", 'clog'
+    elif 'broken' in tags:
+        if is_partial:
+            status, severity, note = "部分損壞", "minor", 'broken_partial'
+        else:
+            status, severity, note = "無法使用", "major", 'broken'
+    elif 'full' in tags:
+        status, severity, note = "滿出", "minor", 'full'
+    elif 'maintenance' in tags:
+        status, severity, note = "維修中", "major", 'maintenance'
+    elif 'water_quality' in tags:
+        status, severity, note = "無法使用", "major", 'water_quality'
+    elif 'temperature' in tags:
+        if is_partial:
+            status, severity, note = "部分損壞", "minor", 'temperature'
+        else:
+            status, severity, note = "無法使用", "major", 'temperature'
+    elif 'noise' in tags:
+        status, severity, note = "部分損壞", "minor", 'noise'
+    elif 'structure' in tags:
+        status, severity, note = "無法使用", priority, 'structure'
+    elif 'electrical' in tags:
+        status, severity, note = "無法使用", priority, 'electrical'
+    elif 'wall' in tags:
+        status, severity, note = "部分損壞", "minor", 'wall'
+    elif 'ventilation' in tags:
+        status, severity, note = "部分損壞", "minor", 'ventilation'
+    elif 'cleaning' in tags:
+        status, severity, note = "待清潔", "minor", 'cleaning'
+    else:
+        # 默認：部分損壞（因為通常是指單個設備的問題）
+        status, severity, note = "部分損壞", "minor", 'default'
+
+    template_zh, template_en = NOTE_TEMPLATES[note]
+    notes = (template_en if language == 'en' else template_zh).format(desc=description.strip())
+    return (status, severity, notes, priority)
+
+
+def classify_problem(description: str, language: str = 'zh') -> Tuple[str, str, str, str]:
+    """
+    分析問題描述
+
+    Args:
+        description: 問題描述
+        language: 語言
+
+    Returns:
+        (status, severity, notes, priority)
+    """
+    if not description:
+        return ("正常", "minor", "", "minor")
+    return decide(tag_problem(description), description, language)
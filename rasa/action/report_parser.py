@@ -0,0 +1,348 @@
+"""
+設施問題回報解析
+把 ActionReportFacilityProblem 中的拆分、設備、位置和問題分類邏輯抽成模組級函數，
+action 與離線批量重跑（例如關鍵詞表更新後重新分類歷史回報）共用同一套實現
+
+每條消息只用 jieba 分詞一次：拆分在詞級別進行（"hand dryer" 中的 and 不再被當作分隔符號），
+設備、位置和問題類別的匹配器也都只對整條消息掃描一遍，命中按問題片段的位置分組
+
+批量處理：
+    analyze_reports() 把回報按塊分發到進程池，按輸入順序惰性產出結果
+命令列：
+    cd rasa && python3 triage_reports.py reports.jsonl -o triaged.jsonl --workers 4
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .fuzzy_index import equipment_index
+from .location import extract_location, extract_location_spans
+from .matcher import AliasMatcher, bucket_by_span
+from .problem_classifier import decide, tag_problem_spans
+
+logger = logging.getLogger(__name__)
+
+try:
+    import jieba
+    JIEBA_AVAILABLE = True
+except ImportError:
+    logger.warning("jieba 未安裝，問題拆分使用簡易分詞（逐字切分中文）")
+    jieba = None
+    JIEBA_AVAILABLE = False
+
+# 設備關鍵詞（列表順序即優先級：同時提到多種設備時取排在前面的）
+EQUIPMENT_KEYWORDS: List[tuple] = [
+    ('urinal', ['小便斗', 'urinal', '小便池', '小便器']),
+    ('toilet', ['馬桶', 'toilet', '坐式馬桶', '坐廁', '座便器']),
+    ('sink', ['洗手台', 'sink', '洗手盆', 'washbasin']),
+    ('faucet', ['水龍頭', 'faucet', 'tap', '水喉']),
+    ('hand_dryer', ['烘手機', 'hand dryer', '乾手機', '烘手器']),
+    ('toilet_paper', ['衛生紙', 'toilet paper', '紙巾', 'tissue']),
+    ('door', ['門', 'door', '門鎖', 'door lock']),
+    ('light', ['燈', 'light', '照明', 'lighting']),
+]
+
+# 多個問題之間的分隔符號（整個詞等於分隔符號時才拆分）
+SEPARATORS: List[str] = ['和', '與', 'and', '、', ',', '，', '還有', 'also']
+_SEPARATOR_TOKENS = frozenset(SEPARATORS)
+
+# (詞, 起始位置, 結束位置)
+Token = Tuple[str, int, int]
+
+# 沒有 jieba 時的簡易分詞：ASCII 單詞、空白、多字分隔符號，其餘逐字切分
+_FALLBACK_TOKEN_PATTERN = re.compile(
+    '|'.join(re.escape(sep) for sep in SEPARATORS if len(sep) > 1 and not sep.isascii())
+    + r"|[A-Za-z0-9']+|\s+|."
+)
+
+# 一個回報可以是描述字串，或帶 description 欄位的字典
+Report = Union[str, Dict[str, Any]]
+
+
+def _build_equipment_matcher() -> AliasMatcher:
+    """編譯設備關鍵詞（純子字串匹配，與原先的 any(word in text) 一致）"""
+    matcher = AliasMatcher(word_boundary=False)
+    for priority, (equipment, keywords) in enumerate(EQUIPMENT_KEYWORDS):
+        for keyword in keywords:
+            matcher.add(keyword, equipment, priority)
+    matcher.build()
+    return matcher
+
+
+_EQUIPMENT_MATCHER = _build_equipment_matcher()
+
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def _get_tokenizer():
+    """延遲創建 jieba 分詞器（載入詞典約需一秒），並加入設備關鍵詞和分隔符號，避免被切開"""
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                jieba.setLogLevel(logging.WARNING)
+                tokenizer = jieba.Tokenizer()
+                for word in SEPARATORS + [kw for _, keywords in EQUIPMENT_KEYWORDS for kw in keywords]:
+                    if not word.isascii():
+                        tokenizer.add_word(word)
+                _tokenizer = tokenizer
+    return _tokenizer
+
+
+def segment(text: str) -> List[Token]:
+    """
+    分詞
+
+    Args:
+        text: 消息文本
+
+    Returns:
+        (詞, 起始位置, 結束位置) 列表
+    """
+    if not text:
+        return []
+    if JIEBA_AVAILABLE:
+        return list(_get_tokenizer().tokenize(text, HMM=False))
+    return [(match.group(0), match.start(), match.end()) for match in _FALLBACK_TOKEN_PATTERN.finditer(text)]
+
+
+def split_spans(text: str, tokens: List[Token]) -> List[Tuple[int, int]]:
+    """
+    按分隔詞把消息切成多個問題片段
+
+    Args:
+        text: 消息文本
+        tokens: segment() 的結果
+
+    Returns:
+        各片段的 (起始, 結束) 位置，已去掉首尾空白，空片段不返回
+    """
+    spans: List[Tuple[int, int]] = []
+
+    def close(start: int, end: int) -> None:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            spans.append((start, end))
+
+    part_start = 0
+    for word, start, end in tokens:
+        if word.casefold() in _SEPARATOR_TOKENS:
+            close(part_start, start)
+            part_start = end
+    close(part_start, len(text))
+    return spans
+
+
+def extract_equipment(text: str) -> str:
+    """
+    提取設備類型
+
+    Args:
+        text: 問題描述
+
+    Returns:
+        設備類型（urinal/toilet/sink/...），無法識別時返回 'unknown'
+    """
+    # 允許錯字（例如 "urnal"、"烘手几"）
+    return _EQUIPMENT_MATCHER.first(text) or equipment_index.best_in_text(text) or 'unknown'
+
+
+def extract_location_keywords(text: str) -> Dict[str, Optional[str]]:
+    """
+    提取位置關鍵字，例如：左側、右側、最靠窗、第一個等
+
+    Args:
+        text: 問題描述
+
+    Returns:
+        {'side': ..., 'position': ..., 'specific': ...}
+    """
+    location = extract_location(text)
+    return {
+        'side': location['side'],  # 左側、右側
+        'position': location['position'],  # 第一個、第二個、最靠窗
+        'specific': location['specific']  # 其他特定位置描述
+    }
+
+
+def parse_multiple_problems(description: str, language: str = 'zh') -> List[Dict[str, Any]]:
+    """
+    解析多個設備問題，例如：'左側第一個小便斗有大便和最靠窗的馬桶堵塞'
+
+    Args:
+        description: 問題描述
+        language: 語言（用於分類備註）
+
+    Returns:
+        [{'description', 'location', 'equipment', 'status', 'severity', 'notes', 'priority'}, ...]
+    """
+    if not description:
+        return []
+
+    desc = description.strip()
+    spans = split_spans(desc, segment(desc))
+    if len(spans) < 2:
+        # 單一問題
+        spans = [(0, len(desc))]
+
+    # 各個匹配器只掃描整條消息一遍，再按片段分組
+    equipment_hits = bucket_by_span(_EQUIPMENT_MATCHER.find_all(desc), spans)
+    locations = extract_location_spans(desc, spans)
+    tags = tag_problem_spans(desc, spans)
+
+    problems = []
+    for index, (start, end) in enumerate(spans):
+        part = desc[start:end]
+        if equipment_hits[index]:
+            equipment = min(equipment_hits[index], key=lambda match: (match[3], match[0]))[2]
+        else:
+            # 允許錯字（例如 "urnal"、"烘手几"）
+            equipment = equipment_index.best_in_text(part) or 'unknown'
+        location = locations[index]
+        status, severity, notes, priority = decide(tags[index], part, language)
+        problems.append({
+            'description': part,
+            'location': {
+                'side': location['side'],
+                'position': location['position'],
+                'specific': location['specific']
+            },
+            'equipment': equipment,
+            'status': status,
+            'severity': severity,
+            'notes': notes,
+            'priority': priority
+        })
+
+    return problems
+
+
+def analyze_report(report: Report, language: str = 'zh') -> Dict[str, Any]:
+    """
+    解析並分類一個回報
+
+    Args:
+        report: 描述字串，或帶 description（以及可選 language）欄位的字典
+        language: 回報未指定語言時使用的語言
+
+    Returns:
+        輸入欄位加上 problems 列表；每個問題包含 status、severity、notes、priority
+    """
+    record = {'description': report} if isinstance(report, str) else dict(report)
+    record['problems'] = parse_multiple_problems(record.get('description') or '', record.get('language') or language)
+    return record
+
+
+def _analyze_chunk(chunk: List[Report], language: str) -> List[Dict[str, Any]]:
+    """進程池中執行的單塊任務"""
+    return [analyze_report(report, language) for report in chunk]
+
+
+def _chunks(reports: Iterable[Report], chunk_size: int) -> Iterator[List[Report]]:
+    """把回報切成固定大小的塊（不預先讀完整個輸入）"""
+    iterator = iter(reports)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def analyze_reports(
+    reports: Iterable[Report],
+    chunk_size: int = 200,
+    workers: Optional[int] = None,
+    language: str = 'zh'
+) -> Iterator[Dict[str, Any]]:
+    """
+    批量解析回報，按輸入順序惰性產出結果
+
+    Args:
+        reports: 回報序列（可以是逐行讀取的生成器）
+        chunk_size: 每個任務處理的回報數
+        workers: 進程數，默認為 CPU 數；1 或以下時在當前進程執行
+        language: 回報未指定語言時使用的語言
+
+    Yields:
+        analyze_report() 的結果
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk_size = max(1, chunk_size)
+
+    if workers <= 1:
+        for chunk in _chunks(reports, chunk_size):
+            yield from _analyze_chunk(chunk, language)
+        return
+
+    # 同時提交的塊數有上限，輸入很大時記憶體佔用仍然有界
+    max_pending = workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in _chunks(reports, chunk_size):
+            pending.append(executor.submit(_analyze_chunk, chunk, language))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def _read_jsonl(stream) -> Iterator[Report]:
+    """
+    逐行讀取 JSONL；每行為字串或帶 description 的物件，非 JSON 行當作描述文本，
+    其他 JSON 值（數字、null、陣列、沒有字串 description 的物件）記錄警告後跳過
+    """
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            report = json.loads(line)
+        except json.JSONDecodeError:
+            logger.warning(f"第 {line_number} 行不是 JSON，當作描述文本處理")
+            yield line
+            continue
+        if isinstance(report, str) or (isinstance(report, dict) and isinstance(report.get('description'), str)):
+            yield report
+        else:
+            logger.warning(f"第 {line_number} 行不是描述字串或帶 description 的物件，已跳過")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令列入口：讀取 JSONL 回報，輸出帶分類結果的 JSONL"""
+    parser = argparse.ArgumentParser(description="批量重新分類設施問題回報（JSONL 輸入/輸出）")
+    parser.add_argument('input', nargs='?', default='-', help="輸入 JSONL 文件，默認為標準輸入")
+    parser.add_argument('-o', '--output', default='-', help="輸出 JSONL 文件，默認為標準輸出")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="進程數，默認為 CPU 數")
+    parser.add_argument('-c', '--chunk-size', type=int, default=200, help="每個任務處理的回報數")
+    parser.add_argument('-l', '--language', default='zh', choices=['zh', 'en'], help="回報未指定語言時使用的語言")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    target = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    count = 0
+    try:
+        results = analyze_reports(_read_jsonl(source), args.chunk_size, args.workers, args.language)
+        for result in results:
+            target.write(json.dumps(result, ensure_ascii=False) + '\n')
+            count += 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+    logger.info(f"已處理 {count} 個回報")
+    return 0
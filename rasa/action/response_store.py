@@ -0,0 +1,315 @@
+"""
+Gemini 回應持久化存儲
+把回答寫入 SQLite 表（以 ResponseCache 的 MD5 鍵為主鍵），重新部署後仍然保留；
+啟動時把命中次數最多的條目預熱到內存緩存，避免每次發布後重新消耗配額
+
+每個條目記錄實際生成回答的模型名稱（主模型或備用模型）和提示詞版本（系統提示詞的哈希），
+模型不再在當前的模型列表中或提示詞改變後，舊條目不再返回，並在啟動時刪除
+"""
+
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (鍵, 訊息, 語言, 回答, 剩餘存活秒數)
+StoredResponse = Tuple[str, str, str, str, float]
+
+
+class ResponseStore:
+    """
+    基於 SQLite 的 Gemini 回應存儲
+    命中次數先在內存中累計，批量寫回，避免每次緩存命中都寫數據庫
+    """
+
+    # 每寫入多少次執行一次清理（攤銷清理成本）
+    PRUNE_EVERY = 256
+    # 累計多少次命中後寫回數據庫
+    FLUSH_HITS_EVERY = 64
+
+    def __init__(
+        self,
+        path: str,
+        models: Sequence[str],
+        prompt_version: str,
+        ttl: int = 604800,
+        max_entries: int = 50000,
+        timeout: float = 0.5
+    ):
+        """
+        初始化存儲
+
+        Args:
+            path: SQLite 數據庫文件路徑
+            models: 當前的模型列表（主模型在前），這些模型生成的條目都有效
+            prompt_version: 當前提示詞版本
+            ttl: 條目過期時間（秒）
+            max_entries: 最大條目數
+            timeout: 等待數據庫鎖的最長時間（秒）
+        """
+        self.path = path
+        self.models = tuple(models)
+        # 未指定生成模型時記錄為主模型
+        self.model = self.models[0]
+        self._model_filter = f"model IN ({', '.join('?' * len(self.models))})"
+        self.prompt_version = prompt_version
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._writes = 0
+        self._pending_hits: Dict[str, int] = {}
+        self._pending_count = 0
+
+        # 統計資訊
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+        self._connect()
+        atexit.register(self.flush_hits)
+
+    def _connect(self) -> sqlite3.Connection:
+        """建立（或在 fork 後重建）數據庫連線，首次連線時刪除失效的條目"""
+        pid = os.getpid()
+        if self._conn is not None and self._pid == pid:
+            return self._conn
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            isolation_level=None,  # autocommit，每條語句即一個事務
+            check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS gemini_responses ("
+            "key TEXT PRIMARY KEY, message TEXT NOT NULL, language TEXT NOT NULL, "
+            "response TEXT NOT NULL, model TEXT NOT NULL, prompt_version TEXT NOT NULL, "
+            "created_at REAL NOT NULL, expires_at REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS gemini_responses_hits ON gemini_responses(hits)")
+        conn.execute("CREATE INDEX IF NOT EXISTS gemini_responses_expires ON gemini_responses(expires_at)")
+
+        is_first = self._conn is None
+        self._conn = conn
+        self._pid = pid
+        if is_first:
+            self._invalidate(conn)
+        return conn
+
+    def _invalidate(self, conn: sqlite3.Connection) -> None:
+        """刪除其他模型或舊提示詞生成的條目，以及已過期的條目"""
+        deleted = conn.execute(
+            f"DELETE FROM gemini_responses WHERE NOT {self._model_filter} OR prompt_version != ? OR expires_at <= ?",
+            self.models + (self.prompt_version, time.time())
+        ).rowcount
+        if deleted:
+            logger.info(
+                f"Response store: removed {deleted} stale entries "
+                f"(models {', '.join(self.models)}, prompt {self.prompt_version})"
+            )
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """
+        獲取回答
+
+        Args:
+            key: 緩存鍵
+
+        Returns:
+            (回答, 剩餘存活秒數)，不存在、已過期或由其他模型/提示詞生成時返回 None
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT response, expires_at FROM gemini_responses "
+                    f"WHERE key = ? AND {self._model_filter} AND prompt_version = ?",
+                    (key,) + self.models + (self.prompt_version,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Response store read failed: {e}")
+            return None
+
+        if row is None or row[1] <= now:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.record_hit(key)
+        return row[0], row[1] - now
+
+    def set(self, key: str, message: str, language: str, response: str, model: Optional[str] = None) -> None:
+        """
+        保存回答
+
+        Args:
+            key: 緩存鍵
+            message: 用戶訊息（用於預熱語義緩存）
+            language: 語言代碼
+            response: 回答
+            model: 實際生成回答的模型，默認為主模型
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT INTO gemini_responses "
+                    "(key, message, language, response, model, prompt_version, created_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET response = excluded.response, model = excluded.model, "
+                    "prompt_version = excluded.prompt_version, created_at = excluded.created_at, "
+                    "expires_at = excluded.expires_at",
+                    (key, message, language, response, model or self.model, self.prompt_version, now, now + self.ttl)
+                )
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY == 0:
+                    self._prune(conn)
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Response store write failed: {e}")
+
+    def record_hit(self, key: str) -> None:
+        """
+        記錄一次命中（包括內存緩存的命中），用於決定預熱哪些條目
+
+        Args:
+            key: 緩存鍵
+        """
+        with self._lock:
+            self._pending_hits[key] = self._pending_hits.get(key, 0) + 1
+            self._pending_count += 1
+            if self._pending_count < self.FLUSH_HITS_EVERY:
+                return
+        self.flush_hits()
+
+    def flush_hits(self) -> None:
+        """把累計的命中次數寫回數據庫"""
+        try:
+            with self._lock:
+                if not self._pending_hits:
+                    return
+                pending = list(self._pending_hits.items())
+                self._pending_hits.clear()
+                self._pending_count = 0
+                self._connect().executemany(
+                    "UPDATE gemini_responses SET hits = hits + ? WHERE key = ?",
+                    [(count, key) for key, count in pending]
+                )
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Response store hit flush failed: {e}")
+
+    def warm(self, limit: int) -> List[StoredResponse]:
+        """
+        取出命中次數最多的有效條目
+
+        Args:
+            limit: 最多返回的條目數
+
+        Returns:
+            [(鍵, 訊息, 語言, 回答, 剩餘存活秒數), ...]，按命中次數從多到少排列
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                rows = self._connect().execute(
+                    "SELECT key, message, language, response, expires_at FROM gemini_responses "
+                    f"WHERE {self._model_filter} AND prompt_version = ? AND expires_at > ? "
+                    "ORDER BY hits DESC, created_at DESC LIMIT ?",
+                    self.models + (self.prompt_version, now, limit)
+                ).fetchall()
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Response store warm-load failed: {e}")
+            return []
+        return [(key, message, language, response, expires_at - now) for key, message, language, response, expires_at in rows]
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        """刪除過期條目，並在超出容量時刪除命中次數最少的條目"""
+        conn.execute("DELETE FROM gemini_responses WHERE expires_at <= ?", (time.time(),))
+        count = conn.execute("SELECT COUNT(*) FROM gemini_responses").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM gemini_responses WHERE key IN ("
+                "SELECT key FROM gemini_responses ORDER BY hits, created_at LIMIT ?)",
+                (overflow,)
+            )
+            logger.debug(f"Response store pruned {overflow} entries")
+
+    def clear(self) -> None:
+        """清空存儲"""
+        try:
+            with self._lock:
+                self._pending_hits.clear()
+                self._pending_count = 0
+                self._connect().execute("DELETE FROM gemini_responses")
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Response store clear failed: {e}")
+
+    def size(self) -> int:
+        """返回當前有效的條目數"""
+        try:
+            with self._lock:
+                return self._connect().execute(
+                    f"SELECT COUNT(*) FROM gemini_responses WHERE {self._model_filter} AND prompt_version = ? AND expires_at > ?",
+                    self.models + (self.prompt_version, time.time())
+                ).fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def get_stats(self) -> Dict[str, object]:
+        """獲取統計資訊"""
+        return {
+            'store_hits': self.hits,
+            'store_misses': self.misses,
+            'store_errors': self.errors,
+            'store_path': self.path
+        }
+
+
+def create_response_store(models: Sequence[str], prompt_version: str) -> Optional[ResponseStore]:
+    """
+    根據環境變數創建回應存儲
+
+    設置 GEMINI_STORE_PATH 啟用（例如 /data/gemini_responses.db），未設置時返回 None；
+    GEMINI_STORE_TTL 為條目過期時間（默認 7 天），GEMINI_STORE_MAX_ENTRIES 為最大條目數（默認 50000）
+
+    Args:
+        models: 當前的模型列表（主模型在前）
+        prompt_version: 當前提示詞版本
+
+    Returns:
+        ResponseStore 實例或 None
+    """
+    path = os.getenv('GEMINI_STORE_PATH')
+    if not path:
+        return None
+
+    ttl = int(os.getenv('GEMINI_STORE_TTL', '604800'))
+    max_entries = int(os.getenv('GEMINI_STORE_MAX_ENTRIES', '50000'))
+    try:
+        store = ResponseStore(path, models, prompt_version, ttl=ttl, max_entries=max_entries)
+        logger.info(f"Gemini response store enabled: {path} (models {', '.join(models)}, prompt {prompt_version})")
+        return store
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"無法啟用 Gemini 回應存儲 {path}: {e}，僅使用內存緩存")
+        return None
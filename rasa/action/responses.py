@@ -0,0 +1,228 @@
+"""
+靜態回應註冊表
+只依賴語言和少數 slot 值的雙語回應（尋找設施、詢問廁所類型、獲取位置、校園資訊等）
+在導入時按 (action, 語言, slot...) 構建一次，
+執行時只需一次字典查詢加一次淺拷貝
+"""
+
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (action 名稱, 語言, slot 值...)
+ResponseKey = Tuple[str, ...]
+
+
+class ResponseRegistry:
+    """
+    預先構建的回應
+    值可以是字典（自定義 payload）或字串（文本回應）；字典取出時做淺拷貝，
+    調用方可以在拷貝上添加時間戳等動態欄位而不影響註冊表中的原件
+    """
+
+    def __init__(self):
+        """初始化註冊表"""
+        self._payloads: Dict[ResponseKey, Any] = {}
+
+    def register(self, action: str, language: str, payload: Any, *slots: Any) -> None:
+        """
+        註冊回應
+
+        Args:
+            action: action 名稱
+            language: 語言
+            payload: 回應字典或文本
+            *slots: 影響回應內容的 slot 值（如性別）
+        """
+        key = (action, language) + slots
+        if key in self._payloads:
+            logger.warning(f"Response {key} registered twice, keeping the latest")
+        self._payloads[key] = payload
+
+    def get(self, action: str, language: str, *slots: Any) -> Optional[Any]:
+        """
+        獲取回應
+
+        Args:
+            action: action 名稱
+            language: 語言
+            *slots: slot 值
+
+        Returns:
+            字典回應的淺拷貝或文本，未註冊時返回 None
+        """
+        payload = self._payloads.get((action, language) + slots)
+        if isinstance(payload, dict):
+            return dict(payload)
+        return payload
+
+    def __contains__(self, key: ResponseKey) -> bool:
+        return key in self._payloads
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+
+# 全局註冊表實例
+response_registry = ResponseRegistry()
+
+
+# ==================== 尋找設施 ====================
+
+# 廁所性別 slot 值 -> (英文, 中文)
+TOILET_GENDERS: Dict[str, Tuple[str, str]] = {
+    '男': ("men's", '男'),
+    '女': ("women's", '女'),
+    '性別友善': ('gender-inclusive', '性別友善'),
+}
+_DEFAULT_TOILET_GENDER = ('unisex', '無性別')
+
+
+def build_toilet_payload(language: str, gender: str) -> Dict[str, Any]:
+    """
+    構建尋找廁所的回應（未註冊的性別值也可以直接調用）
+
+    Args:
+        language: 語言
+        gender: 性別 slot 值
+
+    Returns:
+        回應字典
+    """
+    gender_text, gender_text_zh = TOILET_GENDERS.get(gender, _DEFAULT_TOILET_GENDER)
+    if language == 'en':
+        return {
+            "action": "find_nearest_facility",
+            "facility_type": "toilet",
+            "gender": gender,
+            "facility_type_chinese": f"{gender_text_zh} restroom",
+            "facility_type_english": f"{gender_text} restroom",
+            "message": f"Searching for the nearest {gender_text} restroom...",
+            "language": "en"
+        }
+    return {
+        "action": "find_nearest_facility",
+        "facility_type": "toilet",
+        "gender": gender,
+        "facility_type_chinese": f"{gender_text_zh}廁所",
+        "facility_type_english": f"{gender_text} restroom",
+        "message": f"正在尋找最近的{gender_text_zh}廁所...",
+        "language": "zh"
+    }
+
+
+for _language in ('zh', 'en'):
+    for _gender in list(TOILET_GENDERS) + ['無障礙']:
+        response_registry.register('action_find_nearest_toilet', _language, build_toilet_payload(_language, _gender), _gender)
+
+response_registry.register('action_find_nearest_toilet.ask_gender', 'en', {
+    "action": "ask_gender",
+    "facility_type": "toilet",
+    "pending_intent": "find_nearest_facility",
+    "message": "❓ Please select the type of restroom:",
+    "buttons": [
+        {"title": "♂️ Men's Restroom", "payload": "men's restroom"},
+        {"title": "♀️ Women's Restroom", "payload": "women's restroom"},
+        {"title": "🚻 Unisex Restroom", "payload": "unisex restroom"},
+        {"title": "♿ Accessible Restroom", "payload": "accessible restroom"}
+    ],
+    "language": "en"
+})
+response_registry.register('action_find_nearest_toilet.ask_gender', 'zh', {
+    "action": "ask_gender",
+    "facility_type": "toilet",
+    "pending_intent": "find_nearest_facility",
+    "message": "❓ 請選擇廁所類型：",
+    "buttons": [
+        {"title": "♂️ 男廁", "payload": "男廁"},
+        {"title": "♀️ 女廁", "payload": "女廁"},
+        {"title": "🚻 性別友善廁所", "payload": "性別友善廁所"},
+        {"title": "♿ 無障礙廁所", "payload": "無障礙廁所"}
+    ],
+    "language": "zh"
+})
+
+# 飲水機、垃圾桶：action 名稱 -> (facility_type, 英文, 中文)
+_NEAREST_FACILITIES = {
+    'action_find_nearest_water': ('water', 'water fountain', '飲水機'),
+    'action_find_nearest_trash': ('trash', 'trash can', '垃圾桶'),
+}
+for _action, (_facility_type, _name_en, _name_zh) in _NEAREST_FACILITIES.items():
+    response_registry.register(_action, 'en', {
+        "action": "find_nearest_facility",
+        "facility_type": _facility_type,
+        "facility_type_chinese": _name_en,
+        "facility_type_english": _name_en,
+        "message": f"Searching for the nearest {_name_en}...",
+        "language": "en"
+    })
+    response_registry.register(_action, 'zh', {
+        "action": "find_nearest_facility",
+        "facility_type": _facility_type,
+        "facility_type_chinese": _name_zh,
+        "facility_type_english": _name_en,
+        "message": f"正在尋找最近的{_name_zh}...",
+        "language": "zh"
+    })
+
+# ==================== 位置與快速回報 ====================
+
+response_registry.register('action_get_user_location', 'en', {
+    "action": "get_user_location",
+    "message": "Getting your current GPS location...",
+    "language": "en"
+})
+response_registry.register('action_get_user_location', 'zh', {
+    "action": "get_user_location",
+    "message": "正在獲取您目前的 GPS 位置...",
+    "language": "zh"
+})
+
+_QUICK_REPORT_TEXT = {
+    'en': "I'll help you quickly report a problem at your current location. Please describe the issue.",
+    'zh': "我將幫您快速回報當前位置的問題。請描述一下問題。",
+}
+for _language, _text in _QUICK_REPORT_TEXT.items():
+    response_registry.register('action_quick_report.text', _language, _text)
+    # 時間戳由 action 在拷貝上添加
+    response_registry.register('action_quick_report', _language, {
+        "action": "quick_report",
+        "message": _text,
+        "language": _language
+    })
+
+# ==================== 校園資訊 ====================
+
+# 模擬校園活動資料（專題展示用）
+CAMPUS_EVENTS: Dict[str, Tuple[Dict[str, str], ...]] = {
+    'zh': (
+        {"name": "校園導覽日", "date": "每月第一個週六", "location": "行政大樓"},
+        {"name": "校園開放日", "date": "每學期初", "location": "各校區"},
+        {"name": "設施體驗活動", "date": "不定期舉辦", "location": "各校區設施"}
+    ),
+    'en': (
+        {"name": "Campus Tour Day", "date": "First Saturday of each month", "location": "Administration Building"},
+        {"name": "Campus Open Day", "date": "Beginning of each semester", "location": "All Campuses"},
+        {"name": "Facility Experience Event", "date": "Occasionally", "location": "Campus Facilities"}
+    ),
+}
+
+
+def _campus_events_text(language: str) -> str:
+    """組裝校園活動文本"""
+    if language == 'en':
+        response_text = "📅 **Campus Events:**\n\n"
+        for event in CAMPUS_EVENTS['en']:
+            response_text += f"• **{event['name']}**\n  📍 Location: {event['location']}\n  📆 Date: {event['date']}\n\n"
+        response_text += "💡 This is a demonstration project. For actual event information, please check the official campus website."
+    else:
+        response_text = "📅 **校園活動：**\n\n"
+        for event in CAMPUS_EVENTS['zh']:
+            response_text += f"• **{event['name']}**\n  📍 地點：{event['location']}\n  📆 時間：{event['date']}\n\n"
+        response_text += "💡 這是專題展示系統。實際活動資訊請查閱校園官方網站。"
+    return response_text
+
+
+for _language in ('zh', 'en'):
+    response_registry.register('action_ask_campus_events', _language, _campus_events_text(_language))
@@ -0,0 +1,247 @@
+"""
+語義近似緩存
+精確緩存以 message.strip().lower() 為鍵，"廁所在哪" 和 "廁所在哪裡？" 是兩個條目；
+本模組以字 n-gram 集合表示問題，用 MinHash + LSH 分桶找出候選，再以 Jaccard 相似度確認，
+相似度達到閾值時直接返回已緩存的回答
+
+不依賴外部服務：中文按字、英文按單詞切分，取單元和相鄰兩個單元作為特徵
+"""
+
+import hashlib
+import logging
+import os
+import re
+import struct
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# MinHash 簽名長度 = 分桶數 × 每桶行數；候選門檻約為 (1/BANDS) ** (1/ROWS) ≈ 0.5，
+# 低於確認閾值，相似問題幾乎都能進入候選
+NUM_BANDS = 16
+ROWS_PER_BAND = 4
+NUM_PERM = NUM_BANDS * ROWS_PER_BAND
+
+# 每個特徵用 SHAKE-128 一次產生 NUM_PERM 個 32 位哈希值，代替 NUM_PERM 個獨立的哈希函數
+_HASH_FORMAT = struct.Struct(f"<{NUM_PERM}I")
+
+# 英文單詞、數字作為一個單元，其他文字（中文等）逐字作為單元，標點和空白丟棄
+_UNIT_PATTERN = re.compile(r"[a-z0-9]+|[^\W\d_a-z]")
+
+
+def shingles(text: str) -> FrozenSet[str]:
+    """
+    把文本轉成特徵集合
+
+    Args:
+        text: 用戶訊息
+
+    Returns:
+        單元和相鄰單元對的集合，例如 "廁所在哪" -> {廁, 所, 在, 哪, 廁所, 所在, 在哪}
+    """
+    units = _UNIT_PATTERN.findall(text.casefold())
+    features = set(units)
+    features.update(f"{a} {b}" if a.isascii() or b.isascii() else a + b for a, b in zip(units, units[1:]))
+    return frozenset(features)
+
+
+@lru_cache(maxsize=65536)
+def _feature_hashes(feature: str) -> Tuple[int, ...]:
+    """單個特徵的 NUM_PERM 個哈希值（特徵詞彙有限，緩存後簽名只需逐列取最小值）"""
+    return _HASH_FORMAT.unpack(hashlib.shake_128(feature.encode('utf-8')).digest(_HASH_FORMAT.size))
+
+
+def minhash(features: FrozenSet[str]) -> Tuple[int, ...]:
+    """
+    計算 MinHash 簽名
+
+    Args:
+        features: shingles() 的結果（不能為空）
+
+    Returns:
+        長度為 NUM_PERM 的簽名
+    """
+    return tuple(map(min, zip(*map(_feature_hashes, features))))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Jaccard 相似度"""
+    if not a or not b:
+        return 0.0
+    intersection = len(a & b)
+    return intersection / (len(a) + len(b) - intersection)
+
+
+# (語言, 分桶編號, 簽名片段)
+BandKey = Tuple[str, int, Tuple[int, ...]]
+
+
+class _Entry:
+    """緩存條目"""
+
+    __slots__ = ('features', 'response', 'expires_at', 'band_keys')
+
+    def __init__(self, features: FrozenSet[str], response: str, expires_at: float, band_keys: List[BandKey]):
+        self.features = features
+        self.response = response
+        self.expires_at = expires_at
+        self.band_keys = band_keys
+
+
+class SemanticCache:
+    """
+    基於 MinHash LSH 的近似問題緩存
+    以條目數為容量上限（LRU 淘汰），每個條目有過期時間；所有操作線程安全
+    """
+
+    def __init__(self, threshold: float = 0.75, max_entries: int = 10000, ttl: int = 3600, min_features: int = 5):
+        """
+        初始化語義緩存
+
+        Args:
+            threshold: Jaccard 相似度閾值，達到時視為同一個問題
+            max_entries: 最大條目數
+            ttl: 緩存過期時間（秒）
+            min_features: 特徵數少於此值的短訊息不參與近似匹配（例如 "hi"）
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.min_features = min_features
+
+        self._entries: "OrderedDict[Tuple[str, FrozenSet[str]], _Entry]" = OrderedDict()
+        self._buckets: Dict[BandKey, Set[Tuple[str, FrozenSet[str]]]] = {}
+        self._lock = threading.Lock()
+
+        # 統計資訊
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _band_keys(language: str, signature: Tuple[int, ...]) -> List[BandKey]:
+        """把簽名切成分桶鍵"""
+        return [
+            (language, band, signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND])
+            for band in range(NUM_BANDS)
+        ]
+
+    def get(self, message: str, language: str) -> Optional[Tuple[str, float]]:
+        """
+        查詢近似問題的回答
+
+        Args:
+            message: 用戶訊息
+            language: 語言代碼
+
+        Returns:
+            (回答, 相似度)，沒有足夠相似的問題時返回 None
+        """
+        features = shingles(message)
+        if len(features) < self.min_features:
+            return None
+        band_keys = self._band_keys(language, minhash(features))
+
+        now = time.time()
+        with self._lock:
+            candidates: Set[Tuple[str, FrozenSet[str]]] = set()
+            for band_key in band_keys:
+                bucket = self._buckets.get(band_key)
+                if bucket:
+                    candidates.update(bucket)
+
+            best_key, best_score = None, 0.0
+            for key in candidates:
+                entry = self._entries[key]
+                if entry.expires_at <= now:
+                    self._remove(key)
+                    continue
+                score = jaccard(features, entry.features)
+                if score > best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key].response, best_score
+
+    def set(self, message: str, language: str, response: str) -> None:
+        """
+        緩存問題的回答
+
+        Args:
+            message: 用戶訊息
+            language: 語言代碼
+            response: 回答
+        """
+        features = shingles(message)
+        if len(features) < self.min_features:
+            return
+        key = (language, features)
+        band_keys = self._band_keys(language, minhash(features))
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+            self._entries[key] = _Entry(features, response, time.time() + self.ttl, band_keys)
+            for band_key in band_keys:
+                self._buckets.setdefault(band_key, set()).add(key)
+
+    def _remove(self, key: Tuple[str, FrozenSet[str]]) -> None:
+        """移除條目（調用方持有鎖）"""
+        entry = self._entries.pop(key)
+        for band_key in entry.band_keys:
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def clear(self) -> None:
+        """清空緩存"""
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, object]:
+        """獲取統計資訊"""
+        return {
+            'semantic_hits': self.hits,
+            'semantic_misses': self.misses,
+            'semantic_size': len(self._entries),
+            'semantic_threshold': self.threshold
+        }
+
+
+def create_semantic_cache(ttl: int) -> Optional[SemanticCache]:
+    """
+    根據環境變數創建語義緩存
+
+    設置 GEMINI_SEMANTIC_CACHE=true 啟用；
+    GEMINI_SEMANTIC_THRESHOLD 為相似度閾值（默認 0.75），GEMINI_SEMANTIC_CACHE_SIZE 為最大條目數（默認 10000）
+
+    Args:
+        ttl: 緩存過期時間（秒）
+
+    Returns:
+        SemanticCache 實例或 None
+    """
+    if os.getenv('GEMINI_SEMANTIC_CACHE', 'false').lower() not in ('true', '1', 'yes'):
+        return None
+
+    threshold = float(os.getenv('GEMINI_SEMANTIC_THRESHOLD', '0.75'))
+    max_entries = int(os.getenv('GEMINI_SEMANTIC_CACHE_SIZE', '10000'))
+    logger.info(f"Semantic cache enabled (threshold {threshold}, {max_entries} entries)")
+    return SemanticCache(threshold=threshold, max_entries=max_entries, ttl=ttl)
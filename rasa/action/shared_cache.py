@@ -0,0 +1,235 @@
+"""
+跨進程共享緩存層
+同一主機上的多個 Action Server worker 共用一個 SQLite（WAL 模式）緩存，
+作為各進程內存緩存之後的第二層
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SharedCacheTier:
+    """
+    基於 SQLite WAL 的共享緩存層
+    每個條目帶有獨立的過期時間，並以條目數作為容量上限
+    """
+
+    # 每寫入多少次執行一次清理（攤銷清理成本）
+    PRUNE_EVERY = 256
+
+    def __init__(
+        self,
+        path: str,
+        namespace: str = "cache",
+        ttl: int = 300,
+        max_entries: int = 10000,
+        timeout: float = 0.5
+    ):
+        """
+        初始化共享緩存層
+
+        Args:
+            path: SQLite 數據庫文件路徑
+            namespace: 表名（不同緩存使用不同的表）
+            ttl: 默認過期時間（秒）
+            max_entries: 最大條目數
+            timeout: 等待數據庫鎖的最長時間（秒）
+        """
+        if not namespace.isidentifier():
+            raise ValueError(f"Invalid namespace: {namespace}")
+
+        self.path = path
+        self.table = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._writes = 0
+
+        # 統計資訊
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+        self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        """建立（或在 fork 後重建）數據庫連線"""
+        pid = os.getpid()
+        if self._conn is not None and self._pid == pid:
+            return self._conn
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            isolation_level=None,  # autocommit，每條語句即一個事務
+            check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {self.table}_expires ON {self.table}(expires_at)"
+        )
+
+        self._conn = conn
+        self._pid = pid
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        獲取緩存值
+
+        Args:
+            key: 緩存鍵
+
+        Returns:
+            (值, 剩餘存活秒數)，如果不存在或已過期則返回 None
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    f"SELECT value, expires_at FROM {self.table} WHERE key = ?",
+                    (key,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Shared cache read failed: {e}")
+            return None
+
+        if row is None or row[1] <= now:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return json.loads(row[0]), row[1] - now
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        設置緩存值
+
+        Args:
+            key: 緩存鍵
+            value: 緩存值（必須可 JSON 序列化）
+            ttl: 過期時間（秒），默認使用初始化時的 ttl
+        """
+        try:
+            payload = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            logger.debug(f"Value for {key} is not JSON serialisable, skipped: {e}")
+            return
+
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, payload, expires_at)
+                )
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY == 0:
+                    self._prune(conn)
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Shared cache write failed: {e}")
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        """刪除過期條目，並在超出容量時刪除最早過期的條目"""
+        conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+        count = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY expires_at LIMIT ?)",
+                (overflow,)
+            )
+            logger.debug(f"Shared cache {self.table} pruned {overflow} entries")
+
+    def delete(self, key: str) -> None:
+        """刪除單個條目"""
+        try:
+            with self._lock:
+                self._connect().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Shared cache delete failed: {e}")
+
+    def clear(self) -> None:
+        """清空共享緩存（影響所有 worker）"""
+        try:
+            with self._lock:
+                self._connect().execute(f"DELETE FROM {self.table}")
+        except sqlite3.Error as e:
+            self.errors += 1
+            logger.warning(f"Shared cache clear failed: {e}")
+
+    def size(self) -> int:
+        """返回當前未過期的條目數"""
+        try:
+            with self._lock:
+                return self._connect().execute(
+                    f"SELECT COUNT(*) FROM {self.table} WHERE expires_at > ?",
+                    (time.time(),)
+                ).fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """獲取統計資訊"""
+        return {
+            'shared_hits': self.hits,
+            'shared_misses': self.misses,
+            'shared_errors': self.errors,
+            'shared_path': self.path
+        }
+
+
+def create_shared_tier(namespace: str, ttl: int, max_entries: Optional[int] = None) -> Optional[SharedCacheTier]:
+    """
+    根據環境變數創建共享緩存層
+
+    設置 SHARED_CACHE_PATH 啟用（例如 /tmp/rasa_shared_cache.db），
+    未設置時返回 None，只使用進程內緩存
+
+    Args:
+        namespace: 表名
+        ttl: 默認過期時間（秒）
+        max_entries: 最大條目數，默認讀取 SHARED_CACHE_MAX_ENTRIES
+
+    Returns:
+        SharedCacheTier 實例或 None
+    """
+    path = os.getenv('SHARED_CACHE_PATH')
+    if not path:
+        return None
+
+    if max_entries is None:
+        max_entries = int(os.getenv('SHARED_CACHE_MAX_ENTRIES', '10000'))
+
+    try:
+        tier = SharedCacheTier(path, namespace=namespace, ttl=ttl, max_entries=max_entries)
+        logger.info(f"Shared cache tier enabled: {path} ({namespace})")
+        return tier
+    except (sqlite3.Error, OSError, ValueError) as e:
+        logger.warning(f"無法啟用共享緩存層 {path}: {e}，僅使用進程內緩存")
+        return None
@@ -0,0 +1,224 @@
+"""
+Gemini 回應流
+Rasa 的 webhook 只能一次返回完整的回應，ActionGeminiFallback 在流式模式下先返回 stream_id，
+生成的文字寫入 ResponseStream，前端再通過 action server 的 /stream/<stream_id>（SSE）逐段讀取
+
+流只保存在當前進程的內存中，需要前端直接連線到處理 webhook 的同一個 action server；
+標準的 rasa_sdk 服務器通過其插件機制（attach_sanic_app_extensions）註冊 /stream 路由，
+備用的 Sanic 服務器直接調用 add_stream_route()
+
+只有註冊了 /stream 路由的服務器會啟用流式回應，其他情況下 action 返回完整回應
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseStream:
+    """
+    單個回應的文字流
+    保存已收到的所有片段，訂閱者從頭重放，前端重連後也能取得完整內容；
+    只能在事件循環線程中使用
+    """
+
+    def __init__(self, stream_id: str):
+        """
+        初始化回應流
+
+        Args:
+            stream_id: 流 ID
+        """
+        self.stream_id = stream_id
+        self.chunks: List[str] = []
+        self.final_text: Optional[str] = None
+        self.done = False
+        self.created_at = time.time()
+        # 生成回應的任務（保持引用，避免任務在完成前被回收）
+        self.task: Optional[Any] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        """喚醒所有等待中的訂閱者"""
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def append(self, text: str) -> None:
+        """
+        追加一段文字
+
+        Args:
+            text: 文字片段
+        """
+        if self.done or not text:
+            return
+        self.chunks.append(text)
+        self._notify()
+
+    def finish(self, final_text: Optional[str]) -> None:
+        """
+        結束回應流
+
+        Args:
+            final_text: 清理後的完整回應，失敗時為 None（前端改為顯示默認回應）
+        """
+        if self.done:
+            return
+        self.final_text = final_text
+        self.done = True
+        self._notify()
+
+    async def iterate(self, timeout: float = 30.0) -> AsyncIterator[Tuple[str, Optional[str]]]:
+        """
+        逐段讀取回應
+
+        Args:
+            timeout: 等待下一段文字的最長時間（秒），超時視為失敗
+
+        Yields:
+            ('chunk', 文字) 或最後一個 ('done', 完整回應或 None)
+        """
+        position = 0
+        while True:
+            while position < len(self.chunks):
+                yield 'chunk', self.chunks[position]
+                position += 1
+            if self.done:
+                yield 'done', self.final_text
+                return
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Response stream {self.stream_id} idle for {timeout}s")
+                yield 'done', None
+                return
+
+
+class StreamRegistry:
+    """
+    進程內的回應流登記表
+    超過存活時間的流在創建新流時清除，數量超過上限時淘汰最舊的流
+    """
+
+    def __init__(self, ttl: int = 120, max_streams: int = 1000):
+        """
+        初始化登記表
+
+        Args:
+            ttl: 流的存活時間（秒）
+            max_streams: 最多同時保存的流數量
+        """
+        self.ttl = ttl
+        self.max_streams = max_streams
+        # 只有提供 /stream 路由的服務器會啟用，其他情況下 action 返回完整回應
+        self.enabled = False
+        self._streams: "OrderedDict[str, ResponseStream]" = OrderedDict()
+
+    def enable(self) -> None:
+        """啟用流式回應（由提供 /stream 路由的服務器調用）"""
+        self.enabled = True
+
+    def create(self) -> ResponseStream:
+        """創建新的回應流"""
+        self._prune()
+        stream = ResponseStream(uuid.uuid4().hex)
+        self._streams[stream.stream_id] = stream
+        return stream
+
+    def get(self, stream_id: str) -> Optional[ResponseStream]:
+        """
+        獲取回應流
+
+        Args:
+            stream_id: 流 ID
+
+        Returns:
+            ResponseStream，不存在或已過期時返回 None
+        """
+        stream = self._streams.get(stream_id)
+        if stream is None or time.time() - stream.created_at > self.ttl:
+            return None
+        return stream
+
+    def _prune(self) -> None:
+        """清除過期的流，並淘汰超出上限的最舊流"""
+        cutoff = time.time() - self.ttl
+        while self._streams:
+            stream_id, stream = next(iter(self._streams.items()))
+            if stream.created_at > cutoff and len(self._streams) < self.max_streams:
+                break
+            del self._streams[stream_id]
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+
+# 全局登記表
+stream_registry = StreamRegistry()
+
+
+def add_stream_route(app: Any, idle_timeout: float = 30.0) -> None:
+    """
+    在 Sanic 應用上註冊 /stream/<stream_id>（SSE）路由，並啟用流式回應
+
+    Args:
+        app: Sanic 應用
+        idle_timeout: 等待下一段文字的最長時間（秒）
+    """
+    from sanic.response import json as json_response
+
+    @app.get("/stream/<stream_id>")
+    async def stream(request, stream_id):
+        response_stream = stream_registry.get(stream_id)
+        if response_stream is None:
+            return json_response({"error": "Stream not found or expired"}, status=404)
+
+        response = await request.respond(
+            content_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+        async for kind, text in response_stream.iterate(timeout=idle_timeout):
+            payload = json.dumps({"text": text}, ensure_ascii=False)
+            if kind == "chunk":
+                await response.send(f"data: {payload}\n\n")
+            else:
+                await response.send(f"event: done\ndata: {payload}\n\n")
+        await response.eof()
+
+    stream_registry.enable()
+    logger.info("Gemini streaming enabled: /stream/<stream_id>")
+
+
+def register_rasa_sdk_plugin(idle_timeout: float = 30.0) -> bool:
+    """
+    通過 rasa_sdk 的插件機制，在標準 action server 啟動時註冊 /stream 路由
+    必須在 rasa_sdk.endpoint.run() 之前調用
+
+    Args:
+        idle_timeout: 等待下一段文字的最長時間（秒）
+
+    Returns:
+        bool: 已註冊插件時返回 True；rasa_sdk 沒有插件機制時返回 False（流式回應保持停用）
+    """
+    try:
+        import pluggy
+        from rasa_sdk.plugin import plugin_manager
+    except ImportError as e:
+        logger.warning(f"rasa_sdk 不支持插件，標準 action server 不提供流式回應: {e}")
+        return False
+
+    hookimpl = pluggy.HookimplMarker("rasa_sdk")
+
+    class _StreamRoutePlugin:
+        @hookimpl
+        def attach_sanic_app_extensions(self, app: Any) -> None:
+            add_stream_route(app, idle_timeout)
+
+    plugin_manager().register(_StreamRoutePlugin())
+    return True
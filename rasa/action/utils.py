@@ -3,10 +3,20 @@ Rasa Actions 工具函數
 提供通用的工具函數和緩存機制
 """
 
-from typing import Optional, Dict, Any, List
-from datetime import datetime, timedelta
-from collections import defaultdict
+from typing import Optional, Dict, Any, List, Tuple
+from collections import OrderedDict
+from functools import lru_cache
 import logging
+import os
+import threading
+import time
+
+from .config import (
+    FACILITY_TYPES, FACILITY_STATUSES, CAMPUSES, BUILDINGS,
+    PERFORMANCE_CONFIG, VALIDATION_CONFIG, LANGUAGE_CONFIG
+)
+from .matcher import compile_vocabulary
+from .shared_cache import SharedCacheTier, create_shared_tier
 
 logger = logging.getLogger(__name__)
 
@@ -14,21 +24,29 @@ logger = logging.getLogger(__name__)
 class FacilityCache:
     """
     設施查詢緩存
-    使用 TTL (Time To Live) 機制
+    使用 OrderedDict 實現 O(1) LRU，搭配單調時鐘的 TTL (Time To Live) 惰性過期
     """
     
-    def __init__(self, ttl: int = 300, max_size: int = 1000):
+    def __init__(self, ttl: int = 300, max_size: int = 1000, shared: Optional[SharedCacheTier] = None):
         """
         初始化緩存
         
         Args:
             ttl: 緩存過期時間（秒），默認 5 分鐘
             max_size: 最大緩存條目數，默認 1000
+            shared: 可選的跨進程共享緩存層，本地未命中時查詢
         """
-        self.cache: Dict[str, tuple] = {}
+        # key -> (value, expires_at)，順序即 LRU 順序（最舊的在最前面）
+        self.cache: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
         self.ttl = ttl
         self.max_size = max_size
-        self.access_times: Dict[str, datetime] = {}
+        self.shared = shared
+        
+        # 統計資訊
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
     
     def get(self, key: str) -> Optional[Any]:
         """
@@ -40,22 +58,38 @@ class FacilityCache:
         Returns:
             緩存值，如果不存在或已過期則返回 None
         """
-        if key not in self.cache:
-            return None
+        entry = self.cache.get(key)
+        if entry is None:
+            return self._get_shared(key)
         
-        data, timestamp = self.cache[key]
+        data, expires_at = entry
         
-        # 檢查是否過期
-        if datetime.now() - timestamp > timedelta(seconds=self.ttl):
-            # 過期，刪除
+        # 檢查是否過期（惰性過期，只在訪問時檢查）
+        if time.monotonic() >= expires_at:
             del self.cache[key]
-            if key in self.access_times:
-                del self.access_times[key]
+            self.expirations += 1
             logger.debug(f"Cache expired for key: {key}")
+            return self._get_shared(key)
+        
+        # 更新訪問順序（移到最新）
+        self.cache.move_to_end(key)
+        self.hits += 1
+        return data
+    
+    def _get_shared(self, key: str) -> Optional[Any]:
+        """本地未命中時查詢共享緩存層，命中則回填本地緩存"""
+        if self.shared is None:
+            self.misses += 1
             return None
         
-        # 更新訪問時間
-        self.access_times[key] = datetime.now()
+        result = self.shared.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        
+        data, remaining = result
+        self._set_local(key, data, time.monotonic() + min(remaining, self.ttl))
+        self.hits += 1
         return data
     
     def set(self, key: str, value: Any) -> None:
@@ -66,44 +100,69 @@ class FacilityCache:
             key: 緩存鍵
             value: 緩存值
         """
-        # 如果緩存已滿，刪除最舊的條目
-        if len(self.cache) >= self.max_size:
+        self._set_local(key, value, time.monotonic() + self.ttl)
+        if self.shared is not None:
+            self.shared.set(key, value, self.ttl)
+        logger.debug(f"Cached value for key: {key}")
+    
+    def _set_local(self, key: str, value: Any, expires_at: float) -> None:
+        """寫入進程內緩存"""
+        if key in self.cache:
+            self.cache.move_to_end(key)
+        elif len(self.cache) >= self.max_size:
+            # 如果緩存已滿，刪除最久未使用的條目
             self._evict_oldest()
         
-        self.cache[key] = (value, datetime.now())
-        self.access_times[key] = datetime.now()
-        logger.debug(f"Cached value for key: {key}")
+        self.cache[key] = (value, expires_at)
     
     def _evict_oldest(self) -> None:
-        """刪除最舊的緩存條目"""
-        if not self.access_times:
+        """刪除最久未使用的緩存條目（O(1)）"""
+        if not self.cache:
             return
         
-        # 找到最舊的條目
-        oldest_key = min(self.access_times.items(), key=lambda x: x[1])[0]
-        
-        if oldest_key in self.cache:
-            del self.cache[oldest_key]
-        if oldest_key in self.access_times:
-            del self.access_times[oldest_key]
-        
+        oldest_key, _ = self.cache.popitem(last=False)
+        self.evictions += 1
         logger.debug(f"Evicted oldest cache entry: {oldest_key}")
     
     def clear(self) -> None:
-        """清空緩存"""
+        """清空緩存（包括共享緩存層）"""
         self.cache.clear()
-        self.access_times.clear()
+        if self.shared is not None:
+            self.shared.clear()
         logger.info("Cache cleared")
     
     def size(self) -> int:
         """返回當前緩存大小"""
         return len(self.cache)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        獲取緩存統計資訊
+        
+        Returns:
+            Dict: 命中、未命中、淘汰次數及命中率
+        """
+        lookups = self.hits + self.misses
+        hit_rate = (self.hits / lookups * 100) if lookups else 0.0
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': f"{hit_rate:.1f}%",
+            'size': len(self.cache),
+            'max_size': self.max_size
+        }
+        if self.shared is not None:
+            stats.update(self.shared.get_stats())
+        return stats
 
 
 class RateLimiter:
     """
-    速率限制器
-    防止 API 濫用
+    速率限制器（令牌桶）
+    防止 API 濫用；每個用戶只保存 [剩餘令牌, 上次補充時間] 兩個數字，
+    閒置用戶會被定期清除，可在多線程下安全使用
     """
     
     def __init__(self, max_requests: int = 100, window: int = 60):
@@ -111,12 +170,44 @@ class RateLimiter:
         初始化速率限制器
         
         Args:
-            max_requests: 時間窗口內最大請求數
-            window: 時間窗口（秒）
+            max_requests: 時間窗口內最大請求數（即令牌桶容量）
+            window: 時間窗口（秒），令牌在此時間內補滿
         """
-        self.requests: Dict[str, List[datetime]] = defaultdict(list)
+        self.requests: Dict[str, List[float]] = {}
         self.max_requests = max_requests
         self.window = window
+        self.refill_rate = max_requests / window if window > 0 else float('inf')
+        self._lock = threading.Lock()
+        self._last_sweep = time.monotonic()
+    
+    def _refill(self, user_id: str, now: float) -> List[float]:
+        """按經過時間補充令牌，返回該用戶的令牌桶（調用方需持有鎖）"""
+        bucket = self.requests.get(user_id)
+        if bucket is None:
+            bucket = [float(self.max_requests), now]
+            self.requests[user_id] = bucket
+        else:
+            elapsed = now - bucket[1]
+            if elapsed > 0:
+                bucket[0] = min(float(self.max_requests), bucket[0] + elapsed * self.refill_rate)
+                bucket[1] = now
+        return bucket
+    
+    def _sweep(self, now: float) -> None:
+        """
+        清除閒置用戶（調用方需持有鎖）
+        閒置超過一個時間窗口的令牌桶必然已補滿，與不存在等價
+        """
+        if now - self._last_sweep < self.window:
+            return
+        
+        self._last_sweep = now
+        cutoff = now - self.window
+        idle = [user_id for user_id, bucket in self.requests.items() if bucket[1] <= cutoff]
+        for user_id in idle:
+            del self.requests[user_id]
+        if idle:
+            logger.debug(f"Rate limiter swept {len(idle)} idle users")
     
     def is_allowed(self, user_id: str) -> bool:
         """
@@ -128,21 +219,22 @@ class RateLimiter:
         Returns:
             True 如果允許，False 如果不允許
         """
-        now = datetime.now()
-        user_requests = self.requests[user_id]
-        
-        # 移除過期請求
-        cutoff = now - timedelta(seconds=self.window)
-        user_requests[:] = [req for req in user_requests if req > cutoff]
-        
-        # 檢查是否超過限制
-        if len(user_requests) >= self.max_requests:
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            bucket = self._refill(user_id, now)
+            
+            # 檢查是否超過限制
+            if bucket[0] < 1.0:
+                allowed = False
+            else:
+                # 消耗一個令牌
+                bucket[0] -= 1.0
+                allowed = True
+        
+        if not allowed:
             logger.warning(f"Rate limit exceeded for user: {user_id}")
-            return False
-        
-        # 記錄新請求
-        user_requests.append(now)
-        return True
+        return allowed
     
     def get_remaining(self, user_id: str) -> int:
         """
@@ -154,14 +246,12 @@ class RateLimiter:
         Returns:
             剩餘請求數
         """
-        now = datetime.now()
-        user_requests = self.requests[user_id]
-        
-        # 移除過期請求
-        cutoff = now - timedelta(seconds=self.window)
-        user_requests[:] = [req for req in user_requests if req > cutoff]
-        
-        return max(0, self.max_requests - len(user_requests))
+        now = time.monotonic()
+        with self._lock:
+            bucket = self.requests.get(user_id)
+            if bucket is None:
+                return self.max_requests
+            return int(self._refill(user_id, now)[0])
     
     def reset(self, user_id: Optional[str] = None) -> None:
         """
@@ -170,18 +260,32 @@ class RateLimiter:
         Args:
             user_id: 用戶標識，如果為 None 則重置所有用戶
         """
-        if user_id:
-            if user_id in self.requests:
-                del self.requests[user_id]
-        else:
-            self.requests.clear()
+        with self._lock:
+            if user_id:
+                self.requests.pop(user_id, None)
+            else:
+                self.requests.clear()
 
 
-# 全局緩存實例
-facility_cache = FacilityCache()
+# 全局緩存實例（設置 SHARED_CACHE_PATH 時啟用跨進程共享緩存層）
+facility_cache = FacilityCache(shared=create_shared_tier('facility_cache', ttl=300))
 
 # 全局速率限制器實例
-rate_limiter = RateLimiter()
+rate_limiter = RateLimiter(
+    max_requests=PERFORMANCE_CONFIG['rate_limit_requests'],
+    window=PERFORMANCE_CONFIG['rate_limit_window']
+)
+
+
+# 導入時編譯一次的詞彙匹配器與反向別名表（別名 -> 標準值）
+FACILITY_TYPE_MATCHER, FACILITY_TYPE_ALIASES = compile_vocabulary(FACILITY_TYPES)
+STATUS_MATCHER, STATUS_ALIASES = compile_vocabulary(FACILITY_STATUSES)
+CAMPUS_MATCHER, CAMPUS_ALIASES = compile_vocabulary(CAMPUSES)
+BUILDING_MATCHER, BUILDING_ALIASES = compile_vocabulary(BUILDINGS)
+
+_VALID_FACILITY_TYPES = frozenset(VALIDATION_CONFIG['facility_types'])
+_VALID_STATUSES = frozenset(VALIDATION_CONFIG['statuses'])
+_VALID_CAMPUSES = frozenset(VALIDATION_CONFIG['campuses'])
 
 
 def validate_facility_type(facility_type: Optional[str]) -> bool:
@@ -194,8 +298,7 @@ def validate_facility_type(facility_type: Optional[str]) -> bool:
     Returns:
         True 如果有效，False 如果無效
     """
-    from .config import VALIDATION_CONFIG
-    return facility_type in VALIDATION_CONFIG['facility_types']
+    return facility_type in _VALID_FACILITY_TYPES
 
 
 def validate_status(status: Optional[str]) -> bool:
@@ -208,8 +311,7 @@ def validate_status(status: Optional[str]) -> bool:
     Returns:
         True 如果有效，False 如果無效
     """
-    from .config import VALIDATION_CONFIG
-    return status in VALIDATION_CONFIG['statuses']
+    return status in _VALID_STATUSES
 
 
 def validate_campus(campus: Optional[str]) -> bool:
@@ -222,8 +324,7 @@ def validate_campus(campus: Optional[str]) -> bool:
     Returns:
         True 如果有效，False 如果無效
     """
-    from .config import VALIDATION_CONFIG
-    return campus in VALIDATION_CONFIG['campuses']
+    return campus in _VALID_CAMPUSES
 
 
 def get_facility_name(facility_type: str, language: str = 'zh') -> str:
@@ -237,8 +338,6 @@ def get_facility_name(facility_type: str, language: str = 'zh') -> str:
     Returns:
         設施名稱
     """
-    from .config import FACILITY_TYPES
-    
     if facility_type in FACILITY_TYPES:
         return FACILITY_TYPES[facility_type].get(language, facility_type)
     
@@ -256,8 +355,6 @@ def get_status_name(status: str, language: str = 'zh') -> str:
     Returns:
         狀態名稱
     """
-    from .config import FACILITY_STATUSES
-    
     if status in FACILITY_STATUSES:
         return FACILITY_STATUSES[status].get(language, status)
     
@@ -274,19 +371,10 @@ def normalize_facility_type(text: str) -> Optional[str]:
     Returns:
         標準化的設施類型，如果無法識別則返回 None
     """
-    from .config import FACILITY_TYPES
-    
-    text_lower = text.lower()
-    
-    for facility_type, config in FACILITY_TYPES.items():
-        # 檢查英文別名
-        if any(alias.lower() in text_lower for alias in config['aliases_en']):
-            return facility_type
-        # 檢查中文別名
-        if any(alias in text for alias in config['aliases_zh']):
-            return facility_type
-    
-    return None
+    if not text:
+        return None
+    # 同時命中多個類型時按 FACILITY_TYPES 的聲明順序取第一個
+    return FACILITY_TYPE_MATCHER.first(text)
 
 
 def normalize_status(text: str) -> Optional[str]:
@@ -299,37 +387,120 @@ def normalize_status(text: str) -> Optional[str]:
     Returns:
         標準化的狀態，如果無法識別則返回 None
     """
-    from .config import FACILITY_STATUSES
+    if not text:
+        return None
+    return STATUS_MATCHER.first(text)
+
+
+def normalize_campus(text: str) -> Optional[str]:
+    """
+    從文本中標準化校區
     
-    text_lower = text.lower()
+    Args:
+        text: 輸入文本
+        
+    Returns:
+        標準化的校區鍵（campus1/campus2/campus3），如果無法識別則返回 None
+    """
+    if not text:
+        return None
+    return CAMPUS_MATCHER.first(text)
+
+
+def normalize_building(text: str) -> Optional[str]:
+    """
+    從文本中標準化建築
     
-    for status, config in FACILITY_STATUSES.items():
-        # 檢查英文別名
-        if any(alias.lower() in text_lower for alias in config['aliases_en']):
-            return status
-        # 檢查中文別名
-        if any(alias in text for alias in config['aliases_zh']):
-            return status
+    Args:
+        text: 輸入文本
+        
+    Returns:
+        標準化的建築名稱，如果無法識別則返回 None
+    """
+    if not text:
+        return None
+    return BUILDING_MATCHER.longest(text)
+
+
+ENGLISH_THRESHOLD = LANGUAGE_CONFIG.get('english_threshold', 0.5)
+
+
+@lru_cache(maxsize=LANGUAGE_CONFIG.get('cache_size', 2048))
+def _detect_language(text: str) -> str:
+    """單次逐字掃描：遇到中文字立即返回；否則統計英文字母佔（字母數字、底線、空白）的比例"""
+    english_chars = 0
+    total_chars = 0
+    for char in text:
+        if char < '\u0080':
+            if ('a' <= char <= 'z') or ('A' <= char <= 'Z'):
+                english_chars += 1
+                total_chars += 1
+            elif ('0' <= char <= '9') or char == '_' or char.isspace():
+                total_chars += 1
+        elif '\u4e00' <= char <= '\u9fff':
+            return 'zh'
+        elif char.isalnum() or char.isspace():
+            total_chars += 1
+
+    # 如果英文字符佔比超過閾值，視為英文
+    if total_chars > 0 and english_chars / total_chars > ENGLISH_THRESHOLD:
+        return 'en'
+    return 'zh'
+
+
+def detect_language(text: Optional[str]) -> str:
+    """
+    檢測文本語言（最近檢測過的文本直接返回緩存結果）
     
-    return None
+    Args:
+        text: 要檢測的文本
+        
+    Returns:
+        包含中文字符時返回 'zh'；英文字母佔比超過閾值時返回 'en'；其他情況返回 'zh'
+    """
+    if not text:
+        return 'zh'
+    return _detect_language(text)
 
 
 class ConversationMemory:
     """
     會話記憶管理
     記住用戶的偏好和上下文
+    
+    內存有上限：總條目數超過 max_entries 時按用戶 LRU 淘汰最久未活動的用戶，
+    後台清掃線程定期刪除已過期的記憶，避免從未再訪的用戶永久佔用內存
     """
     
-    def __init__(self, ttl: int = 3600):
+    def __init__(
+        self,
+        ttl: int = 3600,
+        max_entries: int = 100000,
+        sweep_interval: float = 300
+    ):
         """
         初始化會話記憶
         
         Args:
             ttl: 記憶過期時間（秒），默認 1 小時
+            max_entries: 所有用戶記憶條目的總上限
+            sweep_interval: 後台清掃間隔（秒），0 表示不啟動清掃線程
         """
-        self.memory: Dict[str, Dict[str, Any]] = {}
-        self.timestamps: Dict[str, Dict[str, datetime]] = {}
+        # user_id -> {key: (value, expires_at)}，順序即用戶 LRU 順序
+        self.memory: "OrderedDict[str, Dict[str, Tuple[Any, float]]]" = OrderedDict()
         self.ttl = ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        
+        self._entries = 0
+        self._lock = threading.RLock()
+        self._sweeper: Optional[threading.Thread] = None
+        self._sweeper_pid: Optional[int] = None
+        self._stop_event = threading.Event()
+        
+        # 統計資訊
+        self.evicted_users = 0
+        self.swept_entries = 0
     
     def remember(self, user_id: str, key: str, value: Any) -> None:
         """
@@ -340,14 +511,31 @@ class ConversationMemory:
             key: 記憶鍵
             value: 記憶值
         """
-        if user_id not in self.memory:
-            self.memory[user_id] = {}
-            self.timestamps[user_id] = {}
-        
-        self.memory[user_id][key] = value
-        self.timestamps[user_id][key] = datetime.now()
+        self._ensure_sweeper()
+        self._put(user_id, key, value, time.monotonic() + self.ttl)
         logger.debug(f"Remembered {key} for user {user_id}: {value}")
     
+    def _put(self, user_id: str, key: str, value: Any, expires_at: float) -> None:
+        """寫入單條記憶並執行容量淘汰"""
+        with self._lock:
+            entries = self.memory.get(user_id)
+            if entries is None:
+                entries = {}
+                self.memory[user_id] = entries
+            else:
+                self.memory.move_to_end(user_id)
+            
+            if key not in entries:
+                self._entries += 1
+            entries[key] = (value, expires_at)
+            
+            # 超出總上限時淘汰最久未活動的用戶（不淘汰當前用戶）
+            while self._entries > self.max_entries and len(self.memory) > 1:
+                evicted_id, evicted = self.memory.popitem(last=False)
+                self._entries -= len(evicted)
+                self.evicted_users += 1
+                logger.debug(f"Evicted memories of user {evicted_id}")
+    
     def recall(self, user_id: str, key: str, default: Any = None) -> Any:
         """
         回憶用戶偏好或上下文
@@ -360,23 +548,25 @@ class ConversationMemory:
         Returns:
             記憶值，如果不存在或已過期則返回默認值
         """
-        if user_id not in self.memory:
-            return default
-        
-        if key not in self.memory[user_id]:
-            return default
-        
-        # 檢查是否過期
-        timestamp = self.timestamps[user_id].get(key)
-        if timestamp and datetime.now() - timestamp > timedelta(seconds=self.ttl):
-            # 過期，刪除
-            del self.memory[user_id][key]
-            if key in self.timestamps[user_id]:
-                del self.timestamps[user_id][key]
-            logger.debug(f"Memory expired for {key} of user {user_id}")
-            return default
-        
-        value = self.memory[user_id][key]
+        with self._lock:
+            entries = self.memory.get(user_id)
+            if entries is None:
+                return default
+            
+            entry = entries.get(key)
+            if entry is None:
+                return default
+            
+            value, expires_at = entry
+            
+            # 檢查是否過期
+            if time.monotonic() >= expires_at:
+                self._delete(user_id, entries, key)
+                logger.debug(f"Memory expired for {key} of user {user_id}")
+                return default
+            
+            self.memory.move_to_end(user_id)
+        
         logger.debug(f"Recalled {key} for user {user_id}: {value}")
         return value
     
@@ -388,21 +578,20 @@ class ConversationMemory:
             user_id: 用戶標識
             key: 記憶鍵，如果為 None 則清除所有記憶
         """
-        if user_id not in self.memory:
-            return
-        
-        if key:
-            if key in self.memory[user_id]:
-                del self.memory[user_id][key]
-            if key in self.timestamps[user_id]:
-                del self.timestamps[user_id][key]
-            logger.debug(f"Forgot {key} for user {user_id}")
-        else:
-            # 清除所有記憶
-            del self.memory[user_id]
-            if user_id in self.timestamps:
-                del self.timestamps[user_id]
-            logger.debug(f"Forgot all memories for user {user_id}")
+        with self._lock:
+            entries = self.memory.get(user_id)
+            if entries is None:
+                return
+            
+            if key:
+                if key in entries:
+                    self._delete(user_id, entries, key)
+                logger.debug(f"Forgot {key} for user {user_id}")
+            else:
+                # 清除所有記憶
+                del self.memory[user_id]
+                self._entries -= len(entries)
+                logger.debug(f"Forgot all memories for user {user_id}")
     
     def get_user_context(self, user_id: str) -> Dict[str, Any]:
         """
@@ -414,19 +603,104 @@ class ConversationMemory:
         Returns:
             用戶上下文字典
         """
-        if user_id not in self.memory:
-            return {}
+        with self._lock:
+            entries = self.memory.get(user_id)
+            if not entries:
+                return {}
+            
+            # 過濾過期的記憶（只取一次時間）
+            now = time.monotonic()
+            return {key: value for key, (value, expires_at) in entries.items() if expires_at > now}
+    
+    def size(self) -> int:
+        """返回當前記憶條目總數"""
+        return self._entries
+    
+    def user_count(self) -> int:
+        """返回當前有記憶的用戶數"""
+        return len(self.memory)
+    
+    def _delete(self, user_id: str, entries: Dict[str, Tuple[Any, float]], key: str) -> None:
+        """刪除單條記憶，用戶沒有記憶時一併移除（調用方需持有鎖）"""
+        del entries[key]
+        self._entries -= 1
+        if not entries:
+            del self.memory[user_id]
+    
+    def sweep(self, batch_size: int = 1000) -> int:
+        """
+        刪除所有已過期的記憶
+        分批持鎖，避免長時間阻塞請求線程
         
-        # 過濾過期的記憶
-        context = {}
-        for key, value in self.memory[user_id].items():
-            timestamp = self.timestamps[user_id].get(key)
-            if timestamp and datetime.now() - timestamp <= timedelta(seconds=self.ttl):
-                context[key] = value
+        Args:
+            batch_size: 每次持鎖檢查的用戶數
+            
+        Returns:
+            刪除的記憶條目數
+        """
+        with self._lock:
+            user_ids = list(self.memory.keys())
+        
+        removed = 0
+        for i in range(0, len(user_ids), batch_size):
+            now = time.monotonic()
+            with self._lock:
+                for user_id in user_ids[i:i + batch_size]:
+                    entries = self.memory.get(user_id)
+                    if entries is None:
+                        continue
+                    expired = [key for key, (_, expires_at) in entries.items() if expires_at <= now]
+                    for key in expired:
+                        self._delete(user_id, entries, key)
+                    removed += len(expired)
+        
+        self.swept_entries += removed
+        if removed:
+            logger.debug(f"Swept {removed} expired memories")
+        return removed
+    
+    def _ensure_sweeper(self) -> None:
+        """按需啟動後台清掃線程（fork 後的子進程會重新啟動）"""
+        if self.sweep_interval <= 0:
+            return
+        pid = os.getpid()
+        if self._sweeper is not None and self._sweeper_pid == pid and self._sweeper.is_alive():
+            return
         
-        return context
+        with self._lock:
+            if self._sweeper is not None and self._sweeper_pid == pid and self._sweeper.is_alive():
+                return
+            self._stop_event.clear()
+            self._sweeper = threading.Thread(
+                target=self._sweep_loop,
+                name="conversation-memory-sweeper",
+                daemon=True
+            )
+            self._sweeper_pid = pid
+            self._sweeper.start()
+    
+    def _sweep_loop(self) -> None:
+        """後台清掃循環"""
+        while not self._stop_event.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Conversation memory sweep failed: {e}")
+    
+    def stop_sweeper(self) -> None:
+        """停止後台清掃線程"""
+        self._stop_event.set()
+        if self._sweeper is not None and self._sweeper.is_alive():
+            self._sweeper.join(timeout=1)
+        self._sweeper = None
 
 
-# 全局會話記憶實例
-conversation_memory = ConversationMemory()
+# 全局會話記憶實例（設置 CONVERSATION_DB_URL 時使用持久化後端）
+# memory_store 依賴上面的 ConversationMemory，因此在模組末尾導入
+from .memory_store import create_conversation_memory  # noqa: E402
 
+conversation_memory = create_conversation_memory(
+    ttl=PERFORMANCE_CONFIG['memory_ttl'],
+    max_entries=PERFORMANCE_CONFIG['memory_max_entries'],
+    sweep_interval=PERFORMANCE_CONFIG['memory_sweep_interval']
+)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+詞彙別名匹配基準測試
+比較編譯後的 Aho-Corasick 匹配器與原先逐個別名 any(alias in text) 的實現，
+並驗證兩者在測試語料上的結果一致
+
+用法：
+    cd rasa && python3 benchmarks/bench_alias_matcher.py
+"""
+import os
+import sys
+import time
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from action.config import VALIDATION_CONFIG  # noqa: E402
+from action.matcher import compile_vocabulary  # noqa: E402
+from action.utils import (  # noqa: E402
+    normalize_facility_type, normalize_status, validate_facility_type
+)
+
+ROUNDS = 20_000
+
+CORPUS = [
+    "請問綜三館二樓的廁所在哪裡？",
+    "Where is the nearest restroom in the library?",
+    "第一校區的飲水機壞了，無法使用",
+    "The water fountain on the 3rd floor is out of order",
+    "行政大樓門口的垃圾桶已經滿了",
+    "trash can near the admin building is overflowing",
+    "洗手間正在清潔中",
+    "我想查詢目前維修中的設施有哪些",
+    "Is the drinking fountain working now?",
+    "謝謝你的幫忙，我知道了",
+    "How do I get to the campus 2 gym from the main gate?",
+    "圖書館三樓的飲水器部分損壞，水很小",
+]
+
+
+def legacy_normalize_facility_type(text: str) -> Optional[str]:
+    """原先的實現（每次調用重新導入 config、逐個別名掃描）"""
+    from action.config import FACILITY_TYPES
+    
+    text_lower = text.lower()
+    for facility_type, config in FACILITY_TYPES.items():
+        if any(alias.lower() in text_lower for alias in config['aliases_en']):
+            return facility_type
+        if any(alias in text for alias in config['aliases_zh']):
+            return facility_type
+    return None
+
+
+def legacy_normalize_status(text: str) -> Optional[str]:
+    """原先的實現"""
+    from action.config import FACILITY_STATUSES
+    
+    text_lower = text.lower()
+    for status, config in FACILITY_STATUSES.items():
+        if any(alias.lower() in text_lower for alias in config['aliases_en']):
+            return status
+        if any(alias in text for alias in config['aliases_zh']):
+            return status
+    return None
+
+
+def legacy_validate_facility_type(facility_type: Optional[str]) -> bool:
+    """原先的實現"""
+    from action.config import VALIDATION_CONFIG
+    return facility_type in VALIDATION_CONFIG['facility_types']
+
+
+def bench(func, inputs, rounds: int = ROUNDS) -> float:
+    """返回每次調用的平均耗時（微秒）"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in inputs:
+            func(text)
+    return (time.perf_counter() - start) / (rounds * len(inputs)) * 1e6
+
+
+def main() -> None:
+    for text in CORPUS:
+        assert normalize_facility_type(text) == legacy_normalize_facility_type(text), text
+        assert normalize_status(text) == legacy_normalize_status(text), text
+    print(f"results identical on {len(CORPUS)} messages")
+    
+    validate_inputs = VALIDATION_CONFIG['facility_types'] + ['unknown', None]
+    cases = [
+        ("normalize_facility_type", legacy_normalize_facility_type, normalize_facility_type, CORPUS),
+        ("normalize_status", legacy_normalize_status, normalize_status, CORPUS),
+        ("validate_facility_type", legacy_validate_facility_type, validate_facility_type, validate_inputs),
+    ]
+    
+    print(f"{'function':<26}{'legacy (µs)':>14}{'compiled (µs)':>16}{'speedup':>10}")
+    for name, legacy, compiled, inputs in cases:
+        old = bench(legacy, inputs)
+        new = bench(compiled, inputs)
+        print(f"{name:<26}{old:>14.2f}{new:>16.2f}{old / new:>9.1f}x")
+    
+    # 詞彙表擴大時的增長：原實現隨別名數線性增長，自動機只與文本長度相關
+    print(f"\n{'aliases':<26}{'legacy (µs)':>14}{'compiled (µs)':>16}{'speedup':>10}")
+    for size in (100, 1_000, 10_000):
+        vocabulary = {
+            f"entry{i}": {'aliases_zh': [f"第{i}號館", f"館{i}"], 'aliases_en': [f"hall {i}x"]}
+            for i in range(size // 3 + 1)
+        }
+        matcher, _ = compile_vocabulary(vocabulary)
+        
+        def legacy(text: str, vocabulary=vocabulary) -> Optional[str]:
+            text_lower = text.lower()
+            for key, config in vocabulary.items():
+                if any(alias.lower() in text_lower for alias in config['aliases_en']):
+                    return key
+                if any(alias in text for alias in config['aliases_zh']):
+                    return key
+            return None
+        
+        rounds = max(20, 200_000 // size)
+        old = bench(legacy, CORPUS, rounds)
+        new = bench(matcher.first, CORPUS, rounds)
+        print(f"{size:<26,}{old:>14.2f}{new:>16.2f}{old / new:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gemini 對話上下文基準測試
+模擬包含按鈕流程、intent payload、重複模板回覆和長回答的對話，在每個用戶輪次觸發一次 fallback，
+比較原先的上下文（最近 3 條事件、每條截斷到 150 字，包括當前問題本身）
+與 ContextBuilder（相同的最近輪次窗口，但去除當前問題、按鈕 payload 和重複模板回覆，
+過長輪次壓縮到預算的一半，更早的問題折疊成滾動摘要）的 token 數和構建耗時：
+saved 為上下文部分減少的比例，input 為整個請求（包括系統提示詞）的輸入 token 減少的比例
+
+token 數為 context_builder.estimate_tokens 的估算值；
+開始前先檢查當前問題（包括超過單條上限的長問題和按鈕 payload）不會重複出現在上下文中
+
+用法：
+    cd rasa && GEMINI_API_KEY=dummy python3 benchmarks/bench_context_builder.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('GEMINI_API_KEY', 'dummy')
+
+from action.context_builder import ContextBuilder, create_context_builder, estimate_tokens  # noqa: E402
+from action.gemini_client import PROMPT_TEMPLATES, GeminiClient  # noqa: E402
+
+CONVERSATION_LENGTHS = (10, 40, 120)  # 每個對話的用戶輪次數
+CONVERSATIONS = 50
+
+USER_QUESTIONS = [
+    "最近的廁所在哪裡", "圖書館週末幾點開門？", "哪裡有飲水機", "工程館三樓的飲水機壞了",
+    "學生餐廳今天有營業嗎", "請問停車場在哪裡，我騎機車要停哪一區比較方便",
+    "Where is the nearest restroom?", "How do I get to the student center from the library?",
+    "那附近還有其他的嗎", "謝謝你",
+]
+
+BOT_TEMPLATES = [
+    "抱歉，我不太確定您的意思。您可以問我關於校園設施的問題，例如：\n• 最近的廁所在哪裡？\n• 哪裡有飲水機？\n• 查詢設施狀態",
+    "好的，正在為您查找最近的設施...",
+    "感謝您的回報！我們會盡快處理。",
+    "Sorry, I'm not quite sure what you mean. You can ask me about campus facilities.",
+]
+
+LONG_ANSWERS = [
+    "圖書館週一至週五早上八點開放到晚上十點，週末則是早上九點到下午五點。考試週期間會延長開放時間，"
+    "詳細資訊可以在圖書館網站查詢，或直接撥打圖書館服務台電話。借書需要攜帶學生證，每人最多可借二十本，"
+    "借期為三十天，可以線上續借一次。如果需要安靜的讀書空間，三樓和四樓有自習區。",
+    "The student center is about a five minute walk from the library. Leave the library through the main "
+    "entrance, turn left onto the central avenue, and continue past the engineering building. The student "
+    "center is the large glass building on your right, next to the sports field.",
+]
+
+GENDER_BUTTONS = [
+    {'title': '男廁', 'payload': '/ask_gender{"gender":"男"}'},
+    {'title': '女廁', 'payload': '/ask_gender{"gender":"女"}'},
+    {'title': '性別友善廁所', 'payload': '/ask_gender{"gender":"性別友善"}'},
+]
+
+
+def make_conversation(rng: random.Random, user_turns: int) -> list:
+    """生成對話事件"""
+    events = [{'event': 'session_started'}, {'event': 'action', 'name': 'action_listen'}]
+    for _ in range(user_turns):
+        kind = rng.random()
+        if kind < 0.2:
+            events.append({'event': 'user', 'text': "我想找廁所"})
+            events.append({'event': 'bot', 'text': "請選擇廁所類型", 'data': {'buttons': GENDER_BUTTONS}})
+            events.append({'event': 'user', 'text': rng.choice(GENDER_BUTTONS)['payload']})
+            events.append({'event': 'bot', 'text': "最近的廁所在工程館二樓，步行約 2 分鐘。"})
+        elif kind < 0.3:
+            events.append({'event': 'user', 'text': "/greet"})
+            events.append({'event': 'bot', 'text': "您好！有什麼可以幫您的嗎？"})
+        else:
+            events.append({'event': 'user', 'text': rng.choice(USER_QUESTIONS)})
+            reply = rng.choice(LONG_ANSWERS) if rng.random() < 0.4 else rng.choice(BOT_TEMPLATES)
+            events.append({'event': 'bot', 'text': reply})
+        events.append({'event': 'action', 'name': 'action_listen'})
+    return events
+
+
+def legacy_context(events: list) -> list:
+    """原先的 _build_conversation_context + _filter_and_compress_context"""
+    recent = []
+    for event in reversed(events):
+        if len(recent) >= 3:
+            break
+        text = (event.get('text') or '').strip()
+        if event.get('event') == 'user' and text and len(text) <= 200:
+            recent.insert(0, f"用戶: {text}")
+        elif event.get('event') == 'bot' and text and len(text) <= 200:
+            recent.insert(0, f"助手: {text}")
+    return [ctx[:150] + "..." if len(ctx) > 150 else ctx for ctx in recent[-3:]]
+
+
+def render_context(context: list) -> str:
+    """按提示詞格式渲染上下文部分"""
+    if not context:
+        return ''
+    return '\n'.join([PROMPT_TEMPLATES['zh']['context_header']] + [f"- {ctx}" for ctx in context])
+
+
+def fallback_points(events: list):
+    """每個用戶輪次觸發一次 fallback：(當時的事件列表, 當前訊息)"""
+    for index, event in enumerate(events):
+        if event.get('event') == 'user':
+            yield events[:index + 1], event['text']
+
+
+def prompt_tokens(context: list, message: str, system_tokens: int) -> int:
+    """整個請求的輸入 token 數（系統提示詞 + 上下文 + 問題 + 回應要求）"""
+    template = PROMPT_TEMPLATES['zh']
+    return system_tokens + estimate_tokens(
+        render_context(context) + template['question'] + message + template['instruction']
+    )
+
+
+def check_current_question() -> None:
+    """當前問題已在提示詞中，不論長短都不應出現在上下文裡"""
+    long_question = "請問圖書館" + "週末和考試週的開放時間分別是幾點到幾點，" * 8
+    events = [
+        {'event': 'user', 'text': "哪裡有飲水機"},
+        {'event': 'bot', 'text': "飲水機在一樓大廳。"},
+        {'event': 'user', 'text': long_question},
+    ]
+    context = ContextBuilder().build('long', events, long_question, 'zh')
+    assert context == ["用戶: 哪裡有飲水機", "助手: 飲水機在一樓大廳。"], context
+
+    payload = GENDER_BUTTONS[1]['payload']
+    events = [
+        {'event': 'bot', 'text': "請選擇廁所類型", 'data': {'buttons': GENDER_BUTTONS}},
+        {'event': 'user', 'text': payload},
+    ]
+    context = ContextBuilder().build('button', events, payload, 'zh')
+    assert context == ["助手: 請選擇廁所類型"], context
+
+
+def run(user_turns: int, system_tokens: int) -> None:
+    rng = random.Random(user_turns)
+    conversations = [make_conversation(rng, user_turns) for _ in range(CONVERSATIONS)]
+    builder = create_context_builder()
+
+    legacy_tokens, new_tokens = [], []
+    legacy_total = new_total = 0
+    legacy_time = new_time = 0.0
+    for sender, events in enumerate(conversations):
+        for prefix, message in fallback_points(events):
+            start = time.perf_counter()
+            old = legacy_context(prefix)
+            legacy_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            new = builder.build(str(sender), prefix, message, 'zh')
+            new_time += time.perf_counter() - start
+
+            legacy_tokens.append(estimate_tokens(render_context(old)))
+            new_tokens.append(estimate_tokens(render_context(new)))
+            legacy_total += prompt_tokens(old, message, system_tokens)
+            new_total += prompt_tokens(new, message, system_tokens)
+
+    calls = len(legacy_tokens)
+    old_avg = sum(legacy_tokens) / calls
+    new_avg = sum(new_tokens) / calls
+    print(
+        f"{user_turns:<7}{old_avg:>11.1f}{max(legacy_tokens):>9}{new_avg:>11.1f}{max(new_tokens):>9}"
+        f"{1 - new_avg / old_avg:>9.1%}{1 - new_total / legacy_total:>9.1%}"
+        f"{legacy_time / calls * 1e6:>12.1f}{new_time / calls * 1e6:>12.1f}"
+    )
+
+
+def main() -> None:
+    check_current_question()
+    client = GeminiClient()
+    builder = create_context_builder()
+    system_tokens = estimate_tokens(client._system_prompts['zh'])
+    print(
+        f"context budget: {builder.budget} tokens, turns: {builder.max_turns}, "
+        f"system prompt: {system_tokens} tokens (same for both)"
+    )
+    print(
+        f"{'turns':<7}{'old avg':>11}{'old max':>9}{'new avg':>11}{'new max':>9}"
+        f"{'saved':>9}{'input':>9}{'old (µs)':>12}{'new (µs)':>12}"
+    )
+    for user_turns in CONVERSATION_LENGTHS:
+        run(user_turns, system_tokens)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FacilityCache 微基準測試
+驗證緩存已滿時 set() 的延遲不隨 max_size 增長（1k -> 1M 條目）
+
+用法：
+    cd rasa && python3 benchmarks/bench_facility_cache.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from action.utils import FacilityCache  # noqa: E402
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+OPS = 20_000
+
+
+def bench_set(max_size: int) -> float:
+    """填滿緩存後測量每次 set()（觸發淘汰）的平均延遲（微秒）"""
+    cache = FacilityCache(ttl=300, max_size=max_size)
+    for i in range(max_size):
+        cache.set(f"key_{i}", i)
+    
+    start = time.perf_counter()
+    for i in range(OPS):
+        cache.set(f"new_{i}", i)
+    elapsed = time.perf_counter() - start
+    
+    assert cache.size() == max_size
+    assert cache.evictions == OPS
+    return elapsed / OPS * 1e6
+
+
+def main() -> None:
+    print(f"{'max_size':>10} | {'set() µs/op':>12}")
+    print("-" * 27)
+    results = []
+    for size in SIZES:
+        latency = bench_set(size)
+        results.append(latency)
+        print(f"{size:>10} | {latency:>12.3f}")
+    print("-" * 27)
+    print(f"1M / 1k 延遲比：{results[-1] / results[0]:.2f}x（接近 1 表示 O(1)）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+容錯匹配基準測試
+比較 SymSpell 刪除索引與原先逐詞條 difflib.SequenceMatcher 的查詢延遲，
+詞彙表從 100 擴大到 10k 條
+
+用法：
+    cd rasa && python3 benchmarks/bench_fuzzy_index.py
+"""
+import difflib
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from action.fuzzy_index import FuzzyIndex  # noqa: E402
+
+SIZES = [100, 1_000, 10_000]
+QUERIES = 200
+CHARS = "綜合教學大樓館中心研究科技行政圖書體育人文理管工程機械電資訊休閒紅綠活動學生宿舍餐廳實驗創新第一二三四五"
+
+
+def make_vocabulary(size: int, rng: random.Random) -> list:
+    """生成不重複的合成建築名稱（3-7 個字）"""
+    names = set()
+    while len(names) < size:
+        names.add(''.join(rng.choice(CHARS) for _ in range(rng.randint(3, 7))))
+    return sorted(names)
+
+
+def typo(word: str, rng: random.Random) -> str:
+    """製造一個錯字（替換、刪除或交換）"""
+    i = rng.randrange(len(word))
+    kind = rng.choice(('replace', 'delete', 'swap'))
+    if kind == 'replace':
+        return word[:i] + rng.choice(CHARS) + word[i + 1:]
+    if kind == 'delete' and len(word) > 3:
+        return word[:i] + word[i + 1:]
+    if i < len(word) - 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word
+
+
+def legacy_best(vocabulary: list, query: str):
+    """原先的實現：對每個詞條計算 SequenceMatcher 相似度"""
+    best_match, best_ratio = None, 0.6
+    for key in vocabulary:
+        ratio = difflib.SequenceMatcher(None, query, key).ratio()
+        if ratio > best_ratio:
+            best_ratio, best_match = ratio, key
+    return best_match
+
+
+def main() -> None:
+    rng = random.Random(42)
+    print(f"{'vocabulary':<12}{'build (s)':>11}{'difflib (µs)':>15}{'index (µs)':>13}{'speedup':>10}{'index recall':>14}")
+    for size in SIZES:
+        vocabulary = make_vocabulary(size, rng)
+        targets = [rng.choice(vocabulary) for _ in range(QUERIES)]
+        queries = [typo(word, rng) for word in targets]
+        
+        start = time.perf_counter()
+        index = FuzzyIndex((word, word) for word in vocabulary)
+        build = time.perf_counter() - start
+        
+        # difflib 在大詞彙表上很慢，只取部分查詢
+        legacy_queries = queries[:max(5, QUERIES * 100 // size)]
+        start = time.perf_counter()
+        for query in legacy_queries:
+            legacy_best(vocabulary, query)
+        legacy = (time.perf_counter() - start) / len(legacy_queries) * 1e6
+        
+        start = time.perf_counter()
+        found = [index.lookup(query, limit=3) for query in queries]
+        indexed = (time.perf_counter() - start) / len(queries) * 1e6
+        
+        recall = sum(target in [term for _, term, _ in matches] for target, matches in zip(targets, found)) / QUERIES
+        print(f"{size:<12,}{build:>11.2f}{legacy:>15.1f}{indexed:>13.1f}{legacy / indexed:>9.0f}x{recall:>13.0%}")
+
+
+if __name__ == '__main__':
+    main()
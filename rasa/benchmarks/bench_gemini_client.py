@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gemini 客戶端本地開銷基準測試
+把 GenerativeModel.generate_content 換成立即返回的假傳輸層，只測量客戶端自身的開銷：
+原先每次嘗試都重新創建 GenerativeModel、重新構建系統提示詞並拼接完整提示詞，
+現在模型實例按 (模型, 語言, 生成配置檔) 緩存，系統提示詞作為 system_instruction 綁定在模型上
+
+安裝了 google-generativeai 時使用真實的 GenerativeModel（構造開銷也計入），
+否則結果只包含提示詞構建部分
+
+用法：
+    cd rasa && GEMINI_API_KEY=dummy python3 benchmarks/bench_gemini_client.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+os.environ.setdefault('GEMINI_API_KEY', 'dummy')
+
+import google.generativeai as genai  # noqa: E402
+
+from action.gemini_client import GeminiClient  # noqa: E402
+
+ROUNDS = 20_000
+
+MESSAGES = [
+    ("廁所在哪裡", 'zh'),
+    ("請問學校的圖書館週末幾點開門？我想去借書，但不確定假日有沒有開放", 'zh'),
+    ("Where can I find a water fountain near the engineering building?", 'en'),
+    ("How do I get from the library to the student center", 'en'),
+]
+CONTEXT = ["用戶: 我在第一校區", "助手: 好的，請問需要什麼幫助？", "用戶: 想找地方休息"]
+
+
+class _Response:
+    text = "這是一個測試回應"
+
+
+def _fake_generate_content(self, contents, **kwargs):
+    """假傳輸層：不發出網絡請求"""
+    return _Response()
+
+
+def legacy_request(client: GeminiClient, message: str, language: str, context):
+    """原先的流程：每次嘗試都重新構建提示詞和模型"""
+    system_prompt = client._build_system_prompt(language)
+    full_prompt = client._build_prompt(system_prompt, message, context, language)
+    model = genai.GenerativeModel(client.model_name)
+    generation_config = client._get_optimized_generation_config(language, message)
+    return model.generate_content(full_prompt, generation_config=generation_config)
+
+
+def cached_request(client: GeminiClient, message: str, language: str, context):
+    """現在的流程：重用模型實例，只組裝用戶輪次"""
+    model, contents = client._build_request(message, context, language)
+    return model.generate_content(contents)
+
+
+def bench(func, client: GeminiClient, context) -> float:
+    """返回每次請求的平均耗時（微秒）"""
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for message, language in MESSAGES:
+            func(client, message, language, context)
+    return (time.perf_counter() - start) / (ROUNDS * len(MESSAGES)) * 1e6
+
+
+def main() -> None:
+    genai.GenerativeModel.generate_content = _fake_generate_content
+    client = GeminiClient()
+    real_sdk = hasattr(genai, 'GenerationConfig')
+    print(f"google-generativeai: {'installed' if real_sdk else 'not installed (model construction cost not measured)'}")
+
+    print(f"{'context':<10}{'legacy (µs)':>14}{'cached (µs)':>14}{'speedup':>10}")
+    for label, context in (('none', None), ('3 turns', CONTEXT)):
+        old = bench(legacy_request, client, context)
+        new = bench(cached_request, client, context)
+        print(f"{label:<10}{old:>14.2f}{new:>14.2f}{old / new:>9.1f}x")
+    print(f"model instances created: {len(client._models)}")
+
+
+if __name__ == '__main__':
+    main()
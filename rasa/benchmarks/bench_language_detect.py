@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+語言檢測基準測試
+比較單次逐字掃描 + 緩存的 detect_language 與原先三個正則（search、findall、sub）的實現，
+分別測試短消息和 500 字（max_input_length）的長消息，並驗證結果一致；
+cached 一欄是同一輪對話中多個 action 重複檢測同一條消息時的耗時
+
+用法：
+    cd rasa && python3 benchmarks/bench_language_detect.py
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from action.utils import _detect_language, detect_language  # noqa: E402
+
+ROUNDS = 2_000
+
+CHINESE_PATTERN = re.compile(r'[一-鿿]')
+ENGLISH_PATTERN = re.compile(r'[a-zA-Z]')
+NON_WORD_PATTERN = re.compile(r'[^\w\s]')
+
+SHORT = [
+    "你好",
+    "Hello",
+    "Where is the nearest restroom?",
+    "綜三館二樓的廁所在哪裡？",
+    "3F toilet broken!!",
+    "OK",
+    "謝謝",
+    "library opening hours",
+]
+
+LONG = [
+    ("The water fountain near the library entrance has been leaking for days. " * 8)[:500],
+    ("請問第一校區圖書館三樓的飲水機什麼時候會修好？" * 25)[:500],
+    ("Is the 2F restroom in building 3 open today? " * 11)[:499] + "嗎",
+    ("12345 67890 ... !!! ??? " * 21)[:500],
+]
+
+
+def legacy_detect_language(text: str) -> str:
+    """原先的實現"""
+    if not text:
+        return 'zh'
+    if CHINESE_PATTERN.search(text):
+        return 'zh'
+    english_chars = len(ENGLISH_PATTERN.findall(text))
+    total_chars = len(NON_WORD_PATTERN.sub('', text))
+    if total_chars > 0 and english_chars / total_chars > 0.5:
+        return 'en'
+    return 'zh'
+
+
+def uncached_detect_language(text: str) -> str:
+    """單次掃描，不使用緩存（模擬每條都是新消息）"""
+    return _detect_language.__wrapped__(text) if text else 'zh'
+
+
+def bench(func, inputs, rounds: int = ROUNDS) -> float:
+    """返回每次調用的平均耗時（微秒）"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in inputs:
+            func(text)
+    return (time.perf_counter() - start) / (rounds * len(inputs)) * 1e6
+
+
+def main() -> None:
+    for text in SHORT + LONG:
+        assert detect_language(text) == legacy_detect_language(text), text
+    print(f"results identical on {len(SHORT) + len(LONG)} messages")
+
+    print(f"{'input':<10}{'legacy (µs)':>14}{'one-pass (µs)':>16}{'cached (µs)':>14}")
+    for name, inputs in (("short", SHORT), ("500 en", LONG[:1]), ("500 zh", LONG[1:2]), ("500 other", LONG[2:])):
+        old = bench(legacy_detect_language, inputs)
+        single = bench(uncached_detect_language, inputs)
+        cached = bench(detect_language, inputs)
+        print(f"{name:<10}{old:>14.2f}{single:>16.2f}{cached:>14.2f}")
+
+    info = _detect_language.cache_info()
+    print(f"\ncache: {info.hits} hits, {info.misses} misses, size {info.currsize}/{info.maxsize}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+樓層與位置提取基準測試
+比較單次掃描的 extract_location 與原先 _extract_location_keywords 逐個短語 any(word in text) 的實現：
+驗證側邊和位置在語料上（包括英文短語緊貼中文的混合輸入）與原先一致，
+並檢查樓層提取的預期結果（數量詞「一層水」不是樓層）；
+耗時僅供參考：extract_location 同時提取樓層，原先的函數只處理側邊和位置
+
+用法：
+    cd rasa && python3 benchmarks/bench_location.py
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from action.location import extract_floor, extract_location  # noqa: E402
+
+ROUNDS = 20_000
+
+CORPUS = [
+    "左側第一個小便斗有大便",
+    "最靠窗的馬桶堵塞",
+    "二樓男廁右邊的水龍頭一直滴水",
+    "中間那間的門鎖壞了",
+    "最裡面的洗手台漏水",
+    "the left side urinal is clogged",
+    "second sink from the right is leaking",
+    "the stall near window has no paper",
+    "廁所left side的馬桶",
+    "最inside的那間",
+    "right邊數過來第二個",
+    "outer那間的燈壞了",
+    "靠近樓梯的飲水機",
+    "3號馬桶沖不下去",
+]
+
+# (文本, 預期樓層)
+FLOOR_CASES = [
+    ("三樓的廁所", '3F'),
+    ("3F 男廁", '3F'),
+    ("B1 停車場", 'B1'),
+    ("地下一樓", 'B1'),
+    ("2-3樓都沒水", '2F'),
+    ("綜三館3rd floor的廁所", '3F'),
+    ("floor 5壞了", '5F'),
+    ("basement 2", 'B2'),
+    ("飲水機只剩一層水", None),
+    ("地上有兩層垃圾", None),
+]
+
+
+def legacy_location_keywords(text: str) -> dict:
+    """原先 actions.py 的 _extract_location_keywords（基線版本原樣複製，只去掉 self 和未使用的 language）"""
+    location_info = {
+        'side': None,  # 左側、右側
+        'position': None,  # 第一個、第二個、最靠窗
+        'specific': None  # 其他特定位置描述
+    }
+
+
+    # 提取側邊信息（優先檢查完整詞組）
+    if any(word in text for word in ['左側', '左邊', 'left side', 'left']):
+        location_info['side'] = 'left'
+    elif any(word in text for word in ['右側', '右邊', 'right side', 'right']):
+        location_info['side'] = 'right'
+    elif any(word in text for word in ['中間', 'middle', 'center', '中央']):
+        location_info['side'] = 'middle'
+
+    # 提取位置信息
+
+    # 第一個、第二個等（中文數字或阿拉伯數字）
+    order_patterns = [
+        r'第([一二三四五六七八九十\d]+)[個項]',
+        r'([一二三四五六七八九十\d]+)號',
+        r'第(\d+)[個項]',
+        r'(\d+)號'
+    ]
+    for pattern in order_patterns:
+        order_match = re.search(pattern, text)
+        if order_match:
+            location_info['position'] = order_match.group(0)
+            break
+
+    # 最靠窗、最裡面、最外面等
+    if any(word in text for word in ['最靠窗', '靠窗', 'near window', 'by window']):
+        location_info['position'] = 'specific'
+        location_info['specific'] = 'window'
+    elif any(word in text for word in ['最裡面', '裡面', 'inside', 'inner']):
+        location_info['position'] = 'specific'
+        location_info['specific'] = 'inside'
+    elif any(word in text for word in ['最外面', '外面', 'outside', 'outer']):
+        location_info['position'] = 'specific'
+        location_info['specific'] = 'outside'
+    elif any(word in text for word in ['最靠近', '靠近', 'near', 'close to']):
+        location_info['position'] = 'specific'
+        location_info['specific'] = 'near'
+
+    return location_info
+
+
+def bench(func, inputs, rounds: int = ROUNDS) -> float:
+    """返回每次調用的平均耗時（微秒）"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in inputs:
+            func(text)
+    return (time.perf_counter() - start) / (rounds * len(inputs)) * 1e6
+
+
+def main() -> None:
+    for text in CORPUS:
+        old = legacy_location_keywords(text)
+        new = extract_location(text)
+        assert (old['side'], old['position'], old['specific']) == (new['side'], new['position'], new['specific']), text
+    print(f"side/position identical on {len(CORPUS)} messages")
+
+    for text, expected in FLOOR_CASES:
+        assert extract_floor(text) == expected, (text, extract_floor(text), expected)
+    print(f"floors as expected on {len(FLOOR_CASES)} messages")
+
+    old = bench(legacy_location_keywords, CORPUS)
+    new = bench(extract_location, CORPUS)
+    print(f"{'legacy side/position (µs)':>26}{'extract_location (µs)':>24}")
+    print(f"{old:>26.2f}{new:>24.2f}")
+
+
+if __name__ == '__main__':
+    main()
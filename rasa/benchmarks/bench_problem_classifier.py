@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+設施問題分類基準測試
+比較單次掃描的 classify_problem 與原先 actions.py 的 _analyze_problem
+（13 個關鍵詞列表各自 any(word in text)，從基線版本原樣複製），並驗證兩者在回報語料上的結果一致
+
+用法：
+    cd rasa && python3 benchmarks/bench_problem_classifier.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from action.problem_classifier import CATEGORY_KEYWORDS, PARTIAL_KEYWORDS, classify_problem  # noqa: E402
+
+ROUNDS = 5_000
+
+CORPUS = [
+    "左側第一個小便斗有大便",
+    "最靠窗的馬桶堵塞",
+    "二樓男廁的水龍頭一直滴水",
+    "整間廁所都沒水了，無法使用",
+    "飲水機的水有異味",
+    "飲水機不出水",
+    "垃圾桶滿了",
+    "trash can full near the entrance",
+    "The toilet is clogged and won't flush",
+    "hand dryer broken",
+    "the restroom is very dirty and has a bad smell",
+    "屋頂漏水很嚴重",
+    "插座短路，有燒焦味",
+    "冷氣壞了，教室太熱",
+    "AC broken in room 301",
+    "通風不良，很悶熱",
+    "牆面裂縫越來越大，還有壁癌",
+    "抽風機有奇怪的聲音",
+    "需要打掃一下",
+    "沒有衛生紙",
+    "門鎖壞了關不上",
+    "燈一直閃爍",
+    "地板有點問題",
+    "The light is flickering on the second floor",
+    "正在維修",
+]
+
+
+def legacy_analyze_problem(description: str, language: str = 'zh') -> tuple:
+    """原先 actions.py 的 _analyze_problem（基線版本原樣複製，只去掉 self）"""
+    if not description:
+        return ("正常", "minor", "", "minor")
+
+    desc_lower = description.lower()
+    desc_original = description.strip()
+
+    # 判斷是否為部分問題（單個設備有問題）
+    is_partial = any(word in desc_lower for word in [
+        '一個', 'one', '部分', 'part', '有些', 'some', '幾個', 'few',
+        '小便斗', 'urinal', '馬桶', 'toilet', '水龍頭', 'faucet',
+        '洗手台', 'sink', '烘手機', 'hand dryer',
+        '最靠窗', '最裡面', '最外面', '第一個', '第二個', '第三個',
+        '左側', '右側', '左邊', '右邊', 'near window', 'first', 'second'
+    ])
+
+    # 1. 衛生問題（有大便、有尿、很髒、有異味等）
+    hygiene_keywords = [
+        # 排泄物相關
+        '大便', 'poop', 'feces', 'stool', '糞便', '排泄物', 'waste',
+        '有尿', 'urine', 'pee', '尿液',
+        '裡面有', 'inside has', '裡面', 'inside', '有東西', 'has something',
+        # 清潔度問題
+        '很髒', 'very dirty', 'dirty', '髒', '不乾淨', 'not clean', '骯髒',
+        '污漬', 'stain', '污垢', 'dirt', '垃圾', 'trash', 'garbage',
+        '未清理', 'not cleaned', '沒清', 'hasn\'t been cleaned',
+        # 異味問題
+        '有異味', '有臭味', 'smell', 'odor', 'stink', '臭', '異味', '臭味',
+        '難聞', 'bad smell', 'foul odor', '惡臭',
+        # 異物問題
+        '有異物', 'foreign object', '異物', '有東西', 'something inside',
+        # 衛生紙問題
+        '沒紙', 'no paper', '沒有衛生紙', 'no toilet paper', '缺紙',
+        '紙用完了', 'paper ran out', '紙沒了'
+    ]
+    is_hygiene = any(word in desc_lower for word in hygiene_keywords)
+
+    # 2. 堵塞問題
+    clog_keywords = [
+        '堵塞', 'clog', 'blocked', 'blocking', '堵住', '堵了',
+        '不通', 'not working', 'not flowing', '不流通',
+        '沖不掉', '沖不下去', "won't flush", "can't flush", '沖不走',
+        '卡住', 'stuck', 'jam', '卡了',
+        '排水不暢', 'drain slowly', '排水慢', 'slow drain',
+        '倒灌', 'backflow', '回流', 'water backflow'
+    ]
+    is_clogged = any(word in desc_lower for word in clog_keywords)
+
+    # 3. 損壞問題（壞了、故障、漏水等）
+    broken_keywords = [
+        # 一般損壞
+        '壞', 'broken', '故障', 'malfunction', '不能用', 'not working', '壞了',
+        '損壞', 'damaged', '破損', 'broken down', '失效', '失效',
+        '無法使用', 'unavailable', '不能用', 'cannot use', '無法運作',
+        # 漏水問題
+        '漏水', 'leak', 'leaking', '滴水', 'dripping', '漏', 'leakage',
+        '滲水', 'water seepage', '滲漏', 'seepage',
+        # 供水問題
+        '沒水', 'no water', '沒水了', 'out of water', '停水', 'water outage',
+        '水壓不足', 'low water pressure', '水壓低', 'weak water flow',
+        '出水量小', 'small water flow', '水流小',
+        # 供電問題
+        '沒電', 'no power', '停電', 'power outage', '斷電', 'power cut',
+        '燈不亮', 'light not working', '燈壞了', 'light broken',
+        '閃爍', 'flickering', '燈閃', 'light flickering',
+        # 門鎖問題
+        '門壞', 'door broken', '門鎖壞', 'door lock broken',
+        '關不上', "can't close", '鎖不上', "can't lock",
+        '門卡住', 'door stuck', '門關不緊', 'door not closing properly',
+        # 其他設備問題
+        '烘手機壞', 'hand dryer broken', '烘手機不工作', 'hand dryer not working',
+        '感應器壞', 'sensor broken', '感應不良', 'sensor not working',
+        '按鈕壞', 'button broken', '按鈕不靈', 'button not working'
+    ]
+    is_broken = any(word in desc_lower for word in broken_keywords)
+
+    # 4. 滿出問題
+    full_keywords = [
+        '滿', 'full', '滿出', 'overflowing', '溢出', 'overflow',
+        '裝滿', 'filled up', '滿了', 'is full',
+        '垃圾桶滿', 'trash full', '垃圾滿了', 'trash can full'
+    ]
+    is_full = any(word in desc_lower for word in full_keywords)
+
+    # 5. 維修問題
+    maintenance_keywords = [
+        '維修', 'maintenance', '修理', 'repair', '修復', 'fix'
+    ]
+    is_maintenance = any(word in desc_lower for word in maintenance_keywords)
+
+    # 6. 清潔問題（需要清潔但不算嚴重）
+    cleaning_keywords = [
+        '需要清潔', 'needs cleaning', '要清', 'needs clean', '待清潔',
+        '要打掃', 'needs cleaning', '需要打掃', 'needs sweeping',
+        '清潔', 'cleaning', '打掃', 'sweep', '清理', 'clean up',
+        '髒', 'dirty', '不乾淨', 'not clean', '骯髒', 'filthy',
+        '有灰塵', 'dusty', '有污漬', 'stained', '有異味', 'smelly'
+    ]
+    needs_cleaning = any(word in desc_lower for word in cleaning_keywords)
+
+    # 7. 水質問題（飲水機相關）
+    water_quality_keywords = [
+        '水有異味', 'water has odor', '水有味道', 'water tastes bad',
+        '水質問題', 'water quality issue', '水不乾淨', 'water not clean',
+        '水有雜質', 'water has impurities', '水混濁', 'water cloudy',
+        '無法出水', 'no water flow', '不出水', 'water not flowing',
+        '水溫異常', 'water temperature abnormal', '水太熱', 'water too hot',
+        '水太冷', 'water too cold'
+    ]
+    is_water_quality = any(word in desc_lower for word in water_quality_keywords)
+
+    # 8. 溫度問題（空調、暖氣等）
+    temperature_keywords = [
+        '太熱', 'too hot', '太冷', 'too cold', '溫度異常', 'temperature abnormal',
+        '空調壞', 'air conditioning broken', '冷氣壞', 'AC broken',
+        '暖氣壞', 'heating broken', '暖氣不工作', 'heating not working'
+    ]
+    is_temperature = any(word in desc_lower for word in temperature_keywords)
+
+    # 9. 噪音問題
+    noise_keywords = [
+        '有噪音', 'has noise', '噪音', 'noise', '聲音太大', 'too loud',
+        '異音', 'abnormal sound', '奇怪的聲音', 'strange sound',
+        '運轉聲', 'operating sound', '機器聲', 'machine sound'
+    ]
+    is_noise = any(word in desc_lower for word in noise_keywords)
+
+    # 10. 牆面問題
+    wall_keywords = [
+        '牆面裂縫', 'wall crack', '牆裂', 'cracked wall', '裂縫', 'crack',
+        '壁癌', 'wall mold', '牆面發霉', 'wall mildew', '發霉', 'mold',
+        '油漆剝落', 'paint peeling', '牆面剝落', 'wall peeling', '剝落', 'peeling'
+    ]
+    is_wall = any(word in desc_lower for word in wall_keywords)
+
+    # 11. 結構問題（漏水、滲水等）
+    structure_keywords = [
+        '屋頂漏水', 'roof leak', '天花板漏水', 'ceiling leak',
+        '窗戶滲水', 'window seepage', '窗戶漏水', 'window leak',
+        '地板翹起', 'floor warping', '地板破損', 'floor damaged',
+        '天花板滲水', 'ceiling seepage', '天花板有水漬', 'ceiling water stain'
+    ]
+    is_structure = any(word in desc_lower for word in structure_keywords)
+
+    # 12. 電力系統問題
+    electrical_keywords = [
+        '電線老化', 'wire aging', '電線問題', 'wire issue',
+        '插座故障', 'outlet broken', '插座壞', 'outlet not working',
+        '跳電', 'power trip', '短路', 'short circuit',
+        '電路問題', 'circuit issue', '電力異常', 'power abnormal'
+    ]
+    is_electrical = any(word in desc_lower for word in electrical_keywords)
+
+    # 13. 通風問題
+    ventilation_keywords = [
+        '通風不良', 'poor ventilation', '空氣不流通', 'poor air circulation',
+        '空氣品質差', 'poor air quality', '悶熱', 'stuffy',
+        '空氣異味', 'air odor', '空氣有味道', 'air has smell'
+    ]
+    is_ventilation = any(word in desc_lower for word in ventilation_keywords)
+
+    # 判斷問題優先級（輕微、中等、嚴重）
+    priority = "minor"  # 默認輕微
+
+    # 嚴重問題：影響安全或整個設施無法使用
+    if any([
+        is_electrical and ('短路' in desc_lower or 'short circuit' in desc_lower),
+        is_structure and ('屋頂' in desc_lower or 'roof' in desc_lower),
+        is_broken and not is_partial and ('無法使用' in desc_lower or 'unavailable' in desc_lower),
+        is_water_quality
+    ]):
+        priority = "critical"
+    # 中等問題：影響使用但不危險
+    elif any([
+        is_clogged and not is_partial,
+        is_broken and not is_partial,
+        is_temperature and not is_partial,
+        is_structure,
+        is_electrical
+    ]):
+        priority = "moderate"
+    # 輕微問題：部分設備問題或清潔問題
+    else:
+        priority = "minor"
+
+    # 優先級判斷：衛生問題 > 結構問題 > 電力問題 > 水質問題 > 堵塞 > 損壞 > 滿出 > 溫度 > 通風 > 牆面 > 噪音 > 清潔 > 維修
+    if is_hygiene:
+        # 衛生問題通常是部分損壞（單個設備），需要清潔 - 映射為"待清潔"狀態
+        status = "待清潔"
+        severity = "minor" if is_partial else "major"
+        if language == 'en':
+            notes = f"Hygiene issue: {desc_original}. Requires immediate cleaning."
+        else:
+            notes = f"衛生問題：{desc_original}。需要立即清潔。"
+
+    elif is_clogged:
+        # 堵塞問題：如果是單個設備，是部分損壞；如果是整個設施，是故障
+        if is_partial:
+            status = "部分損壞"
+            severity = "minor"
+            if language == 'en':
+                notes = f"Clogged: {desc_original}. Other facilities are functioning normally."
+            else:
+                notes = f"堵塞：{desc_original}。其他設施正常運作。"
+        else:
+            # 整個設施無法使用，映射為"無法使用"狀態
+            status = "無法使用"
+            severity = "major"
+            if language == 'en':
+                notes = f"Clogged: {desc_original}. Facility is out of order."
+            else:
+                notes = f"堵塞：{desc_original}。設施無法使用。"
+
+    elif is_broken:
+        # 損壞問題
+        if is_partial:
+            status = "部分損壞"
+            severity = "minor"
+            if language == 'en':
+                notes = f"Broken: {desc_original}. Other facilities are functioning normally."
+            else:
+                notes = f"損壞：{desc_original}。其他設施正常運作。"
+        else:
+            # 整個設施無法使用，映射為"無法使用"狀態
+            status = "無法使用"
+            severity = "major"
+            if language == 'en':
+                notes = f"Broken: {desc_original}. Facility is out of order."
+            else:
+                notes = f"損壞：{desc_original}。設施無法使用。"
+
+    elif is_full:
+        # 滿出問題
+        status = "滿出"
+        severity = "minor"
+        if language == 'en':
+            notes = f"Full: {desc_original}."
+        else:
+            notes = f"滿出：{desc_original}。"
+
+    elif is_maintenance:
+        # 維修問題
+        status = "維修中"
+        severity = "major"
+        if language == 'en':
+            notes = f"Under maintenance: {desc_original}."
+        else:
+            notes = f"維修中：{desc_original}。"
+
+    elif is_water_quality:
+        # 水質問題（飲水機）- 映射為"無法使用"狀態
+        status = "無法使用"
+        severity = "major"
+        if language == 'en':
+            notes = f"Water quality issue: {desc_original}. Facility is out of order."
+        else:
+            notes = f"水質問題：{desc_original}。設施無法使用。"
+
+    elif is_temperature:
+        # 溫度問題
+        if is_partial:
+            status = "部分損壞"
+            severity = "minor"
+        else:
+            status = "無法使用"
+            severity = "major"
+        if language == 'en':
+            notes = f"Temperature issue: {desc_original}."
+        else:
+            notes = f"溫度問題：{desc_original}。"
+
+    elif is_noise:
+        # 噪音問題
+        status = "部分損壞"
+        severity = "minor"
+        if language == 'en':
+            notes = f"Noise issue: {desc_original}. Facility still usable but needs attention."
+        else:
+            notes = f"噪音問題：{desc_original}。設施仍可使用但需要關注。"
+
+    elif is_structure:
+        # 結構問題（漏水、滲水等）- 映射為"無法使用"狀態
+        status = "無法使用"
+        severity = priority
+        if language == 'en':
+            notes = f"Structural issue: {desc_original}. Requires immediate attention."
+        else:
+            notes = f"結構問題：{desc_original}。需要立即處理。"
+
+    elif is_electrical:
+        # 電力問題 - 映射為"無法使用"狀態
+        status = "無法使用"
+        severity = priority
+        if language == 'en':
+            notes = f"Electrical issue: {desc_original}. Safety concern, requires immediate attention."
+        else:
+            notes = f"電力問題：{desc_original}。安全隱患，需要立即處理。"
+
+    elif is_wall:
+        # 牆面問題
+        status = "部分損壞"
+        severity = "minor"
+        if language == 'en':
+            notes = f"Wall issue: {desc_original}. Facility still usable but needs repair."
+        else:
+            notes = f"牆面問題：{desc_original}。設施仍可使用但需要修復。"
+
+    elif is_ventilation:
+        # 通風問題
+        status = "部分損壞"
+        severity = "minor"
+        if language == 'en':
+            notes = f"Ventilation issue: {desc_original}. Air quality concern."
+        else:
+            notes = f"通風問題：{desc_original}。空氣品質問題。"
+
+    elif needs_cleaning:
+        # 需要清潔 - 映射為"待清潔"狀態
+        status = "待清潔"
+        severity = "minor"
+        if language == 'en':
+            notes = f"Needs cleaning: {desc_original}."
+        else:
+            notes = f"需要清潔：{desc_original}。"
+
+    else:
+        # 默認：部分損壞（因為通常是指單個設備的問題）
+        status = "部分損壞"
+        severity = "minor"
+        if language == 'en':
+            notes = f"Issue reported: {desc_original}. Other facilities are functioning normally."
+        else:
+            notes = f"問題回報：{desc_original}。其他設施正常運作。"
+
+    return (status, severity, notes, priority)
+
+
+def bench(func, inputs, rounds: int = ROUNDS) -> float:
+    """返回每次調用的平均耗時（微秒）"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in inputs:
+            func(text)
+    return (time.perf_counter() - start) / (rounds * len(inputs)) * 1e6
+
+
+def main() -> None:
+    for text in CORPUS:
+        for language in ('zh', 'en'):
+            assert classify_problem(text, language) == legacy_analyze_problem(text, language), text
+    print(f"results identical on {len(CORPUS)} reports")
+
+    keyword_count = len(PARTIAL_KEYWORDS) + sum(len(keywords) for keywords in CATEGORY_KEYWORDS.values())
+    old = bench(legacy_analyze_problem, CORPUS)
+    new = bench(classify_problem, CORPUS)
+    print(f"{'keywords':<12}{'legacy (µs)':>14}{'one-pass (µs)':>16}{'speedup':>10}")
+    print(f"{keyword_count:<12}{old:>14.2f}{new:>16.2f}{old / new:>9.1f}x")
+
+    # 長描述（多個問題寫在一起）時的差距
+    long_corpus = ['，'.join(CORPUS[i:i + 5]) for i in range(0, len(CORPUS), 5)]
+    old = bench(legacy_analyze_problem, long_corpus)
+    new = bench(classify_problem, long_corpus)
+    print(f"{'long':<12}{old:>14.2f}{new:>16.2f}{old / new:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
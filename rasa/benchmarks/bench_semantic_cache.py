@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+語義近似緩存基準測試
+在 1k / 10k / 100k 個已緩存問題上測量查詢耗時（換個說法的命中與全新問題的未命中），
+並與逐條計算 Jaccard 的線性掃描比較，檢查常見說法變化的命中情況
+
+用法：
+    cd rasa && python3 benchmarks/bench_semantic_cache.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from action.semantic_cache import SemanticCache, jaccard, shingles  # noqa: E402
+
+SIZES = (1_000, 10_000, 100_000)
+QUERIES = 2_000
+
+# 常見的換個說法（應命中）與容易混淆的不同問題（不應命中）
+PARAPHRASES = [
+    ("廁所在哪", "廁所在哪裡？", True),
+    ("圖書館幾點開門？", "請問圖書館幾點開門", True),
+    ("where is the library", "Where is the library?", True),
+    ("男廁在哪", "女廁在哪", False),
+    ("圖書館幾點開門", "圖書館幾點關門", False),
+    ("where is the library", "where is the gym", False),
+]
+
+# 常用漢字（用於生成隨機問題）
+_CHARS = [chr(code) for code in range(0x4E00, 0x4E00 + 3000)]
+
+
+def random_question(rng: random.Random) -> str:
+    """生成隨機中文問題"""
+    return ''.join(rng.choice(_CHARS) for _ in range(rng.randint(6, 16)))
+
+
+def paraphrase(text: str, rng: random.Random) -> str:
+    """模擬換個說法：加上語氣詞或標點"""
+    return rng.choice(["請問", "", ""]) + text + rng.choice(["？", "嗎", "呢？", "?"])
+
+
+def bench_size(size: int) -> None:
+    rng = random.Random(size)
+    questions = [random_question(rng) for _ in range(size)]
+
+    cache = SemanticCache(max_entries=size)
+    start = time.perf_counter()
+    for question in questions:
+        cache.set(question, 'zh', "answer")
+    insert = (time.perf_counter() - start) / size * 1e6
+
+    hit_queries = [paraphrase(rng.choice(questions), rng) for _ in range(QUERIES)]
+    miss_queries = [random_question(rng) for _ in range(QUERIES)]
+
+    start = time.perf_counter()
+    hits = sum(cache.get(query, 'zh') is not None for query in hit_queries)
+    hit_time = (time.perf_counter() - start) / QUERIES * 1e6
+
+    start = time.perf_counter()
+    false_hits = sum(cache.get(query, 'zh') is not None for query in miss_queries)
+    miss_time = (time.perf_counter() - start) / QUERIES * 1e6
+
+    # 線性掃描只測少量查詢
+    features = [shingles(question) for question in questions]
+    sample = hit_queries[:20]
+    start = time.perf_counter()
+    for query in sample:
+        query_features = shingles(query)
+        max(jaccard(query_features, item) for item in features)
+    linear = (time.perf_counter() - start) / len(sample) * 1e6
+
+    print(
+        f"{size:<9}{insert:>12.1f}{hit_time:>12.1f}{miss_time:>12.1f}{linear:>14.0f}"
+        f"{hits / QUERIES:>10.1%}{false_hits / QUERIES:>12.1%}"
+    )
+
+
+def main() -> None:
+    cache = SemanticCache()
+    for cached, query, expected in PARAPHRASES:
+        cache.clear()
+        cache.set(cached, 'zh', "answer")
+        score = jaccard(shingles(cached), shingles(query))
+        hit = cache.get(query, 'zh') is not None
+        mark = "ok" if hit == expected else "UNEXPECTED"
+        print(f"{cached!r:<26}{query!r:<26}similarity {score:.2f}  hit={hit}  {mark}")
+    print()
+
+    print(f"{'entries':<9}{'set (µs)':>12}{'hit (µs)':>12}{'miss (µs)':>12}{'linear (µs)':>14}{'recall':>10}{'false hit':>12}")
+    for size in SIZES:
+        bench_size(size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享緩存層基準測試
+比較 1 / 4 / 8 個 worker 進程在「僅進程內緩存」與「進程內 + SQLite 共享層」
+兩種配置下的命中率與 get() p99 延遲
+
+每個 worker 從同一個 Zipf 分佈抽取查詢鍵，未命中時寫回緩存（模擬後端查詢）。
+本地緩存刻意設得比鍵空間小，以反映實際部署中多 worker 分攤流量的情況。
+
+用法：
+    cd rasa && python3 benchmarks/bench_shared_cache.py
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from action.shared_cache import SharedCacheTier  # noqa: E402
+from action.utils import FacilityCache  # noqa: E402
+
+KEY_SPACE = 5_000
+LOCAL_SIZE = 500
+TOTAL_OPS = 40_000  # 所有 worker 合計的請求數
+ZIPF_S = 1.1
+WORKER_COUNTS = [1, 4, 8]
+
+
+def _zipf_weights(n: int, s: float) -> list:
+    return [1.0 / (rank ** s) for rank in range(1, n + 1)]
+
+
+def _worker(args):
+    worker_id, ops, shared_path = args
+    rng = random.Random(worker_id)
+    keys = [f"facility_{i}" for i in range(KEY_SPACE)]
+    weights = _zipf_weights(KEY_SPACE, ZIPF_S)
+    workload = rng.choices(keys, weights=weights, k=ops)
+
+    shared = None
+    if shared_path:
+        shared = SharedCacheTier(shared_path, namespace="bench", ttl=300, max_entries=KEY_SPACE * 2)
+    cache = FacilityCache(ttl=300, max_size=LOCAL_SIZE, shared=shared)
+
+    latencies = []
+    for key in workload:
+        start = time.perf_counter()
+        value = cache.get(key)
+        latencies.append(time.perf_counter() - start)
+        if value is None:
+            cache.set(key, {"facility": key, "worker": worker_id})
+
+    return cache.hits, cache.misses, latencies
+
+
+def run(workers: int, shared_path) -> tuple:
+    ops = TOTAL_OPS // workers
+    with multiprocessing.Pool(workers) as pool:
+        results = pool.map(_worker, [(i, ops, shared_path) for i in range(workers)])
+
+    hits = sum(r[0] for r in results)
+    misses = sum(r[1] for r in results)
+    latencies = sorted(lat for r in results for lat in r[2])
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+    return hits / (hits + misses) * 100, p99
+
+
+def main() -> None:
+    print(f"{'workers':>7} | {'tier':<14} | {'hit rate':>8} | {'p99 get() µs':>12}")
+    print("-" * 52)
+    for workers in WORKER_COUNTS:
+        hit_rate, p99 = run(workers, None)
+        print(f"{workers:>7} | {'local only':<14} | {hit_rate:>7.1f}% | {p99:>12.1f}")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "shared.db")
+            hit_rate, p99 = run(workers, path)
+        print(f"{workers:>7} | {'local + shared':<14} | {hit_rate:>7.1f}% | {p99:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
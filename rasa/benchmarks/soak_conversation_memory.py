@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ConversationMemory 浸泡測試
+寫入 1M 個合成 sender_id，驗證內存受 max_entries 限制且不會無限增長
+
+用法：
+    cd rasa && python3 benchmarks/soak_conversation_memory.py [用戶數]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from action.utils import ConversationMemory  # noqa: E402
+
+USERS = 1_000_000
+MAX_ENTRIES = 20_000
+KEYS_PER_USER = 2
+# 每條記憶約數百字節，給足餘量；無上限時 1M 用戶會遠超此值
+MEMORY_CEILING_MB = 32
+
+
+def main() -> None:
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else USERS
+    memory = ConversationMemory(ttl=3600, max_entries=MAX_ENTRIES, sweep_interval=0)
+    
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(users):
+        sender_id = f"sender_{i}"
+        memory.remember(sender_id, "last_facility_type", "toilet")
+        memory.remember(sender_id, "last_campus", "第一校區")
+        if i % 100_000 == 0 and i:
+            current, peak = tracemalloc.get_traced_memory()
+            print(f"{i:>9,} users  entries={memory.size():>7,}  current={current / 2**20:6.1f} MB  peak={peak / 2**20:6.1f} MB")
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    print(f"{users:,} users in {elapsed:.1f}s ({elapsed / users * 1e6:.2f} µs/user)")
+    print(f"entries={memory.size():,} users={memory.user_count():,} evicted_users={memory.evicted_users:,}")
+    print(f"current={current / 2**20:.1f} MB peak={peak / 2**20:.1f} MB (ceiling {MEMORY_CEILING_MB} MB)")
+    
+    assert memory.size() <= MAX_ENTRIES, "entry cap exceeded"
+    assert memory.user_count() <= MAX_ENTRIES // KEYS_PER_USER + 1, "user count exceeded"
+    assert peak / 2**20 < MEMORY_CEILING_MB, "memory ceiling exceeded"
+    
+    # 過期清掃：極短 TTL 下 sweep() 應清空所有記憶
+    expiring = ConversationMemory(ttl=0, max_entries=MAX_ENTRIES, sweep_interval=0)
+    for i in range(10_000):
+        expiring.remember(f"sender_{i}", "k", i)
+    removed = expiring.sweep()
+    assert removed == 10_000 and expiring.size() == 0 and expiring.user_count() == 0
+    print("sweep OK")
+
+
+if __name__ == '__main__':
+    main()
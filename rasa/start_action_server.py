@@ -57,6 +57,11 @@ except Exception as e:
 print("🚀 啟動 Rasa Action Server...")
 print("=" * 50)
 
+# Gemini 流式回應：webhook 先返回 stream_id，前端通過 /stream/<stream_id>（SSE）逐段讀取
+# 標準和備用服務器都提供此路由；GEMINI_STREAMING=false 時關閉，action 一次返回完整回應
+GEMINI_STREAMING = os.environ.get("GEMINI_STREAMING", "true").lower() not in ("false", "0", "no")
+ACTION_TIMEOUT = float(os.environ.get("ACTION_TIMEOUT", 30))
+
 # 嘗試使用標準的 rasa-sdk 啟動方式
 use_fallback = False
 try:
@@ -71,6 +76,11 @@ try:
             raise ImportError("無法導入 rasa_sdk.endpoint 或 rasa_sdk.endpoints")
     
     print("[INFO] 使用標準 Rasa SDK 啟動方式")
+    if GEMINI_STREAMING:
+        from action.streaming import register_rasa_sdk_plugin
+        # 路由在 rasa_sdk 創建應用後由插件註冊，註冊成功時才啟用流式回應
+        registered = register_rasa_sdk_plugin(idle_timeout=ACTION_TIMEOUT)
+        print(f"[INFO] Gemini 流式回應: {'啟用' if registered else '停用（rasa_sdk 不支持插件）'}")
     # 啟動服務器（這會阻塞，如果成功不會返回）
     run(
         actions="action",
@@ -86,15 +96,54 @@ except (ImportError, Exception) as e:
 if use_fallback:
     # 備用方法：直接使用 Sanic
     try:
+        import asyncio
+        import inspect
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
         from sanic import Sanic
         from sanic_cors import CORS
-        from rasa_sdk.executor import ActionExecutor
+        from action.dispatch import ActionDispatchTable
         
         app = Sanic("RasaActionServer")
         CORS(app)
         
-        executor = ActionExecutor()
-        executor.register_package("action")
+        # 啟動時構建一次 action 名稱 -> 實例的分派表（同時檢查重複註冊）
+        dispatch_table = ActionDispatchTable()
+        print(f"[INFO] 已註冊 {len(dispatch_table)} 個動作（{len(dispatch_table.duplicates)} 個重複註冊）")
+        
+        # 動作執行池：同步的 action 在線程池中執行，事件循環繼續處理 /health 和其他請求
+        # ACTION_WORKERS 個動作同時執行，另有 ACTION_QUEUE_DEPTH 個可以排隊，超出時返回 503；
+        # 每個請求最多等待 ACTION_TIMEOUT 秒，超時返回 504
+        ACTION_WORKERS = int(os.environ.get("ACTION_WORKERS", 8))
+        ACTION_QUEUE_DEPTH = int(os.environ.get("ACTION_QUEUE_DEPTH", 32))
+        action_pool = ThreadPoolExecutor(max_workers=ACTION_WORKERS, thread_name_prefix="action")
+        # 名額在動作真正結束時才釋放（超時的動作仍在線程中運行，繼續佔用名額）
+        action_slots = threading.BoundedSemaphore(ACTION_WORKERS + ACTION_QUEUE_DEPTH)
+        print(f"[INFO] 動作執行池: {ACTION_WORKERS} 個線程，排隊上限 {ACTION_QUEUE_DEPTH}，超時 {ACTION_TIMEOUT} 秒")
+        
+        async def run_action(action_instance, dispatcher, tracker):
+            """在執行池中運行動作並等待結果；原生 async 的動作直接在事件循環中執行"""
+            if inspect.iscoroutinefunction(action_instance.run):
+                try:
+                    return await asyncio.wait_for(action_instance.run(dispatcher, tracker, {}), ACTION_TIMEOUT)
+                finally:
+                    action_slots.release()
+            
+            try:
+                future = action_pool.submit(action_instance.run, dispatcher, tracker, {})
+            except BaseException:
+                # 提交失敗（例如執行池已關閉）時沒有回調可以釋放名額
+                action_slots.release()
+                raise
+            future.add_done_callback(lambda _: action_slots.release())
+            return await asyncio.wait_for(asyncio.wrap_future(future), ACTION_TIMEOUT)
+        
+        # 速率限制器（在解析 tracker 之前攔截濫用請求）
+        try:
+            from action.utils import rate_limiter
+        except Exception as e:
+            print(f"[WARN] 無法載入速率限制器，將不限制請求: {e}")
+            rate_limiter = None
         
         # 添加調試端點
         @app.get("/")
@@ -103,7 +152,7 @@ if use_fallback:
             return json({
                 "status": "ok",
                 "message": "Rasa Action Server is running",
-                "endpoints": ["/webhook", "/health"]
+                "endpoints": ["/webhook", "/health"] + (["/stream/<stream_id>"] if GEMINI_STREAMING else [])
             })
         
         @app.post("/webhook")
@@ -115,50 +164,23 @@ if use_fallback:
             
             try:
                 data = request.json
-                print(f"[INFO] 收到 webhook 請求: {list(data.keys()) if data else 'None'}")
                 
                 if not data:
                     return json({"error": "Empty request body"}, status=400)
                 
-                # 首先嘗試使用 ActionExecutor 的標準 run 方法（Rasa SDK 3.x 標準方式）
-                try:
-                    # 確保數據格式正確（Rasa SDK 3.x 期望的格式）
-                    # 如果數據已經包含 tracker 和 next_action，直接使用
-                    if "tracker" in data and "next_action" in data:
-                        # 使用 ActionExecutor.run() 標準方法處理請求
-                        # 在 Rasa SDK 3.x 中，run() 方法接收完整的請求數據
-                        result = executor.run(data)
-                        print(f"[OK] ActionExecutor.run() 成功，返回結果類型: {type(result)}")
-                        
-                        # 如果返回的是事件列表，直接返回
-                        if isinstance(result, list):
-                            events_dict = []
-                            for event in result:
-                                if hasattr(event, 'as_dict'):
-                                    events_dict.append(event.as_dict())
-                                elif isinstance(event, dict):
-                                    events_dict.append(event)
-                                else:
-                                    events_dict.append({"event": str(event)})
-                            print(f"[INFO] 返回 {len(events_dict)} 個事件（標準方法）")
-                            return json({"events": events_dict})
-                        elif isinstance(result, dict):
-                            # 如果返回的是字典，直接返回
-                            print(f"[INFO] 返回字典結果（標準方法）")
-                            return json(result)
-                        else:
-                            print(f"[WARN] ActionExecutor.run() 返回未知類型: {type(result)}")
-                            # 繼續使用備用方法
-                    else:
-                        print("[WARN] 請求數據格式不完整，跳過標準方法")
-                        raise ValueError("請求數據格式不完整")
-                except Exception as e:
-                    print(f"[WARN] ActionExecutor.run() 失敗: {e}")
-                    import traceback
-                    print(f"[DEBUG] 錯誤詳情: {traceback.format_exc()}")
-                    print(f"[INFO] 嘗試使用備用方法處理請求...")
+                # 速率限制：只讀取 sender_id，不構建 Tracker，讓濫用請求幾乎不消耗 CPU
+                if rate_limiter is not None:
+                    tracker_data = data.get("tracker")
+                    sender_id = (
+                        data.get("sender_id")
+                        or (tracker_data.get("sender_id") if isinstance(tracker_data, dict) else None)
+                        or request.ip
+                    )
+                    if not rate_limiter.is_allowed(str(sender_id)):
+                        return json({"error": "Too many requests"}, status=429)
+                
+                print(f"[INFO] 收到 webhook 請求: {list(data.keys())}")
                 
-                # 備用方法：手動處理請求（如果標準方法失敗）
                 # 構建 tracker 數據（Rasa 3.x 格式）
                 tracker_dict = data.get("tracker", {})
                 if not tracker_dict:
@@ -229,73 +251,27 @@ if use_fallback:
                     print(f"[INFO] 忽略內建動作: {action_name}（回傳空 events/responses）")
                     return json({"events": [], "responses": []})
                 
-                print(f"🔧 準備執行動作: {action_name}")
-                print(f"📊 已註冊的動作數量: {len(executor.actions)}")
+                # 查詢分派表（啟動時已構建，無需反射查找和重新實例化）
+                action_instance = dispatch_table.get(action_name)
+                if action_instance is None:
+                    print(f"❌ 動作 '{action_name}' 未找到")
+                    return json({"error": f"Action '{action_name}' not found"}, status=404)
+                
+                # 背壓：執行中和排隊中的動作已滿時直接拒絕，而不是無限排隊
+                if not action_slots.acquire(blocking=False):
+                    print(f"[WARN] 動作執行池已滿，拒絕 {action_name}")
+                    return json({"error": "Server busy, please retry later"}, status=503, headers={"Retry-After": "1"})
+                
+                print(f"🔧 執行動作: {action_name}")
                 
-                # 執行動作 - 優先從 action 模塊直接獲取類
                 try:
-                    # 方法1：直接從 action 模塊獲取 Action 類（最可靠）
-                    import action.actions as actions_module
-                    import types
-                    
-                    # 根據 action_name 構建類名（例如 action_greet -> ActionGreet）
-                    # 移除 action_ 前綴，然後轉換為駝峰命名
-                    class_name_parts = action_name.replace('action_', '').split('_')
-                    class_name = ''.join(word.capitalize() for word in class_name_parts)
-                    class_name = f"Action{class_name}"
-                    
-                    print(f"🔍 嘗試從 action.actions 模塊獲取類: {class_name}")
-                    
-                    # 嘗試獲取類
-                    action_class = None
-                    if hasattr(actions_module, class_name):
-                        candidate = getattr(actions_module, class_name)
-                        if isinstance(candidate, type):
-                            action_class = candidate
-                            print(f"✅ 找到 Action 類: {class_name}")
-                    
-                    # 如果沒找到，嘗試從 action 包的 __init__.py 獲取（因為它導出了所有類）
-                    if not action_class:
-                        try:
-                            from action import actions
-                            if hasattr(actions, class_name):
-                                candidate = getattr(actions, class_name)
-                                if isinstance(candidate, type):
-                                    action_class = candidate
-                                    print(f"✅ 從 action 包找到 Action 類: {class_name}")
-                        except Exception as e:
-                            print(f"⚠️ 從 action 包獲取類失敗: {e}")
-                    
-                    # 如果還是沒找到，嘗試從 executor.actions 獲取
-                    if not action_class and action_name in executor.actions:
-                        action_item = executor.actions[action_name]
-                        print(f"📦 Executor 中的 Action 類型: {type(action_item)}")
-                        
-                        # 如果是方法，嘗試獲取類
-                        if isinstance(action_item, types.MethodType):
-                            # 從方法獲取類
-                            if hasattr(action_item, '__self__'):
-                                action_class = action_item.__self__.__class__
-                            elif hasattr(action_item, '__qualname__'):
-                                qualname = action_item.__qualname__
-                                if '.' in qualname:
-                                    method_class_name = qualname.split('.')[0]
-                                    try:
-                                        action_class = getattr(actions_module, method_class_name, None)
-                                    except:
-                                        pass
-                        elif isinstance(action_item, type):
-                            action_class = action_item
-                    
-                    if not action_class:
-                        print(f"❌ 動作 '{action_name}' 未找到")
-                        print(f"📋 可用的動作: {list(executor.actions.keys())[:20]}...")  # 顯示前20個
-                        return json({"error": f"Action '{action_name}' not found"}, status=404)
-                    
-                    # 實例化並執行動作
-                    print(f"🔨 實例化 Action 類: {action_class.__name__}")
-                    action_instance = action_class()
-                    events = action_instance.run(dispatcher, tracker, {})
+                    try:
+                        events = await run_action(action_instance, dispatcher, tracker)
+                    except asyncio.TimeoutError:
+                        print(f"❌ 動作 {action_name} 超過 {ACTION_TIMEOUT} 秒未完成")
+                        return json({"error": f"Action '{action_name}' timed out"}, status=504)
+                    if inspect.isawaitable(events):
+                        events = await asyncio.wait_for(events, ACTION_TIMEOUT)
                     
                     print(f"✅ 動作執行成功，返回 {len(events) if events else 0} 個事件")
                     
@@ -347,6 +323,11 @@ if use_fallback:
             from sanic.response import json
             return json({"status": "ok"})
         
+        if GEMINI_STREAMING:
+            from action.streaming import add_stream_route
+            add_stream_route(app, idle_timeout=ACTION_TIMEOUT)
+        print(f"[INFO] Gemini 流式回應: {'啟用' if GEMINI_STREAMING else '停用'}")
+        
         # 打印所有註冊的路由（兼容不同版本的 Sanic）
         print("=" * 50)
         print("[INFO] 已註冊的路由:")
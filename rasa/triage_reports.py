@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+設施問題回報批量分類（命令列）
+讀取 JSONL 回報（每行為描述字串或帶 description 欄位的物件），輸出帶分類結果的 JSONL
+
+用法：
+    cd rasa && python3 triage_reports.py reports.jsonl -o triaged.jsonl --workers 4
+    cat reports.jsonl | python3 triage_reports.py > triaged.jsonl
+"""
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from action.report_parser import main  # noqa: E402
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())